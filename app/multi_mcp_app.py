@@ -3,6 +3,8 @@ import asyncio
 from fastmcp import Client
 import json
 import pandas as pd
+import re
+import time
 import importlib.util
 import sys
 from pathlib import Path
@@ -27,40 +29,55 @@ llms = importlib.util.module_from_spec(spec)
 sys.modules["llms"] = llms
 spec.loader.exec_module(llms)
 
-# List available LLMs (function names ending with _llama, _groq, _mini, _nano, _flash, etc.)
-llm_options = [
-    f
-    for f in dir(llms)
-    if callable(getattr(llms, f))
-    and not f.startswith("_")
-    and f not in ["get_openai_llm", "get_groq_llm", "get_ollama_llm", "get_gemini_llm"]
-]
-llm_options.sort()
-
-# List available MCP agents/servers (from the server files)
-mcp_agents = [
-    ("Supabase Analyst", "supabase_analyst", "http://127.0.0.1:8000/sse"),
-    ("GitHub Analyst", "github_analyst", "http://127.0.0.1:8001/sse"),
-    ("Docker Analyst", "docker_mcp_tool", "http://127.0.0.1:8002/sse"),
-    ("Brave Web Search", "brave_web_search", "http://127.0.0.1:8003/sse"),
-    ("Context7 Analyst", "context7_analyst", "http://127.0.0.1:8004/sse"),
-    ("YFinance Analyst", "yfinance_analyst", "http://127.0.0.1:8005/sse"),
-]
+# Table decoding helpers shared with the ETL server (columnar / Arrow payloads)
+table_format_path = Path(__file__).parent.parent / "my_mcp" / "table_format.py"
+spec = importlib.util.spec_from_file_location("table_format", str(table_format_path))
+table_format = importlib.util.module_from_spec(spec)
+sys.modules["table_format"] = table_format
+spec.loader.exec_module(table_format)
+
+# Models that can be requested by name
+llm_options = sorted(llms.MODELS)
+# "auto" lets the server's LLM router pick the model for each question
+llm_options = ["auto"] + llm_options
+
+# Servers are discovered through the service registry (runtime/registry.py) when
+# MCP_REGISTRY_URL is set; otherwise their URLs come from servers.toml
+registry_path = Path(__file__).parent.parent / "runtime" / "registry.py"
+spec = importlib.util.spec_from_file_location("mcp_registry", str(registry_path))
+mcp_registry = importlib.util.module_from_spec(spec)
+sys.modules["mcp_registry"] = mcp_registry
+spec.loader.exec_module(mcp_registry)
+
+# List available MCP agents/servers: (title, tool, server name)
+mcp_agents = [(title, tool, name) for name, title, tool in mcp_registry.agents()]
 
 # UI for LLM and MCP agent selection
 st.sidebar.header("Configuration")
 selected_llm = st.sidebar.selectbox("Select LLM", llm_options, index=0)
-selected_agent = st.sidebar.selectbox(
-    "Select MCP Agent", [a[0] for a in mcp_agents], index=0
+fan_out_mode = st.sidebar.toggle(
+    "Ask several agents at once",
+    help="Send the question to several analysts in parallel and combine their answers.",
 )
+if fan_out_mode:
+    selected_agents = st.sidebar.multiselect(
+        "Select MCP Agents",
+        [a[0] for a in mcp_agents],
+        default=[a[0] for a in mcp_agents[:2]],
+    )
+    agent_timeout = st.sidebar.number_input(
+        "Per-agent timeout (seconds)", min_value=5, max_value=900, value=180, step=5
+    )
+    first_result_wins = st.sidebar.checkbox(
+        "First result wins", help="Show the first successful answer and cancel the rest."
+    )
+else:
+    selected_agents = [
+        st.sidebar.selectbox("Select MCP Agent", [a[0] for a in mcp_agents], index=0)
+    ]
 
-# Get agent/tool name and server URL
-agent_tool, agent_url = None, None
-for name, tool, url in mcp_agents:
-    if name == selected_agent:
-        agent_tool = tool
-        agent_url = url
-        break
+# Selected agents as (title, tool, server name); the URL is looked up per question
+selected = [(title, tool, name) for title, tool, name in mcp_agents if title in selected_agents]
 
 # Initialize chat history
 if "messages" not in st.session_state:
@@ -86,59 +103,141 @@ async def call_agent(question: str, llm_name: str, agent_tool: str, agent_url: s
         return result[0].text if result and hasattr(result[0], "text") else str(result)
 
 
+async def call_agent_timed(
+    name: str, question: str, llm_name: str, agent_tool: str, agent_url: str, timeout: float
+) -> dict:
+    start = time.perf_counter()
+    try:
+        text = await asyncio.wait_for(
+            call_agent(question, llm_name, agent_tool, agent_url), timeout
+        )
+        return {"agent": name, "ok": True, "text": text, "seconds": time.perf_counter() - start}
+    except asyncio.TimeoutError:
+        error = f"timed out after {timeout:.0f}s"
+    except Exception as e:
+        error = str(e)
+    return {"agent": name, "ok": False, "error": error, "seconds": time.perf_counter() - start}
+
+
+def relevance(question: str, answer: str) -> float:
+    """Share of the question's words (3+ letters) that the answer mentions."""
+    words = set(re.findall(r"[a-z0-9]{3,}", question.lower()))
+    if not words:
+        return 0.0
+    answer = answer.lower()
+    return sum(w in answer for w in words) / len(words)
+
+
+# Fan-out: ask every target in parallel, so the wait is the slowest agent, not the sum
+async def fan_out(
+    question: str, llm_name: str, targets: list, timeout: float, first_wins: bool
+) -> list:
+    tasks = [
+        asyncio.create_task(call_agent_timed(name, question, llm_name, tool, url, timeout))
+        for name, tool, url in targets
+    ]
+    if first_wins:
+        failures = []
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            if result["ok"]:
+                for task in tasks:
+                    task.cancel()
+                return [result]
+            failures.append(result)
+        return failures
+
+    results = await asyncio.gather(*tasks)
+    # Successful answers first, best keyword coverage of the question first
+    return sorted(
+        results,
+        key=lambda r: (not r["ok"], -relevance(question, r.get("text", "")), r["seconds"]),
+    )
+
+
+def render_response(response: str):
+    """Shows an agent response; returns the text to keep in the history (None if rendered)."""
+    # Try to pretty print JSON or show as DataFrame if possible
+    # If the response is a JSON object with 'raw' and 'tasks_output', extract the most relevant 'raw'
+    try:
+        resp_json = json.loads(response)
+        # If response is a dict with 'raw' and 'tasks_output', prefer tasks_output[0]['raw'] if present
+        if isinstance(resp_json, dict):
+            if (
+                "tasks_output" in resp_json
+                and isinstance(resp_json["tasks_output"], list)
+                and len(resp_json["tasks_output"]) > 0
+                and "raw" in resp_json["tasks_output"][0]
+            ):
+                display_data = resp_json["tasks_output"][0]["raw"]
+            elif "raw" in resp_json:
+                display_data = resp_json["raw"]
+            else:
+                display_data = response
+        else:
+            display_data = response
+    except Exception:
+        display_data = response
+
+    # Now try to display display_data as DataFrame or pretty JSON
+    try:
+        data = json.loads(display_data)
+        # Tool results may carry a columnar/Arrow table under "data"
+        if isinstance(data, dict) and table_format.is_encoded_table(data.get("data")):
+            data = data["data"]
+        if table_format.is_encoded_table(data):
+            st.dataframe(table_format.decode_table(data))
+        elif isinstance(data, list) and all(isinstance(row, dict) for row in data):
+            df = pd.DataFrame(data)
+            st.dataframe(df)
+        else:
+            st.json(data)
+        return None
+    except Exception:
+        st.markdown(display_data)
+        return display_data
+
+
 # Accept user input
 if prompt := st.chat_input("Ask me anything ..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
+    # Least-loaded healthy instance of each selected server
+    targets = [(title, tool, mcp_registry.route(name)) for title, tool, name in selected]
     with st.chat_message("assistant"):
-        with st.spinner("The agent is thinking..."):
+        with st.spinner("The agents are thinking..." if fan_out_mode else "The agent is thinking..."):
             try:
-                response = asyncio.run(
-                    call_agent(prompt, selected_llm, agent_tool, agent_url)
-                )
-                # Try to pretty print JSON or show as DataFrame if possible
-                # If the response is a JSON object with 'raw' and 'tasks_output', extract the most relevant 'raw'
-                try:
-                    resp_json = json.loads(response)
-                    # If response is a dict with 'raw' and 'tasks_output', prefer tasks_output[0]['raw'] if present
-                    if isinstance(resp_json, dict):
-                        if (
-                            "tasks_output" in resp_json
-                            and isinstance(resp_json["tasks_output"], list)
-                            and len(resp_json["tasks_output"]) > 0
-                            and "raw" in resp_json["tasks_output"][0]
-                        ):
-                            display_data = resp_json["tasks_output"][0]["raw"]
-                        elif "raw" in resp_json:
-                            display_data = resp_json["raw"]
+                if not targets:
+                    response = "Select at least one MCP agent."
+                    st.markdown(response)
+                elif not fan_out_mode:
+                    _, agent_tool, agent_url = targets[0]
+                    response = render_response(
+                        asyncio.run(call_agent(prompt, selected_llm, agent_tool, agent_url))
+                    )
+                else:
+                    results = asyncio.run(
+                        fan_out(
+                            prompt, selected_llm, targets, agent_timeout, first_result_wins
+                        )
+                    )
+                    parts = []
+                    for result in results:
+                        header = f"#### {result['agent']} ({result['seconds']:.1f}s)"
+                        st.markdown(header)
+                        if result["ok"]:
+                            text = render_response(result["text"])
+                            parts.append(f"{header}\n{text or '[Structured output above]'}")
                         else:
-                            display_data = response
-                    else:
-                        display_data = response
-                except Exception:
-                    display_data = response
-
-                # Now try to display display_data as DataFrame or pretty JSON
-                try:
-                    data = json.loads(display_data)
-                    if isinstance(data, list) and all(
-                        isinstance(row, dict) for row in data
-                    ):
-                        df = pd.DataFrame(data)
-                        st.dataframe(df)
-                        response = None
-                    else:
-                        st.json(data)
-                        response = None
-                except Exception:
-                    response = display_data
+                            st.warning(f"No answer: {result['error']}")
+                            parts.append(f"{header}\nNo answer: {result['error']}")
+                    response = "\n\n".join(parts)
             except Exception as e:
                 import traceback
 
                 tb = traceback.format_exc()
                 response = f"Error: {e}\n\nTraceback:\n{tb}"
-            if response:
                 st.markdown(response)
     st.session_state.messages.append(
         {
@@ -3,6 +3,12 @@ import asyncio
 from fastmcp import Client
 import json
 import pandas as pd
+import sys
+from pathlib import Path
+
+# Server URLs come from servers.toml at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_url  # noqa: E402
 
 st.set_page_config(page_title="Supabase Analyst Chat", page_icon="📊", layout="wide")
 st.title("Supabase Analyst – AI Chat Interface")
@@ -28,7 +34,7 @@ for message in st.session_state.messages:
 
 # Helper: Call the MCP agent server via SSE
 async def call_agent(question: str):  # or url: str):
-    client = Client("http://127.0.0.1:8001/sse")  # Replace with your server URL
+    client = Client(server_url("airbnb"))  # Replace with your server name
     async with client:
         result = await client.call_tool(
             "search_airbnb",
@@ -0,0 +1,94 @@
+"""
+End-to-end timing of an agent tool from a recorded cassette (see runtime/cassette.py).
+
+Record one live run (real LLM and upstream MCP servers), then replay it offline
+as often as needed. With --latency 0 the replay measures only our own
+orchestration: server, crew, compaction and routing overhead.
+
+Usage:
+    python benchmarks/bench_agents.py record supabase --question "How many orders last week?"
+    python benchmarks/bench_agents.py replay supabase --question "How many orders last week?" --latency 0 --repeat 5
+    python benchmarks/bench_agents.py replay travel_planner --args '{"input_data": {...}}' --latency 0.5
+
+The cassette defaults to benchmarks/cassettes/<server>.jsonl.gz.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CASSETTE_DIR = Path(__file__).resolve().parent / "cassettes"
+
+
+async def call_tool(mcp, tool: str, arguments: dict):
+    from fastmcp import Client
+
+    async with Client(mcp) as client:
+        result = await client.call_tool(tool, arguments)
+    return result[0].text if result and hasattr(result[0], "text") else str(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay an agent tool run")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("server", help="Server name from servers.toml")
+    parser.add_argument("--question", help="Question argument of the tool")
+    parser.add_argument("--args", help="Tool arguments as JSON (instead of --question)")
+    parser.add_argument("--tool", help="Tool to call (default: the server's tool in servers.toml)")
+    parser.add_argument("--cassette", help="Cassette file")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=1.0,
+        help="Replay: scale of the recorded latencies (1 = original, 0 = none)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Replay: number of runs")
+    args = parser.parse_args()
+
+    cassette_path = args.cassette or str(CASSETTE_DIR / f"{args.server}.jsonl.gz")
+    if args.mode == "record" and os.path.exists(cassette_path):
+        os.remove(cassette_path)
+    # Must be set before the server (and runtime.cassette) is imported
+    os.environ["MCP_CASSETTE"] = cassette_path
+    os.environ["MCP_CASSETTE_MODE"] = args.mode
+    os.environ["MCP_CASSETTE_LATENCY"] = str(args.latency)
+
+    sys.path.insert(0, str(ROOT))
+    from runtime import cassette
+    from runtime.config import server_config
+    from runtime.launcher import _load_server
+
+    mcp = _load_server(args.server)
+    tool = args.tool or server_config(args.server)["tool"]
+    arguments = json.loads(args.args) if args.args else {"question": args.question}
+
+    runs = 1 if args.mode == "record" else args.repeat
+    times = []
+    for i in range(runs):
+        if args.mode == "replay":
+            # Every run replays the whole cassette from the start
+            cassette.cassette = cassette.Cassette(cassette_path, "replay", args.latency)
+        start = time.perf_counter()
+        answer = asyncio.run(call_tool(mcp, tool, arguments))
+        times.append(time.perf_counter() - start)
+        misses = cassette.cassette.misses
+        print(f"run {i + 1}: {times[-1]:.3f}s ({misses} unmatched requests)", flush=True)
+
+    print(f"\nanswer: {answer[:300]}")
+    if args.mode == "record":
+        print(f"recorded to {cassette_path}")
+    else:
+        print(
+            f"{args.server}/{tool} replay x{args.latency:g} latency:"
+            f" median {statistics.median(times):.3f}s, min {min(times):.3f}s over {runs} runs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures how long the ETL agent waits for its tools before the LLM can start.
+
+    cold       spawn etl_mcp_server.py per question (the old behaviour)
+    warm       reuse one long-lived server, only the liveness probe per question
+    inprocess  call the tool functions directly, no subprocess
+
+Usage:
+    python benchmarks/bench_etl_startup.py --runs 5
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "my_mcp"))
+from etl_tool_server import HEALTH_TOOL, EtlToolServer  # noqa: E402
+
+
+def _probe(tools):
+    next(t for t in tools if t.name == HEALTH_TOOL).run()
+
+
+def bench_cold(runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        server = EtlToolServer()
+        _probe(server.tools())
+        timings.append(time.perf_counter() - start)
+        server.stop()
+    return timings
+
+
+def bench_warm(runs: int) -> list:
+    server = EtlToolServer()
+    server.tools()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _probe(server.tools())
+        timings.append(time.perf_counter() - start)
+    server.stop()
+    return timings
+
+
+def bench_inprocess(runs: int) -> list:
+    timings = []
+    server = EtlToolServer(mode="inprocess")
+    for _ in range(runs):
+        start = time.perf_counter()
+        _probe(server.tools())
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ETL tool server startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, bench in (
+        ("cold", bench_cold),
+        ("warm", bench_warm),
+        ("inprocess", bench_inprocess),
+    ):
+        timings = bench(args.runs)
+        print(
+            f"{name:<10} median={statistics.median(timings):7.3f}s "
+            f"first={timings[0]:7.3f}s max={max(timings):7.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Micro-benchmarks for the ETL tools in my_mcp/etl_mcp_server.py.
+
+Every tool is timed end to end the way the MCP server runs it:
+    to_frame(data)  ->  tool logic  ->  store the table, encode one page of it
+
+so the cost of converting the input rows and encoding the returned page shows
+up next to the actual pandas work. Each call starts with an empty result cache.
+Peak Python memory (tracemalloc) is tracked per tool call.
+
+Usage:
+    python benchmarks/bench_etl_tools.py                      # 1k..1M rows, all tools
+    python benchmarks/bench_etl_tools.py --sizes 1000 10000000
+    python benchmarks/bench_etl_tools.py --tools remove_duplicates transform_data
+    python benchmarks/bench_etl_tools.py --tools formats          # wire format sizes
+    python benchmarks/bench_etl_tools.py --tools parallel         # process pool speedup
+    python benchmarks/bench_etl_tools.py --tools joins            # join modes agree
+    python benchmarks/bench_etl_tools.py --compare <run_a.json> <run_b.json>
+
+Results are written to benchmarks/results/<commit>-<timestamp>.json so runs can be
+compared across commits.
+"""
+
+import argparse
+import asyncio
+import gc
+import inspect
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# The ETL server resolves its helper modules as siblings (it is started as a script)
+sys.path.insert(0, str(ROOT / "my_mcp"))
+import etl_join  # noqa: E402
+import etl_mcp_server  # noqa: E402
+import etl_parallel  # noqa: E402
+from etl_store import DatasetStore  # noqa: E402
+from pagination import DEFAULT_PAGE_SIZE  # noqa: E402
+from table_format import TABLE_FORMATS, decode_table, encode_table, to_frame  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+TRACK_MEMORY = True
+REPEAT = 1
+CITIES = [" Lisbon", "berlin ", "PARIS", "Madrid", " rome ", "Oslo", "Vienna"]
+
+
+# --- Synthetic data --------------------------------------------------------
+def make_table(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Numeric, string, date and high-null columns, with ~5% duplicated rows."""
+    rng = np.random.default_rng(seed)
+    n_unique = max(1, int(n_rows * 0.95))
+    # Build one row per unique id, then repeat some ids so duplicates are full rows
+    unique = pd.DataFrame(
+        {
+            "id": np.arange(n_unique),
+            "age": rng.integers(-5, 130, n_unique),
+            "amount": rng.normal(100.0, 50.0, n_unique).round(2),
+            "name": np.char.add("Customer ", (np.arange(n_unique) % 50_000).astype(str)),
+            "city": rng.choice(CITIES, n_unique),
+            "created_at": (
+                pd.Timestamp("2020-01-01")
+                + pd.to_timedelta(rng.integers(0, 1_500, n_unique), unit="D")
+            ).strftime("%Y-%m-%d"),
+        }
+    )
+    # ~90% nulls
+    notes = pd.Series(np.char.add("note ", (np.arange(n_unique) % 97).astype(str)), dtype=object)
+    notes[rng.random(n_unique) < 0.9] = None
+    unique["notes"] = notes
+
+    ids = np.concatenate([np.arange(n_unique), rng.integers(0, n_unique, n_rows - n_unique)])
+    return unique.iloc[ids].reset_index(drop=True)
+
+
+# --- Tool arguments for the synthetic schema -------------------------------
+TOOL_ARGS = {
+    "profile_dataset": {},
+    "check_data_types": {"type_mapping": {"age": "int64", "amount": "float64", "city": "str"}},
+    "detect_and_report_anomalies": {"anomaly_rules": {"age": {"min": 0, "max": 120}}},
+    "remove_duplicates": {"subset_cols": None},
+    "dedupe_dataset": {"subset_cols": ["name", "city"], "normalize": True},
+    "handle_missing_values": {"strategy": {"notes": "unknown"}},
+    "standardize_values": {
+        "rules": {
+            "city": {"lower": True, "strip": True},
+            "created_at": {"date_format": "%d/%m/%Y"},
+        }
+    },
+    "enforce_constraints": {"constraints": {"name": {"not_null": True}}},
+    "transform_data": {
+        "transformation_rules": {
+            "rename_columns": {"amount": "amount_usd"},
+            "new_columns": {"amount_eur": "amount_usd * 0.92"},
+        }
+    },
+}
+
+TOOL_FUNCS = {
+    "profile_dataset": etl_mcp_server.profile_dataset_tool,
+    "check_data_types": etl_mcp_server.check_data_types_tool,
+    "detect_and_report_anomalies": etl_mcp_server.detect_and_report_anomalies_tool,
+    "remove_duplicates": etl_mcp_server.remove_duplicates_tool,
+    "dedupe_dataset": etl_mcp_server.dedupe_dataset_tool,
+    "handle_missing_values": etl_mcp_server.handle_missing_values_tool,
+    "standardize_values": etl_mcp_server.standardize_values_tool,
+    "enforce_constraints": etl_mcp_server.enforce_constraints_tool,
+    "transform_data": etl_mcp_server.transform_data_tool,
+}
+
+
+def _call(fn, **kwargs):
+    result = fn(**kwargs)
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)
+    return result
+
+
+def _uncached_call(fn, **kwargs):
+    # Repeated calls would otherwise be served from the server's result cache
+    etl_mcp_server.store = DatasetStore()
+    etl_mcp_server.profiles.clear()
+    return _call(fn, **kwargs)
+
+
+def _measure(fn, *args, **kwargs):
+    """Return (result, best-of-REPEAT seconds, peak_bytes) for one call.
+
+    tracemalloc slows allocation-heavy code (to_dict) by an order of magnitude, so
+    the call is timed untraced and repeated under tracemalloc for the peak.
+    """
+    elapsed = None
+    for _ in range(REPEAT):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        elapsed = seconds if elapsed is None else min(elapsed, seconds)
+    if not TRACK_MEMORY:
+        return result, elapsed, None
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _mb(value):
+    return value / 2**20 if value is not None else None
+
+
+def bench_read_csv(df: pd.DataFrame, tmp_dir: Path) -> dict:
+    path = tmp_dir / f"bench_{len(df)}.csv"
+    df.to_csv(path, index=False)
+    _, seconds, peak = _measure(_call, etl_mcp_server.read_csv_file_tool, path=str(path))
+    os.remove(path)
+    return {"tool": "read_csv_file", "total_s": seconds, "peak_mb": _mb(peak)}
+
+
+def bench_tool(name: str, records: list) -> dict:
+    """Split the tool time into input table construction, tool call and page encoding."""
+    frame, construct_s, construct_peak = _measure(to_frame, records)
+    del frame
+
+    page_s = page_peak = None
+    try:
+        result, total_s, total_peak = _measure(
+            _uncached_call, TOOL_FUNCS[name], data=records, **TOOL_ARGS[name]
+        )
+        error = None
+        if result.get("dataset_id"):
+            # The tool returns only one page of its output table
+            page = etl_mcp_server.store.get(result["dataset_id"]).head(DEFAULT_PAGE_SIZE)
+            _, page_s, page_peak = _measure(encode_table, page, "records")
+    except Exception as e:
+        total_s, total_peak, error = None, None, str(e)
+
+    row = {
+        "tool": name,
+        "construct_s": construct_s,
+        "page_s": page_s,
+        "total_s": total_s,
+        "peak_mb": _mb(total_peak),
+        "construct_peak_mb": _mb(construct_peak),
+        "page_peak_mb": _mb(page_peak),
+    }
+    if total_s:
+        # Share of the tool call spent building the input table and encoding the page
+        row["conversion_share"] = min(1.0, (construct_s + (page_s or 0.0)) / total_s)
+    if error:
+        row["error"] = error
+    return row
+
+
+def bench_formats(df: pd.DataFrame) -> list:
+    """Payload size, encode and decode time for each table wire format."""
+    rows = []
+    for fmt in TABLE_FORMATS:
+        try:
+            payload, encode_s, _ = _measure(encode_table, df, fmt)
+            text, dumps_s, _ = _measure(json.dumps, payload, default=str)
+            parsed = json.loads(text)
+            _, decode_s, decode_peak = _measure(decode_table, parsed)
+        except ValueError as e:
+            rows.append({"tool": f"format:{fmt}", "error": str(e)})
+            continue
+        rows.append(
+            {
+                "tool": f"format:{fmt}",
+                "payload_mb": len(text) / 2**20,
+                "encode_s": encode_s + dumps_s,
+                "decode_s": decode_s,
+                "total_s": encode_s + dumps_s + decode_s,
+                "peak_mb": _mb(decode_peak),
+            }
+        )
+    return rows
+
+
+def bench_parallel(df: pd.DataFrame) -> list:
+    """Per-column standardization and casting inline vs. on the process pool."""
+    workers = etl_parallel.PARALLEL_WORKERS
+    cases = {
+        "standardize": TOOL_ARGS["standardize_values"]["rules"],
+        "astype": {"age": "float64", "city": "category", "created_at": "datetime64[ns]"},
+    }
+    rows = []
+    for op, args in cases.items():
+        min_rows = etl_parallel.PARALLEL_MIN_ROWS
+        try:
+            etl_parallel.PARALLEL_WORKERS, etl_parallel.PARALLEL_MIN_ROWS = 1, 0
+            _, inline_s, _ = _measure(etl_parallel.map_columns, df.copy(), op, args)
+            etl_parallel.PARALLEL_WORKERS = max(2, workers)
+            # Start the pool outside the timed calls
+            etl_parallel.map_columns(df.head(10).copy(), op, args)
+            _, pool_s, peak = _measure(etl_parallel.map_columns, df.copy(), op, args)
+        finally:
+            etl_parallel.PARALLEL_WORKERS, etl_parallel.PARALLEL_MIN_ROWS = workers, min_rows
+        rows.append(
+            {
+                "tool": f"parallel:{op}",
+                "inline_s": inline_s,
+                "total_s": pool_s,
+                "speedup": inline_s / pool_s,
+                "workers": max(2, workers),
+                "peak_mb": _mb(peak),
+            }
+        )
+    return rows
+
+
+def _join_call(data_dir: Path, **kwargs):
+    # Every call starts from empty caches: the stored tables, indexes and output files
+    etl_mcp_server.store = DatasetStore()
+    etl_mcp_server.join_indexes.clear()
+    etl_mcp_server.DATA_DIR = tempfile.mkdtemp(dir=data_dir)
+    return _call(etl_mcp_server.join_datasets_tool, **kwargs)
+
+
+def _join_rows(result: dict) -> pd.DataFrame:
+    """Result rows in one form, whichever mode produced them, sorted for comparison."""
+    df = pd.DataFrame(result["data"])
+    df = pd.read_csv(io.StringIO(df.to_csv(index=False)))
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def bench_joins(df: pd.DataFrame, tmp_dir: Path) -> list:
+    """
+    The same left join (int64 CSV keys against float64 Parquet keys) in memory,
+    streamed and partitioned mode; every mode must return the rows of memory mode.
+    """
+    left_path = tmp_dir / f"join_left_{len(df)}.csv"
+    right_path = tmp_dir / f"join_right_{len(df)}.parquet"
+    df.to_csv(left_path, index=False)
+    ids = df["id"].drop_duplicates().iloc[::3].astype("float64")
+    reference = pd.DataFrame({"id": ids.to_numpy(), "segment": np.arange(len(ids)) % 7})
+    reference.loc[reference.index[::50], "id"] = np.nan
+    reference.to_parquet(right_path, index=False)
+    small = min(os.path.getsize(left_path), os.path.getsize(right_path))
+    limits = {
+        "memory": max(os.path.getsize(left_path), os.path.getsize(right_path)),
+        "streamed": small,
+        "partitioned": small - 1,
+    }
+
+    memory_bytes, partition_bytes = etl_join.JOIN_MEMORY_BYTES, etl_join.JOIN_PARTITION_BYTES
+    server_data_dir = etl_mcp_server.DATA_DIR
+    data_dir = Path(tempfile.mkdtemp(dir=tmp_dir))
+    rows, expected = [], None
+    try:
+        etl_join.JOIN_PARTITION_BYTES = max(1, small // 4)
+        for mode, limit in limits.items():
+            etl_join.JOIN_MEMORY_BYTES = limit
+            result, seconds, peak = _measure(
+                _join_call,
+                data_dir,
+                on=["id"],
+                how="left",
+                left_path=str(left_path),
+                right_path=str(right_path),
+                limit=0,
+            )
+            assert result["join"]["mode"] == mode, result["join"]["mode"]
+            got = _join_rows(result)
+            expected = got if expected is None else expected
+            try:
+                pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+                error = None
+            except AssertionError as e:
+                error = f"differs from memory mode: {e}"
+            row = {
+                "tool": f"join:{mode}",
+                "total_s": seconds,
+                "peak_mb": _mb(peak),
+                "output_rows": result["join"]["output_rows"],
+                "left_match_rate": result["join"]["left_match_rate"],
+                "identical": error is None,
+            }
+            if error:
+                row["error"] = error
+            rows.append(row)
+    finally:
+        etl_join.JOIN_MEMORY_BYTES, etl_join.JOIN_PARTITION_BYTES = memory_bytes, partition_bytes
+        etl_mcp_server.DATA_DIR = server_data_dir
+        shutil.rmtree(data_dir)
+        os.remove(left_path)
+        os.remove(right_path)
+    return rows
+
+
+def git_commit() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return "unknown"
+
+
+def run(sizes, tools) -> dict:
+    tmp_dir = RESULTS_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    rows = []
+    for n_rows in sizes:
+        df = make_table(n_rows)
+        records = df.to_dict(orient="records")
+        print(f"\n== {n_rows:,} rows ==", flush=True)
+        results = []
+        if "read_csv_file" in tools:
+            results.append(bench_read_csv(df, tmp_dir))
+        for name in tools:
+            if name in TOOL_FUNCS:
+                results.append(bench_tool(name, records))
+        if "formats" in tools:
+            results.extend(bench_formats(df))
+        if "parallel" in tools:
+            results.extend(bench_parallel(df))
+        if "joins" in tools:
+            results.extend(bench_joins(df, tmp_dir))
+        for row in results:
+            row["rows"] = n_rows
+            print(format_row(row), flush=True)
+        rows.extend(results)
+        del df, records
+    tmp_dir.rmdir()
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "repeat": REPEAT,
+        "results": rows,
+    }
+
+
+def format_row(row: dict) -> str:
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    if row["tool"].startswith("parallel:"):
+        return (
+            f"{row['tool']:<28} inline={row['inline_s']:7.3f}s "
+            f"pool={row['total_s']:7.3f}s x{row['speedup']:.2f} "
+            f"({row['workers']} workers)"
+        )
+    if row["tool"].startswith("join:"):
+        return (
+            f"{row['tool']:<28} total={row['total_s']:8.3f}s "
+            f"rows={row['output_rows']:,} match={row['left_match_rate']:.1%} "
+            f"peak={fmt(row.get('peak_mb'), '8.1f')}MB "
+            + (f"ERROR: {row['error']}" if row.get("error") else "identical")
+        )
+    if row["tool"].startswith("format:"):
+        if row.get("error"):
+            return f"{row['tool']:<28} ERROR: {row['error']}"
+        return (
+            f"{row['tool']:<28} payload={row['payload_mb']:8.2f}MB "
+            f"encode={row['encode_s']:7.3f}s decode={row['decode_s']:7.3f}s "
+            f"peak={fmt(row.get('peak_mb'), '8.1f')}MB"
+        )
+
+    return (
+        f"{row['tool']:<28} total={fmt(row.get('total_s'), '8.3f')}s "
+        f"construct={fmt(row.get('construct_s'), '7.3f')}s "
+        f"page={fmt(row.get('page_s'), '7.3f')}s "
+        f"conv={fmt(row.get('conversion_share'), '5.0%')} "
+        f"peak={fmt(row.get('peak_mb'), '8.1f')}MB"
+        + (f"  ERROR: {row['error']}" if row.get("error") else "")
+    )
+
+
+def compare(path_a: str, path_b: str):
+    """Print per-tool, per-size speedup of run B relative to run A."""
+    a = json.loads(Path(path_a).read_text())
+    b = json.loads(Path(path_b).read_text())
+    base = {(r["tool"], r["rows"]): r for r in a["results"]}
+    print(f"{a['commit']} -> {b['commit']}")
+    for row in b["results"]:
+        old = base.get((row["tool"], row["rows"]))
+        if not old or not old.get("total_s") or not row.get("total_s"):
+            continue
+        speedup = old["total_s"] / row["total_s"]
+        mem = (
+            f"{old['peak_mb']:.1f}->{row['peak_mb']:.1f}MB"
+            if old.get("peak_mb") is not None and row.get("peak_mb") is not None
+            else ""
+        )
+        print(
+            f"{row['tool']:<28} {row['rows']:>10,} rows  "
+            f"{old['total_s']:.3f}s -> {row['total_s']:.3f}s  x{speedup:.2f}  {mem}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL MCP tools.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--tools",
+        nargs="+",
+        default=["read_csv_file", *TOOL_FUNCS, "formats"],
+        choices=["read_csv_file", *TOOL_FUNCS, "formats", "parallel", "joins"],
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Best-of-N timing")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip the tracemalloc peak-memory pass"
+    )
+    parser.add_argument("--output", help="Where to store the results JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("RUN_A", "RUN_B"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    global TRACK_MEMORY, REPEAT
+    TRACK_MEMORY = not args.no_memory
+    REPEAT = max(1, args.repeat)
+    report = run(args.sizes, args.tools)
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"{report['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
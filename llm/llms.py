@@ -1,13 +1,16 @@
 import os
 from dotenv import load_dotenv
-from crewai import LLM
 
 # Load environment variables from .env file
 load_dotenv()
 
 
 # --- LLM Provider Functions (CrewAI best practices) ---
+# crewai is imported on first use, so importing this module (e.g. to list the
+# available LLMs) stays cheap
 def get_openai_llm(model, temperature):
+    from crewai import LLM
+
     api_key = os.getenv("OPENAI_API_KEY")
     api_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1/")
     return LLM(
@@ -19,6 +22,8 @@ def get_openai_llm(model, temperature):
 
 
 def get_groq_llm(model, temperature):
+    from crewai import LLM
+
     api_key = os.getenv("GROQ_API_KEY")
     return LLM(
         model=model,
@@ -28,6 +33,8 @@ def get_groq_llm(model, temperature):
 
 
 def get_ollama_llm(model, temperature):
+    from crewai import LLM
+
     host = os.getenv("OLLAMA_HOST")
     return LLM(
         model=model,
@@ -37,6 +44,8 @@ def get_ollama_llm(model, temperature):
 
 
 def get_gemini_llm(model, temperature):
+    from crewai import LLM
+
     api_key = os.getenv("GEMINI_API_KEY")
     return LLM(
         model=model,
@@ -75,3 +84,16 @@ def llama3_3_ollama(temperature=0.7):
 
 def llama3_3_groq(temperature=0.7):
     return get_groq_llm("groq/llama3.3:latest", temperature)
+
+
+# Models that can be requested by name (the `llm` tool argument and the app's model list)
+MODELS = {
+    "gpt_4_1_mini": gpt_4_1_mini,
+    "gpt_4_1_nano": gpt_4_1_nano,
+    "gemini_2_0_flash": gemini_2_0_flash,
+    "gemini_2_0_flash_lite": gemini_2_0_flash_lite,
+    "deepseek_r1_8b_ollama": deepseek_r1_8b_ollama,
+    "deepseek_r1_8b_groq": deepseek_r1_8b_groq,
+    "llama3_3_ollama": llama3_3_ollama,
+    "llama3_3_groq": llama3_3_groq,
+}
@@ -0,0 +1,143 @@
+"""
+Per-call token metrics, including how much of the input the provider served
+from its prompt cache.
+
+install() registers litellm success and failure callbacks (crewai calls every
+model through litellm). Each call is printed, kept in memory for summary(), and
+appended as a JSON line to LLM_METRICS_PATH when that is set. Functions in
+`listeners` get (model, seconds, ok) for every completion, successful or not;
+llm/router.py keeps its per-model latency from them.
+
+    python llm/metrics.py llm_metrics.jsonl    # cached vs. uncached tokens per model
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# JSON lines file for the call records (not written when empty)
+METRICS_PATH = os.getenv("LLM_METRICS_PATH", "")
+
+# Calls kept in memory per process
+MAX_RECORDS = int(os.getenv("LLM_METRICS_MAX_RECORDS", "1000"))
+
+records = deque(maxlen=MAX_RECORDS)
+listeners = []
+_lock = threading.Lock()
+_installed = False
+
+
+def _get(obj, name, default=None):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def cached_tokens(usage) -> int:
+    """Input tokens read from the prompt cache (OpenAI/Gemini or Anthropic usage format)."""
+    details = _get(usage, "prompt_tokens_details")
+    return int(
+        _get(details, "cached_tokens") or _get(usage, "cache_read_input_tokens") or 0
+    )
+
+
+def record(model: str, usage, seconds: float = None) -> dict:
+    prompt = int(_get(usage, "prompt_tokens") or 0)
+    cached = min(cached_tokens(usage), prompt)
+    entry = {
+        "time": time.time(),
+        "model": model,
+        "prompt_tokens": prompt,
+        "cached_tokens": cached,
+        "uncached_tokens": prompt - cached,
+        "completion_tokens": int(_get(usage, "completion_tokens") or 0),
+        "seconds": seconds,
+    }
+    with _lock:
+        records.append(entry)
+        if METRICS_PATH:
+            with open(METRICS_PATH, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+    print(
+        f"LLM {model}: {prompt} input tokens ({cached} cached),"
+        f" {entry['completion_tokens']} output",
+        flush=True,
+    )
+    return entry
+
+
+def _seconds(start_time, end_time):
+    try:
+        return (end_time - start_time).total_seconds()
+    except Exception:
+        return None
+
+
+def _notify(model: str, seconds, ok: bool):
+    for listener in list(listeners):
+        try:
+            listener(model, seconds, ok)
+        except Exception as e:
+            print(f"LLM metrics listener failed: {e}", flush=True)
+
+
+def _on_success(kwargs, response, start_time, end_time):
+    seconds = _seconds(start_time, end_time)
+    model = kwargs.get("model") or _get(response, "model") or "unknown"
+    record(model, _get(response, "usage"), seconds)
+    _notify(model, seconds, True)
+
+
+def _on_failure(kwargs, response, start_time, end_time):
+    _notify(kwargs.get("model") or "unknown", _seconds(start_time, end_time), False)
+
+
+def install():
+    """Registers the litellm callbacks once per process (a no-op without litellm)."""
+    global _installed
+    if _installed:
+        return
+    try:
+        import litellm
+    except ImportError:
+        return
+    litellm.success_callback.append(_on_success)
+    litellm.failure_callback.append(_on_failure)
+    _installed = True
+
+
+def summary(entries=None) -> dict:
+    """Per model: calls, input tokens, cached input tokens and cache hit rate."""
+    with _lock:
+        entries = list(records if entries is None else entries)
+    models = {}
+    for e in entries:
+        m = models.setdefault(
+            e["model"], {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "calls_with_hit": 0}
+        )
+        m["calls"] += 1
+        m["prompt_tokens"] += e["prompt_tokens"]
+        m["cached_tokens"] += e["cached_tokens"]
+        m["calls_with_hit"] += e["cached_tokens"] > 0
+    for m in models.values():
+        m["hit_rate"] = round(m["cached_tokens"] / m["prompt_tokens"], 3) if m["prompt_tokens"] else 0.0
+    return models
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else METRICS_PATH
+    if not path:
+        sys.exit("usage: python llm/metrics.py <metrics.jsonl> (or set LLM_METRICS_PATH)")
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    for model, m in summary(entries).items():
+        print(
+            f"{model}: {m['calls']} calls, {m['prompt_tokens']} input tokens,"
+            f" {m['cached_tokens']} cached ({m['hit_rate']:.0%}),"
+            f" {m['calls_with_hit']} calls hit the cache"
+        )
@@ -0,0 +1,38 @@
+"""
+Prompt layout helpers for provider prompt caching.
+
+Providers cache the longest prompt prefix they have seen recently (OpenAI and
+Gemini automatically, from about 1024 tokens). A crew sends the agent's role,
+backstory, goal and tool schemas first and the task description after them, so
+the cacheable prefix ends where the first changing byte is. These helpers keep
+that part identical between requests: tools in a fixed order, and task
+descriptions that start with their fixed instructions and end with the values
+of the request.
+"""
+
+
+def stable_tools(tools) -> list:
+    """Tools sorted by name, so their schemas render in the same order every time."""
+    seen, result = set(), []
+    for tool in sorted(tools, key=lambda t: t.name):
+        if tool.name not in seen:
+            seen.add(tool.name)
+            result.append(tool)
+    return result
+
+
+def task_prompt(instructions: str, **values) -> str:
+    """
+    Task description with the fixed instructions first and the request's values last.
+    Args:
+        instructions (str): Text that is the same for every request (no f-strings).
+        **values: Request values, rendered as "Label: value" lines in the given order.
+    Returns:
+        str: The description.
+    """
+    lines = [
+        f"{name.replace('_', ' ').capitalize()}: {value}"
+        for name, value in values.items()
+        if value is not None
+    ]
+    return instructions.strip() + "\n\n" + "\n".join(lines)
@@ -0,0 +1,272 @@
+"""
+Picks the LLM for each agent request.
+
+Simple lookups go to a fast, cheap model and multi-step analysis to a larger
+one. A user's explicit choice (the `llm` tool argument, a model name from
+llms.MODELS) is tried first. Rolling latency and error rates are kept per
+model from every completion (the llm/metrics.py litellm callbacks): models
+that keep failing are skipped for a cool-down, and local Ollama models go
+first when the cloud models are slow. A crew whose model fails with a
+provider error before any agent step finished is re-run on the next
+candidate; after a step a tool may have run (e.g. execute_sql), so the error
+is raised instead of repeating its side effects.
+
+    route = router.route(question, llm)
+    agent = Agent(..., llm=route.llm)
+    result = await route.kickoff_async(crew)
+
+Point OPENAI_API_BASE / OLLAMA_HOST at llm/stub_server.py to exercise the
+routing without calling real providers.
+"""
+
+import os
+import re
+import statistics
+import threading
+import time
+from collections import deque
+
+from llm import llms, metrics
+from runtime import cassette
+
+# Model names from llms.MODELS per tier, in order of preference
+FAST_MODELS = os.getenv("LLM_ROUTER_FAST", "gpt_4_1_nano,gemini_2_0_flash_lite").split(",")
+LARGE_MODELS = os.getenv("LLM_ROUTER_LARGE", "gpt_4_1_mini,gemini_2_0_flash").split(",")
+LOCAL_MODELS = os.getenv("LLM_ROUTER_LOCAL", "llama3_3_ollama,deepseek_r1_8b_ollama").split(",")
+
+# Local models go first when the cloud candidates' median seconds per completion is above this
+SLOW_SECONDS = float(os.getenv("LLM_ROUTER_SLOW_SECONDS", "20"))
+
+# A model with at least this error rate over its recent calls is skipped for COOLDOWN_SECONDS
+MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "120"))
+
+# Calls remembered per model (at most WINDOW, none older than MAX_AGE_SECONDS, so a
+# model that was slow gets another chance), and models tried per request
+WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "20"))
+MAX_AGE_SECONDS = float(os.getenv("LLM_ROUTER_MAX_AGE_SECONDS", "600"))
+MAX_ATTEMPTS = int(os.getenv("LLM_ROUTER_MAX_ATTEMPTS", "3"))
+
+# Questions that read like multi-step analysis get the larger model
+_MULTI_STEP_RE = re.compile(
+    r"\b(compare|comparison|versus|vs|analy[sz]e|analysis|trend|trends|why|explain|"
+    r"forecast|correlat\w*|summari[sz]e|then|step|steps|evaluate|recommend)\b",
+    re.IGNORECASE,
+)
+
+
+def classify(question: str) -> str:
+    """"large" for multi-step analysis, "fast" for simple lookups."""
+    words = len(question.split())
+    if words > 30 or question.count("?") > 1 or _MULTI_STEP_RE.search(question):
+        return "large"
+    return "fast"
+
+
+def is_provider_error(e: Exception) -> bool:
+    """Errors raised by the model provider (timeouts, rate limits, 5xx), not by tools.
+
+    litellm wraps the provider's transport errors in its own exceptions, so plain
+    httpx/connection errors come from elsewhere (e.g. the SSE link to a tool server).
+    """
+    module = type(e).__module__ or ""
+    return module.startswith(("litellm", "openai"))
+
+
+class ModelStats:
+    def __init__(self, window: int = WINDOW):
+        self.calls = deque(maxlen=window)
+        self.last_failure = None
+
+    def record(self, seconds: float, ok: bool):
+        self.calls.append((time.time(), seconds, ok))
+        if not ok:
+            self.last_failure = time.time()
+
+    def recent(self) -> list:
+        cutoff = time.time() - MAX_AGE_SECONDS
+        return [(seconds, ok) for at, seconds, ok in self.calls if at >= cutoff]
+
+    @property
+    def error_rate(self) -> float:
+        calls = self.recent()
+        if not calls:
+            return 0.0
+        return sum(not ok for _, ok in calls) / len(calls)
+
+    @property
+    def latency(self):
+        """Median seconds of the recent successful calls, None without any."""
+        latencies = [seconds for seconds, ok in self.recent() if ok]
+        return statistics.median(latencies) if latencies else None
+
+    def cooling_down(self) -> bool:
+        return (
+            len(self.recent()) >= 3
+            and self.error_rate >= MAX_ERROR_RATE
+            and time.time() - self.last_failure < COOLDOWN_SECONDS
+        )
+
+
+class Route:
+    """The ordered model candidates for one request."""
+
+    def __init__(self, router, candidates: list, tier: str):
+        self.router = router
+        self.candidates = candidates
+        self.tier = tier
+        self.model = candidates[0]
+        self.llm = router.make(self.model)
+        # Agent steps finished in the current attempt, counted by _watch
+        self.steps = 0
+        self._watched = set()
+
+    def _attempts(self):
+        for i, name in enumerate(self.candidates[:MAX_ATTEMPTS]):
+            if i > 0:
+                print(f"LLM router: failing over to {name}", flush=True)
+                self.model, self.llm = name, self.router.make(name)
+            yield name
+
+    def _retry(self, e: Exception) -> bool:
+        return is_provider_error(e) and not self.steps
+
+    def run(self, fn):
+        """Calls fn(llm), moving to the next candidate on provider errors raised
+        before any agent step finished."""
+        error = None
+        for _ in self._attempts():
+            self.steps = 0
+            try:
+                return fn(self.llm)
+            except Exception as e:
+                if not self._retry(e):
+                    raise
+                error = e
+        raise error
+
+    async def arun(self, fn):
+        """Async version of run: awaits fn(llm)."""
+        error = None
+        for _ in self._attempts():
+            self.steps = 0
+            try:
+                return await fn(self.llm)
+            except Exception as e:
+                if not self._retry(e):
+                    raise
+                error = e
+        raise error
+
+    def _counting(self, callback):
+        def step_callback(step):
+            self.steps += 1
+            if callback:
+                return callback(step)
+
+        return step_callback
+
+    def _watch(self, crew):
+        """Counts the crew's agent steps (a step may have run a tool), keeping its callbacks."""
+        if id(crew) in self._watched:
+            return
+        self._watched.add(id(crew))
+        crew.step_callback = self._counting(crew.step_callback)
+        # Agents without their own callback get the crew's at kickoff
+        for agent in crew.agents:
+            if agent.step_callback:
+                agent.step_callback = self._counting(agent.step_callback)
+
+    def _set_llm(self, crew, llm):
+        self._watch(crew)
+        for agent in crew.agents:
+            agent.llm = llm
+        return crew
+
+    def kickoff(self, crew):
+        return self.run(lambda llm: self._set_llm(crew, llm).kickoff())
+
+    async def kickoff_async(self, crew):
+        return await self.arun(lambda llm: self._set_llm(crew, llm).kickoff_async())
+
+
+class Router:
+    def __init__(self, fast=FAST_MODELS, large=LARGE_MODELS, local=LOCAL_MODELS):
+        self.tiers = {"fast": list(fast), "large": list(large), "local": list(local)}
+        self._stats = {}
+        # litellm model strings (with and without the provider prefix) -> llms.MODELS names
+        self._names = {}
+        self._lock = threading.Lock()
+        metrics.listeners.append(self._on_completion)
+
+    def make(self, name: str):
+        """Builds the LLM from its llm/llms.py factory."""
+        llm = llms.MODELS[name]()
+        model = getattr(llm, "model", None)
+        if model:
+            with self._lock:
+                self._names[model] = name
+                self._names.setdefault(model.split("/", 1)[-1], name)
+        # crewai has imported litellm by now; record cached vs. uncached input tokens,
+        # and record to / replay from MCP_CASSETTE when it is set
+        metrics.install()
+        cassette.install()
+        return llm
+
+    def record(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            self._stats.setdefault(name, ModelStats()).record(seconds, ok)
+
+    def _on_completion(self, model: str, seconds, ok: bool):
+        """metrics listener: one litellm completion of a model this router made."""
+        with self._lock:
+            name = self._names.get(model) or self._names.get(model.split("/", 1)[-1])
+        # A success without timing would skew the median; a failure counts regardless
+        if name and (seconds is not None or not ok):
+            self.record(name, seconds or 0.0, ok)
+
+    def _get(self, name: str) -> ModelStats:
+        with self._lock:
+            return self._stats.setdefault(name, ModelStats())
+
+    def _cloud_slow(self, names: list) -> bool:
+        latencies = [self._get(n).latency for n in names if n not in self.tiers["local"]]
+        latencies = [seconds for seconds in latencies if seconds is not None]
+        return bool(latencies) and min(latencies) > SLOW_SECONDS
+
+    def candidates(self, question: str, requested: str = None) -> tuple:
+        """(tier, model names to try in order) for a question."""
+        tier = classify(question)
+        # The other cloud tier is the failover for this one
+        other = "large" if tier == "fast" else "fast"
+        names = self.tiers[tier] + self.tiers[other]
+        if self._cloud_slow(self.tiers[tier]):
+            names = self.tiers["local"] + names
+        else:
+            names = names + self.tiers["local"]
+        if requested and requested != "auto" and requested in llms.MODELS:
+            names = [requested] + names
+        # Unknown names (e.g. a typo in LLM_ROUTER_*) are never tried
+        names = [n for i, n in enumerate(names) if n in llms.MODELS and n not in names[:i]]
+        # Models cooling down after repeated failures go last
+        return tier, sorted(names, key=lambda n: self._get(n).cooling_down())
+
+    def route(self, question: str, requested: str = None) -> Route:
+        tier, names = self.candidates(question, requested)
+        return Route(self, names, tier)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "calls": len(s.recent()),
+                    "error_rate": round(s.error_rate, 3),
+                    "median_latency": s.latency,
+                    "cooling_down": s.cooling_down(),
+                }
+                for name, s in self._stats.items()
+            }
+
+
+# Shared by the tools of a server process, so their calls feed the same statistics
+router = Router()
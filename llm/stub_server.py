@@ -0,0 +1,201 @@
+"""
+Local stand-in for the LLM providers, for testing the router without API keys.
+
+    python llm/stub_server.py --port 8200 --latency 0.2 --slow gpt-4.1-nano=5 --fail gemini-2.0-flash
+    OPENAI_API_BASE=http://127.0.0.1:8200/v1 OLLAMA_HOST=http://127.0.0.1:8200 ...
+
+Serves the OpenAI chat completions API (/v1/chat/completions) and the Ollama
+chat/generate API (/api/chat, /api/generate). Every answer names the model that
+produced it. --slow adds latency to one model, --fail makes one model return
+503, and --fail-rate makes any call fail with that probability.
+
+Like OpenAI's prompt caching, the stub remembers the prompts it has seen (per
+model, in blocks of about 128 tokens) and reports the reused prefix of prompts
+of at least --cache-min-tokens as usage.prompt_tokens_details.cached_tokens.
+GET /stats shows the calls and cache hit rate per model.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+
+# Characters per cache block (about 128 tokens at 4 characters per token)
+CACHE_BLOCK_CHARS = 512
+
+
+class PrefixCache:
+    """Longest previously seen prefix of a prompt, in whole blocks."""
+
+    def __init__(self, min_tokens: int = 1024):
+        self.min_chars = min_tokens * 4
+        self.seen = set()
+        self.stats = {}
+
+    def lookup(self, model: str, prompt: str) -> int:
+        """Records the prompt and returns its cached tokens."""
+        digest = hashlib.sha256(model.encode())
+        cached_blocks, hit = 0, True
+        for start in range(0, len(prompt) - CACHE_BLOCK_CHARS + 1, CACHE_BLOCK_CHARS):
+            digest.update(prompt[start : start + CACHE_BLOCK_CHARS].encode())
+            key = digest.hexdigest()
+            if hit and key in self.seen:
+                cached_blocks += 1
+            else:
+                hit = False
+                self.seen.add(key)
+        cached = cached_blocks * CACHE_BLOCK_CHARS // 4 if len(prompt) >= self.min_chars else 0
+        stats = self.stats.setdefault(model, {"prompt_tokens": 0, "cached_tokens": 0})
+        stats["prompt_tokens"] += len(prompt) // 4
+        stats["cached_tokens"] += cached
+        return cached
+
+
+def serialize_prompt(body: dict) -> str:
+    """The request as the provider sees it for caching: tool schemas, then the messages in order."""
+    parts = [json.dumps(body["tools"])] if body.get("tools") else []
+    for message in body.get("messages", []):
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content)
+        parts.append(f"<{message.get('role')}>{content}")
+    return "\n".join(parts)
+
+
+def create_app(
+    latency: float = 0.1,
+    fail_rate: float = 0.0,
+    slow: dict = None,
+    fail=(),
+    cache_min_tokens: int = 1024,
+):
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    slow = slow or {}
+    calls = {}
+    cache = PrefixCache(cache_min_tokens)
+
+    async def answer(model: str, messages: list):
+        """(text, error response or None) after the configured delay."""
+        model = model.split("/", 1)[-1]
+        calls[model] = calls.get(model, 0) + 1
+        await asyncio.sleep(latency + slow.get(model, 0))
+        if model in fail or random.random() < fail_rate:
+            error = {"error": {"message": f"stub: {model} unavailable", "type": "server_error"}}
+            return None, JSONResponse(error, status_code=503)
+        question = messages[-1]["content"] if messages else ""
+        if isinstance(question, list):
+            question = " ".join(part.get("text", "") for part in question)
+        return f"[{model}] Final Answer: stub answer to: {question[-200:]}", None
+
+    def usage(prompt: str, text: str, cached: int = 0) -> dict:
+        prompt_tokens = len(prompt) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": prompt_tokens + len(text) // 4,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    async def chat_completions(request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        text, error = await answer(body.get("model", "stub"), messages)
+        if error:
+            return error
+        prompt = serialize_prompt(body)
+        cached = cache.lookup(body.get("model", "stub"), prompt)
+        return JSONResponse(
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage(prompt, text, cached),
+            }
+        )
+
+    async def ollama_chat(request):
+        body = await request.json()
+        messages = body.get("messages") or [{"content": body.get("prompt", "")}]
+        text, error = await answer(body.get("model", "stub"), messages)
+        if error:
+            return error
+        reply = {
+            "model": body.get("model", "stub"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "done": True,
+            "prompt_eval_count": len(serialize_prompt({"messages": messages})) // 4,
+            "eval_count": len(text) // 4,
+        }
+        if request.url.path.endswith("/generate"):
+            reply["response"] = text
+        else:
+            reply["message"] = {"role": "assistant", "content": text}
+        return JSONResponse(reply)
+
+    async def models(request):
+        return JSONResponse({"object": "list", "data": [{"id": m} for m in sorted(calls)]})
+
+    async def stats(request):
+        cache_stats = {
+            model: {**m, "hit_rate": round(m["cached_tokens"] / max(m["prompt_tokens"], 1), 3)}
+            for model, m in cache.stats.items()
+        }
+        return JSONResponse({"calls": calls, "prefix_cache": cache_stats})
+
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/chat/completions", chat_completions, methods=["POST"]),
+            Route("/api/chat", ollama_chat, methods=["POST"]),
+            Route("/api/generate", ollama_chat, methods=["POST"]),
+            Route("/v1/models", models),
+            Route("/stats", stats),
+        ]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI/Ollama endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per call")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--slow", action="append", default=[], help="MODEL=SECONDS extra latency"
+    )
+    parser.add_argument("--fail", action="append", default=[], help="MODEL that always fails")
+    parser.add_argument(
+        "--cache-min-tokens",
+        type=int,
+        default=1024,
+        help="Shortest prompt whose prefix is reported as cached",
+    )
+    args = parser.parse_args()
+
+    slow = {}
+    for item in args.slow:
+        model, seconds = item.rsplit("=", 1)
+        slow[model] = float(seconds)
+
+    import uvicorn
+
+    app = create_app(args.latency, args.fail_rate, slow, set(args.fail), args.cache_min_tokens)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
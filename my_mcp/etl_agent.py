@@ -1,71 +1,116 @@
 from fastmcp import FastMCP
-from langchain_openai import ChatOpenAI
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import MCPServerAdapter
-from mcp import StdioServerParameters
 from dotenv import load_dotenv
+import asyncio
+import os
+import sys
+from pathlib import Path
+from etl_tool_server import EtlToolServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.jobs import JobManager, register_job_tools, report_progress
+from runtime.lazy import preload_in_background
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools, task_prompt
+from llm.router import router
 
 # Load env vars
 load_dotenv()
 
 mcp = FastMCP("etl-agent")
+jobs = JobManager()
+register_job_tools(mcp, jobs)
+
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
+
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "etl_agent", jobs=jobs)
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
+
+# When set (e.g. http://127.0.0.1:8006/sse), use a standalone ETL server over SSE
+# instead of spawning my_mcp/etl_mcp_server.py next to this agent
+ETL_SERVER_URL = os.getenv("ETL_SERVER_URL")
+
+# Started on the first question and kept warm for the following ones
+etl_tools = EtlToolServer(ETL_SERVER_URL)
+
+
+# Same for every request, so it belongs before the file and the question
+ETL_TASK_INSTRUCTIONS = (
+    "You have access to the uploaded CSV file given below and must carry out the task given below."
+    " Available tools include: reading data, profiling data, checking data types, detecting anomalies, removing duplicates, handling missing values, standardizing values, enforcing constraints, transforming data, and running SQL queries."
+    " Start with profile_dataset on the file: one pass returns per-column types, null rates, distinct counts, quantiles, top values and candidate keys, so you do not need to read rows to understand the data."
+    " For tools that require specific parameters (e.g., rules, columns, strategies, type mappings) that the user did not give, propose concrete values based on the profile (suggested_type_mapping, quantiles, null rates, candidate_keys) and run the tool with them unless they would drop or overwrite data; in that case present the proposal and ask the user to confirm it."
+    " Do not invent values the profile does not support."
+    " Every tool stores its output table and returns only a page of it with a dataset_id, total_rows and next_cursor."
+    " To chain tools, pass the dataset_id from the previous result instead of the rows. Never copy rows from one tool into another."
+    " For counts, sums, averages, group-bys and filters, run query_dataset with SQL over the file or dataset_id instead of reading rows and computing them yourself; it returns only the result."
+    " Use fetch_rows (with sort_by/filters if useful) only when you need rows beyond the preview."
+    " When you run a tool and it returns a changed table, present the preview rows and the total_rows count to the user."
+    " If the tool result is empty or unchanged (e.g. no duplicates found), just say 'No changes needed.'"
+)
 
 
 @mcp.tool(name="etl_tool")
-async def get_data_engineer_agent(question: str, csv_path: str = None) -> str:
-    serverparams = StdioServerParameters(
-        command="python",
-        args=["my_mcp/etl_mcp_server.py"],
+async def get_data_engineer_agent(
+    question: str, csv_path: str = None, dataset_handle: str = None, llm: str = None
+) -> str:
+    from crewai import Agent, Task, Crew, Process
+
+    tools = stable_tools(compactor.wrap(await asyncio.to_thread(etl_tools.tools)))
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+
+    agent = Agent(
+        role="Senior Data Engineer",
+        goal=(
+            "Automate end-to-end ETL pipelines: read, validate, clean, transform, and load data from CSV to Postgres. Always ensure best practices for data quality, robustness, and auditability."
+        ),
+        backstory=(
+            "You are a senior data engineer with expertise in robust data pipelines. You can chain advanced ETL tools (MCP) and always follow best practices for data quality and governance."
+        ),
+        tools=tools,
+        llm=route.llm,
+        verbose=True,
     )
 
-    mcp_server_adapter = None
-
-    try:
-        mcp_server_adapter = MCPServerAdapter(serverparams)
-        tools = mcp_server_adapter.tools
-        llm = ChatOpenAI(model="gpt-4.1-mini")
-
-        agent = Agent(
-            role="Senior Data Engineer",
-            goal=(
-                "Automate end-to-end ETL pipelines: read, validate, clean, transform, and load data from CSV to Postgres. Always ensure best practices for data quality, robustness, and auditability."
-            ),
-            backstory=(
-                "You are a senior data engineer with expertise in robust data pipelines. You can chain advanced ETL tools (MCP) and always follow best practices for data quality and governance."
-            ),
-            tools=tools,
-            llm=llm,
-            verbose=True,
-        )
-
-        task = Task(
-            description=(
-                f"You have access to the uploaded CSV file at: {csv_path}."
-                f" Your task is: {question}"
-                "Available tools include: reading data, checking data types, detecting anomalies, removing duplicates, handling missing values, standardizing values, enforcing constraints, and transforming data."
-                "For tools that require specific parameters (e.g., rules, columns, strategies, type mappings), do NOT run the tool until you have all required details from the user."
-                " If the user's request is missing necessary information (such as columns to process, anomaly rules, type mappings, or strategies), respond by asking the user exactly what is needed. Do not guess."
-                "When you run a tool and it returns a changed table, always present the table to the user."
-                " If the tool result is empty or unchanged (e.g. no duplicates found), just say 'No changes needed.'"
-            ),
-            expected_output="Return what you have found or done with the data.",
-            tools=tools,
-            agent=agent,
-            verbose=True,
-        )
-        crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True,
-        )
-        result = await crew.kickoff_async()
-        return result
-
-    finally:
-        if mcp_server_adapter:
-            mcp_server_adapter.stop()
+    task = Task(
+        # Fixed instructions first, the request last: the prompt prefix stays cacheable
+        description=task_prompt(
+            ETL_TASK_INSTRUCTIONS,
+            file=f"{dataset_handle or csv_path} (pass it as the path of read_csv_file and profile_dataset)",
+            task=question,
+        ),
+        expected_output="Return what you have found or done with the data.",
+        tools=tools,
+        agent=agent,
+        verbose=True,
+    )
+    crew = Crew(
+        agents=[agent],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=True,
+        step_callback=lambda step: report_progress("Agent step finished"),
+    )
+    result = await route.kickoff_async(crew)
+    return result
+
+
+@mcp.tool(name="submit_etl_tool")
+async def submit_etl_tool(
+    question: str, csv_path: str = None, dataset_handle: str = None, llm: str = None
+) -> dict:
+    """Starts etl_tool as a background job and returns its job_id at once."""
+    return await jobs.submit(
+        "etl_tool", get_data_engineer_agent, question, csv_path, dataset_handle, llm
+    )
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8001)
+    mcp.run(transport="sse", host=server_host(), port=server_port("etl_agent"))
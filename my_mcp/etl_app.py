@@ -5,6 +5,25 @@ import json
 import pandas as pd
 import tempfile
 import os
+import io
+import hashlib
+import base64
+import sys
+from pathlib import Path
+from table_format import decode_table, is_encoded_table
+
+# Server URLs come from servers.toml at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_url  # noqa: E402
+
+# Rows of the uploaded file rendered in the UI; the agent pages through the rest
+PREVIEW_ROWS = 1000
+
+# Standalone ETL server (etl_mcp_server.py --sse). When set, uploads are streamed
+# to it and the agent gets a dataset handle instead of a local file path.
+ETL_SERVER_URL = os.getenv("ETL_SERVER_URL")
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_RETRIES = 3
 
 st.set_page_config(page_title="Data Engineer ETL Assistant", layout="centered")
 st.title("Senior Data Engineer AI Assistant")
@@ -15,32 +34,91 @@ st.write("""
 """)
 
 # Session state init
+if "upload_dir" not in st.session_state:
+    # One temp directory per session; TemporaryDirectory removes it when the
+    # session state is garbage collected after the session ends
+    st.session_state.upload_dir = tempfile.TemporaryDirectory(prefix="etl_upload_")
 if "csv_path" not in st.session_state:
     st.session_state.csv_path = None
-if "csv_data" not in st.session_state:
-    st.session_state.csv_data = None
+if "csv_hash" not in st.session_state:
+    st.session_state.csv_hash = None
+if "csv_df" not in st.session_state:
+    st.session_state.csv_df = None
+if "csv_handle" not in st.session_state:
+    st.session_state.csv_handle = None
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+
+async def upload_to_etl_server(raw, filename: str, digest: str) -> str:
+    """Streams the file to the ETL server in resumable chunks; returns its dataset handle."""
+    client = Client(ETL_SERVER_URL)
+    async with client:
+
+        async def call(tool, args):
+            result = await client.call_tool(tool, args)
+            return json.loads(result[0].text)
+
+        status = await call(
+            "begin_upload",
+            {"filename": filename, "total_size": len(raw), "sha256": digest},
+        )
+        upload_id, offset, failures = status["upload_id"], status["received"], 0
+        while not status.get("complete") and offset < len(raw):
+            chunk = base64.b64encode(raw[offset : offset + UPLOAD_CHUNK_BYTES]).decode()
+            try:
+                status = await call(
+                    "upload_chunk",
+                    {"upload_id": upload_id, "offset": offset, "chunk": chunk},
+                )
+            except Exception:
+                failures += 1
+                if failures > UPLOAD_RETRIES:
+                    raise
+                # Resume from whatever the server actually has
+                status = await call("upload_status", {"upload_id": upload_id})
+            offset = status["received"]
+        if not status.get("complete"):
+            status = await call("finish_upload", {"upload_id": upload_id})
+        return status["dataset_handle"]
+
+
 # File upload widget
 uploaded_file = st.file_uploader("Upload your CSV", type=["csv"], key="csv_upload")
 
-# On upload, show as dataframe and store in session
+# On upload, parse and save the file once per distinct content; every chat
+# message reruns this script, so reruns with the same file reuse the session copy
 if uploaded_file:
-    # Read and display CSV immediately
-    df = pd.read_csv(uploaded_file)
-    st.dataframe(df)
-    st.session_state.csv_data = df.to_dict(orient="records")  # For AI agent context
-    # Save to temp path for agent tools (if needed)
-    temp_dir = tempfile.mkdtemp()
-    temp_csv_path = os.path.join(temp_dir, uploaded_file.name)
-    with open(temp_csv_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    st.session_state.csv_path = temp_csv_path
-
-# If no new upload, but session already has CSV data, show it
-elif st.session_state.csv_data:
-    st.dataframe(pd.DataFrame(st.session_state.csv_data))
+    raw = uploaded_file.getbuffer()
+    digest = hashlib.sha256(raw).hexdigest()
+    if digest != st.session_state.csv_hash:
+        df = pd.read_csv(io.BytesIO(raw))
+        if st.session_state.csv_path and os.path.exists(st.session_state.csv_path):
+            os.remove(st.session_state.csv_path)
+        st.session_state.csv_path = None
+        st.session_state.csv_handle = None
+        if ETL_SERVER_URL:
+            # Stream to the ETL server; agent and tools use the returned handle
+            with st.spinner("Uploading to the ETL server..."):
+                st.session_state.csv_handle = asyncio.run(
+                    upload_to_etl_server(raw, uploaded_file.name, digest)
+                )
+        else:
+            # Save to temp path for agent tools, replacing the previous upload
+            temp_csv_path = os.path.join(
+                st.session_state.upload_dir.name, f"{digest[:16]}_{uploaded_file.name}"
+            )
+            with open(temp_csv_path, "wb") as f:
+                f.write(raw)
+            st.session_state.csv_path = temp_csv_path
+        st.session_state.csv_df = df
+        st.session_state.csv_hash = digest
+
+# Show the current upload (also when the uploader was cleared on a rerun)
+if st.session_state.csv_df is not None:
+    df = st.session_state.csv_df
+    st.dataframe(df.head(PREVIEW_ROWS))
+    st.caption(f"Showing {min(len(df), PREVIEW_ROWS):,} of {len(df):,} rows")
 
 # ---- Display chat history ----
 for message in st.session_state.messages:
@@ -49,13 +127,25 @@ for message in st.session_state.messages:
 
 
 # Helper: Call the MCP agent server via SSE
-async def call_agent(question: str, csv_path: str = None):
-    client = Client("http://127.0.0.1:8001/sse")
+async def call_agent(question: str, csv_path: str = None, dataset_handle: str = None):
+    client = Client(server_url("etl_agent"))
     context = {"question": question}
     if csv_path:
         context["csv_path"] = csv_path
+    if dataset_handle:
+        context["dataset_handle"] = dataset_handle
     async with client:
-        result = await client.call_tool("etl_tool", context)
+        # Run the crew as a background job and long-poll it until it finishes
+        result = await client.call_tool("submit_etl_tool", context)
+        job_id = json.loads(result[0].text)["job_id"]
+        while True:
+            result = await client.call_tool("wait_job", {"job_id": job_id, "timeout": 20})
+            status = json.loads(result[0].text)
+            if status["state"] in ("succeeded", "failed", "cancelled"):
+                break
+        if status["state"] != "succeeded":
+            raise RuntimeError(status["error"] or f"Job {status['state']}.")
+        result = await client.call_tool("job_result", {"job_id": job_id})
         return result[0].text if result and hasattr(result[0], "text") else str(result)
 
 
@@ -67,7 +157,11 @@ if prompt := st.chat_input("Ask me anything about your uploaded data..."):
     with st.chat_message("assistant"):
         with st.spinner("The agent is thinking..."):
             try:
-                response = asyncio.run(call_agent(prompt, st.session_state.csv_path))
+                response = asyncio.run(
+                    call_agent(
+                        prompt, st.session_state.csv_path, st.session_state.csv_handle
+                    )
+                )
                 # Try to display as DataFrame or pretty JSON if agent returns tabular result
                 try:
                     resp_json = json.loads(response)
@@ -88,7 +182,22 @@ if prompt := st.chat_input("Ask me anything about your uploaded data..."):
 
                 try:
                     data = json.loads(display_data)
-                    if isinstance(data, list) and all(
+                    # Tool results may carry a columnar/Arrow table under "data"
+                    if isinstance(data, dict) and "total_rows" in data:
+                        # Paginated tool result: render the page, report the total
+                        page = decode_table(data["data"])
+                        st.dataframe(page)
+                        st.caption(
+                            f"Showing {len(page):,} of {data['total_rows']:,} rows"
+                        )
+                        response = None
+                    elif isinstance(data, dict) and is_encoded_table(data.get("data")):
+                        st.dataframe(decode_table(data["data"]))
+                        response = None
+                    elif is_encoded_table(data):
+                        st.dataframe(decode_table(data))
+                        response = None
+                    elif isinstance(data, list) and all(
                         isinstance(row, dict) for row in data
                     ):
                         df = pd.DataFrame(data)
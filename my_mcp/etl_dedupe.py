@@ -0,0 +1,252 @@
+import heapq
+import itertools
+import os
+import pickle
+import tempfile
+import time
+from typing import Callable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from etl_validate import canonical_keys, key_hashes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Target size of one spilled partition; each is deduplicated in memory on its own
+DEDUPE_PARTITION_BYTES = int(os.getenv("ETL_DEDUPE_PARTITION_BYTES", str(64 * 1024**2)))
+MAX_PARTITIONS = 256
+
+# Most duplicated keys reported
+TOP_DUPLICATE_KEYS = 10
+
+ROW = "__row"
+EXACT = "__exact"
+KEY = "__key"
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def normalize_keys(keys: pd.DataFrame) -> pd.DataFrame:
+    """Near-duplicate form of string keys: lowercase, trimmed, single spaces."""
+    keys = keys.copy()
+    for col in keys.columns:
+        s = keys[col]
+        if pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+            text = s.astype(str).str.lower().str.strip().str.replace(r"\s+", " ", regex=True)
+            keys[col] = text.where(s.notna())
+    return keys
+
+
+def partition_count(total_bytes: int) -> int:
+    """Partitions needed for each to stay around DEDUPE_PARTITION_BYTES."""
+    return int(min(MAX_PARTITIONS, max(1, -(-total_bytes // DEDUPE_PARTITION_BYTES))))
+
+
+def spill(files: list, frame: pd.DataFrame, hashes: np.ndarray, partitions: int):
+    """Appends the rows of frame to the spill file of their hash partition."""
+    part = (hashes % np.uint64(partitions)).astype(np.int64)
+    order = np.argsort(part, kind="stable")
+    bounds = np.searchsorted(part[order], np.arange(partitions + 1))
+    for p in range(partitions):
+        rows = order[bounds[p] : bounds[p + 1]]
+        if len(rows):
+            pickle.dump(frame.iloc[rows], files[p], protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_partition(path: str) -> pd.DataFrame:
+    """All pieces spilled to path, in the order they were appended (None if empty)."""
+    pieces = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                pieces.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(pieces, ignore_index=True) if pieces else None
+
+
+def dedupe(
+    read_chunks: Callable[[], Iterator[pd.DataFrame]],
+    write: Callable[[pd.DataFrame], None],
+    subset_cols: List[str] = None,
+    normalize: bool = False,
+    keep: str = "first",
+    partitions: int = 1,
+    spill_dir: str = None,
+) -> dict:
+    """
+    Removes duplicate rows from a table that need not fit in memory.
+    Args:
+        read_chunks (Callable): Returns a fresh iterator over the table's chunks; it is
+            read twice (keys, then the rows to keep).
+        write (Callable): Receives the deduplicated table chunk by chunk, in input order.
+        subset_cols (List[str], optional): Key columns (default: all columns).
+        normalize (bool, optional): Treat string keys that differ only in case or
+            whitespace as duplicates (default False).
+        keep (str, optional): "first" (default) or "last" occurrence of each key.
+        partitions (int, optional): Hash partitions spilled to disk (see partition_count).
+        spill_dir (str, optional): Directory for the spill files (default: system temp).
+    Returns:
+        dict: {"rows_in", "rows_out", "duplicates_removed", "duplicate_keys",
+            "top_duplicate_keys", "near_duplicates", "partitions", "spilled_bytes",
+            "peak_memory_bytes", "max_rss_bytes", "seconds"}
+    """
+    if keep not in ("first", "last"):
+        raise ValueError("keep must be 'first' or 'last'.")
+    start = time.perf_counter()
+    peak = 0
+    rows_in = 0
+    with tempfile.TemporaryDirectory(prefix="dedupe-", dir=spill_dir) as tmp:
+        # Pass 1: spill only the key columns (and row numbers) by hash partition
+        paths = [os.path.join(tmp, f"part-{p}.pkl") for p in range(partitions)]
+        files = [open(path, "wb") for path in paths]
+        key_cols = subset_cols
+        try:
+            for chunk in read_chunks():
+                if key_cols is None:
+                    key_cols = list(chunk.columns)
+                missing = [c for c in key_cols if c not in chunk.columns]
+                if missing:
+                    raise KeyError(missing[0])
+                keys = chunk[key_cols].reset_index(drop=True)
+                # Keys are hashed in canonical form, so 1, 1.0 and "1" from chunks of
+                # different dtypes land in the same partition and compare equal there
+                if normalize:
+                    keys[EXACT] = key_hashes(canonical_keys(keys, key_cols), key_cols)
+                    keys[key_cols] = normalize_keys(keys[key_cols])
+                hashes = key_hashes(canonical_keys(keys, key_cols), key_cols)
+                keys[KEY] = hashes
+                keys[ROW] = np.arange(rows_in, rows_in + len(chunk), dtype=np.int64)
+                peak = max(peak, int(chunk.memory_usage(deep=True).sum()))
+                spill(files, keys, hashes, partitions)
+                rows_in += len(chunk)
+        finally:
+            for f in files:
+                f.close()
+        spilled = sum(os.path.getsize(path) for path in paths)
+
+        # Pass 2: dedupe each partition on its own and mark the rows to keep
+        kept = np.zeros(rows_in, dtype=bool)
+        duplicate_keys = near = 0
+        top = []
+        seq = itertools.count()
+        for path in paths:
+            frame = load_partition(path)
+            os.remove(path)
+            if frame is None:
+                continue
+            peak = max(peak, int(frame.memory_usage(deep=True).sum()))
+            # Pieces were appended in input order, so row order within the partition holds
+            dup = frame.duplicated(subset=[KEY], keep=keep).to_numpy()
+            kept[frame[ROW].to_numpy()[~dup]] = True
+
+            groups = frame.groupby(KEY, sort=False)
+            sizes = groups[ROW].transform("size").to_numpy()
+            first = (sizes > 1) & ~dup
+            counts = frame.loc[first, key_cols].assign(count=sizes[first])
+            duplicate_keys += len(counts)
+            for row in counts.nlargest(TOP_DUPLICATE_KEYS, "count").itertuples(index=False):
+                key = [None if pd.isna(v) else _plain(v) for v in row[:-1]]
+                # The sequence number breaks ties, so keys are never compared
+                item = (int(row[-1]), next(seq), key)
+                if len(top) < TOP_DUPLICATE_KEYS:
+                    heapq.heappush(top, item)
+                else:
+                    heapq.heappushpop(top, item)
+            if normalize:
+                # Duplicates whose original key differs from the kept row's
+                kept_exact = groups[EXACT].transform(keep).to_numpy()
+                near += int(np.count_nonzero(dup & (frame[EXACT].to_numpy() != kept_exact)))
+            del frame, groups
+
+        # Pass 3: stream the table again and write the kept rows in input order
+        rows_out = offset = 0
+        for chunk in read_chunks():
+            mask = kept[offset : offset + len(chunk)]
+            offset += len(chunk)
+            out = chunk[mask]
+            rows_out += len(out)
+            write(out)
+
+    report = {
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "duplicates_removed": rows_in - rows_out,
+        "duplicate_keys": duplicate_keys,
+        "top_duplicate_keys": [
+            {"key": dict(zip(key_cols or [], key)), "count": count}
+            for count, _, key in sorted(top, key=lambda item: -item[0])
+        ],
+        "partitions": partitions,
+        "spilled_bytes": spilled,
+        "peak_memory_bytes": peak + kept.nbytes,
+        "max_rss_bytes": (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None
+        ),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if normalize:
+        report["near_duplicates"] = near
+    return report
+
+
+def dedupe_file(path: str, output_path: str, encoding: str = "utf-8", **options) -> dict:
+    """
+    Dedupes a CSV or Parquet file into output_path (same format, CSV written as UTF-8);
+    see dedupe() for options.
+    """
+    from etl_profile import iter_file_chunks
+
+    parquet = path.lower().endswith((".parquet", ".pq"))
+    writer = None
+    header = True
+
+    def write(chunk: pd.DataFrame):
+        nonlocal writer, header
+        if parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Chunks are cast to the input's schema: pandas gives an int column with
+            # nulls as float64 in one chunk and int64 in the next, and an empty
+            # chunk's strings as nulls
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, pq.ParquetFile(path).schema_arrow)
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            )
+        else:
+            chunk.to_csv(
+                output_path,
+                mode="w" if header else "a",
+                header=header,
+                index=False,
+                encoding="utf-8",
+            )
+            header = False
+
+    options.setdefault("partitions", partition_count(os.path.getsize(path)))
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    try:
+        report = dedupe(lambda: iter_file_chunks(path, encoding), write, **options)
+    finally:
+        if writer is not None:
+            writer.close()
+    report["output_path"] = output_path
+    return report
+
+
+def dedupe_frame(df: pd.DataFrame, **options):
+    """(deduplicated df, report) for a table already in memory; see dedupe() for options."""
+    from etl_profile import iter_frame_chunks
+
+    out = []
+    options.setdefault("partitions", partition_count(int(df.memory_usage(deep=True).sum())))
+    report = dedupe(lambda: iter_frame_chunks(df), out.append, **options)
+    return (pd.concat(out) if out else df.iloc[0:0]), report
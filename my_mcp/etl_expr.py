@@ -0,0 +1,433 @@
+import ast
+import operator
+from functools import lru_cache
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Limits on what an expression may look like (they come from LLM-written rules)
+MAX_EXPRESSION_CHARS = 2000
+MAX_EXPRESSION_NODES = 300
+MAX_CONSTANT_CHARS = 1000
+
+
+def _is_text(value) -> bool:
+    if isinstance(value, str):
+        return True
+    if not isinstance(value, pd.Series):
+        return False
+    if pd.api.types.is_object_dtype(value):
+        # Object columns hold numbers too; any string in them makes them text
+        kind = pd.api.types.infer_dtype(value, skipna=True)
+        return kind in ("string", "bytes", "mixed", "mixed-integer")
+    return pd.api.types.is_string_dtype(value)
+
+
+def _multiply(left, right):
+    # A string column times a number would repeat every string that many times
+    if _is_text(left) or _is_text(right):
+        raise ValueError("* only multiplies numbers; use concat() to join strings.")
+    return left * right
+
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _multiply,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    # & | on conditions, as in DataFrame.eval
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+}
+
+_COMPARE = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+_DATE_UNITS = {"days": "D", "hours": "h", "minutes": "min", "seconds": "s", "weeks": "W"}
+
+
+def _dates(x):
+    if isinstance(x, pd.Series) and pd.api.types.is_datetime64_any_dtype(x):
+        return x
+    return pd.to_datetime(x, errors="coerce")
+
+
+def _unit(unit: str) -> str:
+    if unit not in _DATE_UNITS:
+        raise ValueError(f"Unknown date unit '{unit}'. Use one of {sorted(_DATE_UNITS)}.")
+    return _DATE_UNITS[unit]
+
+
+def _round(x, digits=0):
+    return x.round(int(digits)) if isinstance(x, pd.Series) else round(x, int(digits))
+
+
+def _substr(x, start, length=None):
+    start = int(start)
+    return x.str.slice(start, None if length is None else start + int(length))
+
+
+def _int(x):
+    numbers = pd.to_numeric(x, errors="coerce").replace([np.inf, -np.inf], np.nan)
+    return np.trunc(numbers).astype("Int64")
+
+
+def _coalesce(first, *rest):
+    for value in rest:
+        first = first.fillna(value)
+    return first
+
+
+def _concat(first, *rest):
+    # Null if any part is null, like SQL ||; literal parts are not made into columns
+    out = first.astype("string")
+    for value in rest:
+        if isinstance(value, pd.Series):
+            out = out + value.astype("string")
+        else:
+            out = out + (pd.NA if value is None else str(value))
+    return out
+
+
+
+def _elementwise(fn):
+    def apply(first, *rest):
+        out = first
+        for value in rest:
+            out = pd.Series(fn(out, value), index=first.index)
+        return out
+
+    return apply
+
+
+# name -> (function, min args, max args, leading arguments broadcast to columns)
+FUNCTIONS = {
+    # numbers
+    "abs": (np.abs, 1, 1, 1),
+    "round": (_round, 1, 2, 0),
+    "floor": (np.floor, 1, 1, 1),
+    "ceil": (np.ceil, 1, 1, 1),
+    "sqrt": (np.sqrt, 1, 1, 1),
+    "log": (np.log, 1, 1, 1),
+    "exp": (np.exp, 1, 1, 1),
+    "clip": (lambda x, low, high: x.clip(low, high), 3, 3, 1),
+    "min": (_elementwise(np.fmin), 2, 10, 1),
+    "max": (_elementwise(np.fmax), 2, 10, 1),
+    "to_number": (lambda x: pd.to_numeric(x, errors="coerce"), 1, 1, 1),
+    "int": (_int, 1, 1, 1),
+    "float": (lambda x: pd.to_numeric(x, errors="coerce").astype("float64"), 1, 1, 1),
+    # missing values
+    "isnull": (lambda x: x.isna(), 1, 1, 1),
+    "notnull": (lambda x: x.notna(), 1, 1, 1),
+    "coalesce": (_coalesce, 2, 10, 1),
+    "if_else": (lambda cond, a, b: a.where(cond.fillna(False).astype(bool), b), 3, 3, 2),
+    # strings
+    "str": (lambda x: x.astype("string"), 1, 1, 1),
+    "lower": (lambda x: x.str.lower(), 1, 1, 1),
+    "upper": (lambda x: x.str.upper(), 1, 1, 1),
+    "strip": (lambda x: x.str.strip(), 1, 1, 1),
+    "length": (lambda x: x.str.len(), 1, 1, 1),
+    "substr": (_substr, 2, 3, 1),
+    "replace": (lambda x, old, new: x.str.replace(old, new, regex=False), 3, 3, 1),
+    "contains": (lambda x, s: x.str.contains(s, regex=False), 2, 2, 1),
+    "startswith": (lambda x, s: x.str.startswith(s), 2, 2, 1),
+    "endswith": (lambda x, s: x.str.endswith(s), 2, 2, 1),
+    "concat": (_concat, 2, 10, 1),
+    # dates
+    "to_date": (
+        lambda x, fmt=None: pd.to_datetime(x, format=fmt, errors="coerce"),
+        1,
+        2,
+        1,
+    ),
+    "year": (lambda x: _dates(x).dt.year, 1, 1, 1),
+    "month": (lambda x: _dates(x).dt.month, 1, 1, 1),
+    "day": (lambda x: _dates(x).dt.day, 1, 1, 1),
+    "weekday": (lambda x: _dates(x).dt.weekday, 1, 1, 1),
+    "format_date": (lambda x, fmt: _dates(x).dt.strftime(fmt), 2, 2, 1),
+    "date_add": (
+        lambda x, n, unit="days": _dates(x) + pd.to_timedelta(n, unit=_unit(unit)),
+        2,
+        3,
+        1,
+    ),
+    "date_diff": (
+        lambda a, b, unit="days": (_dates(a) - _dates(b)) / pd.Timedelta(1, unit=_unit(unit)),
+        2,
+        3,
+        2,
+    ),
+}
+
+# Column names that are not identifiers are written col("unit price")
+COLUMN_FUNCTION = "col"
+
+
+class Node:
+    """Compiled expression node: fn(frame, memo) plus the columns it reads."""
+
+    def __init__(self, fn, key: str, columns: frozenset, constant: bool = False):
+        self.fn = fn
+        self.key = key
+        self.columns = columns
+        self.constant = constant
+
+    def __call__(self, frame, memo: dict):
+        if self.constant or memo is None:
+            return self.fn(frame, memo)
+        # Shared subexpressions are computed once per pass over the frame
+        if self.key not in memo:
+            memo[self.key] = (self.columns, self.fn(frame, memo))
+        return memo[self.key][1]
+
+
+def _broadcast(value, frame):
+    if isinstance(value, pd.Series):
+        return value
+    return pd.Series(value, index=frame.index)
+
+
+def _constant(node: ast.AST):
+    value = node.value
+    if not isinstance(value, (int, float, str, bool, type(None))):
+        raise ValueError(f"Unsupported constant {value!r}.")
+    if isinstance(value, str) and len(value) > MAX_CONSTANT_CHARS:
+        raise ValueError("String constant too long.")
+    return value
+
+
+def _compile(node: ast.AST) -> Node:
+    key = ast.dump(node)
+
+    if isinstance(node, ast.Constant):
+        value = _constant(node)
+        return Node(lambda frame, memo: value, key, frozenset(), constant=True)
+
+    if isinstance(node, ast.Name):
+        if node.id in ("True", "False", "None"):
+            value = {"True": True, "False": False, "None": None}[node.id]
+            return Node(lambda frame, memo: value, key, frozenset(), constant=True)
+        return _column(node.id, key)
+
+    if isinstance(node, ast.BinOp):
+        op = _BINARY.get(type(node.op))
+        if op is None:
+            raise ValueError(f"Operator {type(node.op).__name__} is not allowed.")
+        left, right = _compile(node.left), _compile(node.right)
+        if not (left.columns or right.columns) and type(node.op) in (ast.Mult, ast.Pow):
+            # "x" * 10**9 or 9**9**9 would be evaluated eagerly
+            raise ValueError("Multiply or power at least one column, not only constants.")
+        name = type(node.op).__name__
+
+        def binop(frame, memo):
+            try:
+                return op(left(frame, memo), right(frame, memo))
+            except TypeError as e:
+                raise ValueError(f"Operator {name} cannot be applied to these values: {e}") from e
+
+        return Node(binop, key, left.columns | right.columns)
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.USub):
+            op = operator.neg
+        elif isinstance(node.op, ast.UAdd):
+            op = operator.pos
+        elif isinstance(node.op, (ast.Not, ast.Invert)):
+
+            def op(value):
+                return ~value if isinstance(value, pd.Series) else not value
+
+        else:
+            raise ValueError(f"Operator {type(node.op).__name__} is not allowed.")
+        return Node(lambda frame, memo: op(operand(frame, memo)), key, operand.columns)
+
+    if isinstance(node, ast.BoolOp):
+        values = [_compile(v) for v in node.values]
+        combine = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+
+        def boolop(frame, memo):
+            result = values[0](frame, memo)
+            for value in values[1:]:
+                result = combine(result, value(frame, memo))
+            return result
+
+        return Node(boolop, key, frozenset().union(*(v.columns for v in values)))
+
+    if isinstance(node, ast.Compare):
+        return _compare(node, key)
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = _compile(node.test), _compile(node.body), _compile(node.orelse)
+        if_else = FUNCTIONS["if_else"][0]
+
+        def ifexp(frame, memo):
+            cond = test(frame, memo)
+            if not isinstance(cond, pd.Series):
+                return body(frame, memo) if cond else orelse(frame, memo)
+            return if_else(cond, _broadcast(body(frame, memo), frame), orelse(frame, memo))
+
+        return Node(ifexp, key, test.columns | body.columns | orelse.columns)
+
+    if isinstance(node, ast.Call):
+        return _call(node, key)
+
+    raise ValueError(f"{type(node).__name__} is not allowed in expressions.")
+
+
+def _column(name: str, key: str) -> Node:
+    def column(frame, memo):
+        if name not in frame:
+            raise ValueError(f"Unknown column '{name}'. Columns: {list(frame.columns)}")
+        return frame[name]
+
+    return Node(column, key, frozenset([name]))
+
+
+def _compare(node: ast.Compare, key: str) -> Node:
+    left = _compile(node.left)
+    steps = []
+    columns = left.columns
+    for op, comparator in zip(node.ops, node.comparators):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(comparator, (ast.List, ast.Tuple, ast.Set)):
+                raise ValueError("'in' needs a literal list, e.g. city in ['Lisbon', 'Porto'].")
+            options = [_constant(e) for e in comparator.elts if isinstance(e, ast.Constant)]
+            if len(options) != len(comparator.elts):
+                raise ValueError("'in' lists may only contain constants.")
+            negate = isinstance(op, ast.NotIn)
+            steps.append(("in", options, negate))
+            continue
+        fn = _COMPARE.get(type(op))
+        if fn is None:
+            raise ValueError(f"Comparison {type(op).__name__} is not allowed.")
+        right = _compile(comparator)
+        columns |= right.columns
+        steps.append(("cmp", fn, right))
+
+    def compare(frame, memo):
+        value = left(frame, memo)
+        result = None
+        for kind, arg, extra in steps:
+            if kind == "in":
+                test = _broadcast(value, frame).isin(arg)
+                test = ~test if extra else test
+                right_value = value
+            else:
+                right_value = extra(frame, memo)
+                test = arg(value, right_value)
+            result = test if result is None else result & test
+            value = right_value
+        return result
+
+    return Node(compare, key, columns)
+
+
+def _call(node: ast.Call, key: str) -> Node:
+    if not isinstance(node.func, ast.Name):
+        raise ValueError("Only plain function calls are allowed, e.g. lower(city).")
+    name = node.func.id
+    if node.keywords:
+        raise ValueError(f"{name}() takes positional arguments only.")
+    if name == COLUMN_FUNCTION:
+        if len(node.args) != 1 or not isinstance(node.args[0], ast.Constant):
+            raise ValueError('col() takes one column name, e.g. col("unit price").')
+        return _column(str(node.args[0].value), key)
+    if name not in FUNCTIONS:
+        raise ValueError(f"Unknown function '{name}'. Available: {sorted(FUNCTIONS)}")
+    fn, min_args, max_args, broadcast = FUNCTIONS[name]
+    if not min_args <= len(node.args) <= max_args:
+        raise ValueError(f"{name}() takes {min_args} to {max_args} arguments.")
+    args = [_compile(a) for a in node.args]
+
+    def call(frame, memo):
+        values = [a(frame, memo) for a in args]
+        # Only the arguments used as columns; units, formats and literals stay scalars
+        values[:broadcast] = [_broadcast(v, frame) for v in values[:broadcast]]
+        try:
+            return fn(*values)
+        except (AttributeError, TypeError) as e:
+            # e.g. lower() of a number column or round(price, qty)
+            raise ValueError(f"{name}() cannot be applied to these arguments: {e}") from e
+
+    return Node(call, key, frozenset().union(*(a.columns for a in args)))
+
+
+class Expression:
+    """A validated expression, ready to be evaluated over any frame."""
+
+    def __init__(self, text: str):
+        if len(text) > MAX_EXPRESSION_CHARS:
+            raise ValueError(f"Expression longer than {MAX_EXPRESSION_CHARS} characters.")
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression '{text}': {e.msg}")
+        if sum(1 for _ in ast.walk(tree)) > MAX_EXPRESSION_NODES:
+            raise ValueError(f"Expression has more than {MAX_EXPRESSION_NODES} parts.")
+        self.text = text
+        self.root = _compile(tree.body)
+        self.columns = self.root.columns
+
+    def evaluate(self, frame: pd.DataFrame, memo: dict = None):
+        return self.root(frame, memo)
+
+
+@lru_cache(maxsize=512)
+def compile_expression(text: str) -> Expression:
+    """Parses and validates an expression once; later calls with the same text reuse it."""
+    return Expression(text)
+
+
+def evaluate_columns(df: pd.DataFrame, new_columns: Dict[str, str]) -> pd.DataFrame:
+    """
+    Adds derived columns computed from restricted expressions.
+    Args:
+        df (pd.DataFrame): Input table.
+        new_columns (Dict[str, str]): New column -> expression, e.g.
+            {"total": "price * qty", "tier": "'high' if total > 100 else 'low'"}.
+            Expressions may use earlier new columns. Allowed: columns (col("name")
+            for names with spaces), numbers, strings, + - * / // % **, comparisons,
+            in [...], and/or/not (& | ~), x if cond else y, and FUNCTIONS.
+    Returns:
+        pd.DataFrame: df with the new columns. All expressions are validated before any
+            is evaluated, and subexpressions shared between them are computed once.
+    """
+    compiled = {col: compile_expression(expr) for col, expr in new_columns.items()}
+    memo = {}
+    frame = _Columns(df)
+    for col, expression in compiled.items():
+        frame.added[col] = expression.evaluate(frame, memo)
+        # Later expressions see the new column; results that read an older one are stale
+        memo = {k: v for k, v in memo.items() if col not in v[0]}
+    # One assign at the end instead of a copy of the frame per new column
+    return df.assign(**frame.added)
+
+
+class _Columns:
+    """The frame's columns plus the new ones computed so far."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.index = df.index
+        self.added = {}
+
+    @property
+    def columns(self):
+        return [*self.df.columns, *(c for c in self.added if c not in self.df.columns)]
+
+    def __contains__(self, name) -> bool:
+        return name in self.added or name in self.df.columns
+
+    def __getitem__(self, name):
+        return self.added[name] if name in self.added else self.df[name]
@@ -0,0 +1,344 @@
+import os
+import tempfile
+import time
+from typing import Callable, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from etl_dedupe import load_partition, spill
+from etl_validate import canonical_text, key_hashes
+
+# A table larger than this is streamed (or, when both are, partitioned) instead of loaded
+JOIN_MEMORY_BYTES = int(os.getenv("ETL_JOIN_MEMORY_BYTES", str(256 * 1024**2)))
+
+# Target size of one spilled partition of the smaller table in a partitioned join
+JOIN_PARTITION_BYTES = int(os.getenv("ETL_JOIN_PARTITION_BYTES", str(64 * 1024**2)))
+MAX_PARTITIONS = 256
+
+# Rows of a file read to infer its key dtypes for key_plan
+JOIN_SCHEMA_ROWS = int(os.getenv("ETL_JOIN_SCHEMA_ROWS", "1000"))
+
+HOWS = ("inner", "left", "anti")
+
+# Added to right columns whose name is already taken by a left column
+RIGHT_SUFFIX = "_right"
+
+
+def join_mode(left_bytes: int, right_bytes: int) -> str:
+    """"memory" (both fit), "streamed" (only the smaller fits) or "partitioned"."""
+    if max(left_bytes, right_bytes) <= JOIN_MEMORY_BYTES:
+        return "memory"
+    if min(left_bytes, right_bytes) <= JOIN_MEMORY_BYTES:
+        return "streamed"
+    return "partitioned"
+
+
+def join_partitions(smaller_bytes: int) -> int:
+    """Partitions needed for each of the smaller table to stay around JOIN_PARTITION_BYTES."""
+    return int(min(MAX_PARTITIONS, max(2, -(-smaller_bytes // JOIN_PARTITION_BYTES))))
+
+
+def key_plan(left: pd.DataFrame, right: pd.DataFrame, left_on, right_on) -> dict:
+    """
+    Form each key column is compared in, per side: "number" for a numeric column
+    (3 matches 3.0, also when a CSV chunk reads it as text) or "text" (stripped text,
+    so "007" stays "007"). left and right only need the dtypes of the tables (e.g. a
+    sample of a file), and the same plan is used in every join mode.
+    """
+
+    def forms(df: pd.DataFrame, on) -> List[str]:
+        return [
+            "number"
+            if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+            else "text"
+            for col in on
+        ]
+
+    return {"left": forms(left, left_on), "right": forms(right, right_on)}
+
+
+def key_frame(df: pd.DataFrame, on: List[str], forms: List[str]) -> pd.DataFrame:
+    """Key columns of one side in the form they are hashed and compared in, named by position."""
+    keys = {}
+    for i, (col, form) in enumerate(zip(on, forms)):
+        s = df[col].reset_index(drop=True)
+        if form == "number":
+            # Numbers read as text from a CSV chunk get the form of typed numbers
+            s = pd.to_numeric(s, errors="coerce")
+        keys[i] = canonical_text(s)
+    return pd.DataFrame(keys, index=pd.RangeIndex(len(df)))
+
+
+class HashIndex:
+    """
+    Hash table of the build side of a join: its key hashes, sorted, with the row
+    each came from. Probing is a vectorized binary search per probe row, and the
+    index can be kept and reused for every later join against the same table.
+    """
+
+    def __init__(self, keys: pd.DataFrame):
+        hashes = key_hashes(keys, list(keys.columns))
+        # Like SQL, keys with a null part match nothing
+        rows = np.flatnonzero(keys.notna().all(axis=1).to_numpy())
+        order = np.argsort(hashes[rows], kind="stable")
+        self.rows = rows[order]
+        self.hashes = hashes[self.rows]
+        self.keys = keys
+        self.nbytes = int(
+            self.rows.nbytes + self.hashes.nbytes + keys.memory_usage(deep=True).sum()
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def probe(self, keys: pd.DataFrame):
+        """(build rows, probe rows) of every matching pair, in probe row order."""
+        hashes = key_hashes(keys, list(keys.columns))
+        lo = np.searchsorted(self.hashes, hashes, "left")
+        hi = np.searchsorted(self.hashes, hashes, "right")
+        counts = np.where(keys.notna().all(axis=1).to_numpy(), hi - lo, 0)
+        probe_rows = np.repeat(np.arange(len(keys)), counts)
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        build_rows = self.rows[starts + np.arange(len(probe_rows))]
+        # A 64-bit hash collision would pair different keys; compare the values too
+        same = np.ones(len(probe_rows), dtype=bool)
+        for col in keys.columns:
+            same &= self.keys[col].to_numpy()[build_rows] == keys[col].to_numpy()[probe_rows]
+        return build_rows[same], probe_rows[same]
+
+
+def file_template(path: str, encoding: str = "utf-8") -> pd.DataFrame:
+    """Empty table with the columns of a CSV (as text) or Parquet file."""
+    if path.lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path).empty_table().to_pandas()
+    return pd.read_csv(path, encoding=encoding, dtype=str, nrows=0)
+
+
+def _right_columns(left_columns, right_columns, left_on, right_on):
+    """Right key columns dropped (same name as the left key) and right columns renamed."""
+    drop = [r for lcol, r in zip(left_on, right_on) if lcol == r]
+    rename = {
+        c: f"{c}{RIGHT_SUFFIX}" for c in right_columns if c in left_columns and c not in drop
+    }
+    return drop, rename
+
+
+def output_columns(left: pd.DataFrame, right: pd.DataFrame, left_on, right_on, how) -> list:
+    """Columns of the join of tables with the columns of left and right."""
+    if how == "anti":
+        return list(left.columns)
+    drop, rename = _right_columns(list(left.columns), list(right.columns), left_on, right_on)
+    return list(left.columns) + [rename.get(c, c) for c in right.columns if c not in drop]
+
+
+def _assemble(left, right, left_rows, right_rows, drop, rename) -> pd.DataFrame:
+    """Left rows side by side with right rows; a right row of -1 gives nulls."""
+    out = left.iloc[left_rows].reset_index(drop=True)
+    right = right.drop(columns=drop).reset_index(drop=True)
+    if (right_rows < 0).any():
+        part = right.reindex(right_rows)
+    else:
+        part = right.iloc[right_rows]
+    part = part.rename(columns=rename).reset_index(drop=True)
+    return pd.concat([out, part], axis=1)
+
+
+def join_chunks(
+    build: pd.DataFrame,
+    build_side: str,
+    index: HashIndex,
+    probe_chunks: Iterable[pd.DataFrame],
+    probe_template: pd.DataFrame,
+    left_on: List[str],
+    right_on: List[str],
+    plan: dict,
+    how: str,
+    write: Callable[[pd.DataFrame], None],
+) -> dict:
+    """
+    Joins a table held in memory (the build side) with a table read chunk by chunk.
+    Args:
+        build (pd.DataFrame): The smaller table, already indexed by index.
+        build_side (str): "left" or "right": which side of the join build is.
+        index (HashIndex): Index of key_frame(build, its keys, plan[build_side]).
+        probe_chunks (Iterable[pd.DataFrame]): The other table, chunk by chunk.
+        probe_template (pd.DataFrame): Empty table with the probe side's columns.
+        left_on, right_on (List[str]): Key columns of the left and right table.
+        plan (dict): Key forms of each side (see key_plan).
+        how (str): "inner", "left" (all left rows) or "anti" (left rows without a match).
+        write (Callable): Receives the result, part by part. Rows follow the probe
+            chunks; when build is the left table of a left or anti join, its
+            unmatched rows come last.
+    Returns:
+        dict: {"left_rows", "right_rows", "matched_left_rows", "matched_right_rows",
+            "output_rows", "probe_seconds"}
+    """
+    start = time.perf_counter()
+    left_columns = build.columns if build_side == "left" else probe_template.columns
+    right_columns = probe_template.columns if build_side == "left" else build.columns
+    drop, rename = _right_columns(list(left_columns), list(right_columns), left_on, right_on)
+    probe_side = "right" if build_side == "left" else "left"
+    probe_on = right_on if build_side == "left" else left_on
+
+    build_matched = np.zeros(len(build), dtype=bool)
+    probe_rows = probe_matched = output_rows = 0
+    for chunk in probe_chunks:
+        b, p = index.probe(key_frame(chunk, probe_on, plan[probe_side]))
+        build_matched[b] = True
+        hit = np.zeros(len(chunk), dtype=bool)
+        hit[p] = True
+        probe_rows += len(chunk)
+        probe_matched += int(hit.sum())
+        if build_side == "left":
+            if how == "anti":
+                continue
+            out = _assemble(build, chunk, b, p, drop, rename)
+        elif how == "anti":
+            out = chunk[~hit]
+        else:
+            if how == "left":
+                missed = np.flatnonzero(~hit)
+                p = np.concatenate([p, missed])
+                b = np.concatenate([b, np.full(len(missed), -1)])
+                order = np.argsort(p, kind="stable")
+                p, b = p[order], b[order]
+            out = _assemble(chunk, build, p, b, drop, rename)
+        output_rows += len(out)
+        write(out)
+
+    if build_side == "left" and how != "inner":
+        missed = np.flatnonzero(~build_matched)
+        if how == "anti":
+            out = build.iloc[missed]
+        else:
+            out = _assemble(
+                build, probe_template, missed, np.full(len(missed), -1), drop, rename
+            )
+        output_rows += len(out)
+        write(out)
+
+    counts = {
+        "build": (len(build), int(build_matched.sum())),
+        "probe": (probe_rows, probe_matched),
+    }
+    left, right = (
+        (counts["build"], counts["probe"])
+        if build_side == "left"
+        else (counts["probe"], counts["build"])
+    )
+    return {
+        "left_rows": left[0],
+        "right_rows": right[0],
+        "matched_left_rows": left[1],
+        "matched_right_rows": right[1],
+        "output_rows": output_rows,
+        "probe_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def match_rates(report: dict) -> dict:
+    """Adds the share of left and right rows that found a match."""
+    for side in ("left", "right"):
+        rows = report[f"{side}_rows"]
+        report[f"{side}_match_rate"] = (
+            round(report[f"matched_{side}_rows"] / rows, 4) if rows else None
+        )
+    return report
+
+
+def partitioned_join(
+    read_left: Callable[[], Iterator[pd.DataFrame]],
+    read_right: Callable[[], Iterator[pd.DataFrame]],
+    left_template: pd.DataFrame,
+    right_template: pd.DataFrame,
+    left_on: List[str],
+    right_on: List[str],
+    plan: dict,
+    how: str,
+    write: Callable[[pd.DataFrame], None],
+    partitions: int,
+    spill_dir: str = None,
+) -> dict:
+    """
+    Joins two tables that do not fit in memory (a grace hash join).
+    Both are spilled to disk by hash partition of their keys (see key_frame);
+    each pair of partitions is then joined in memory with join_chunks, building
+    on the smaller of the two. Rows come out grouped by partition.
+    Args:
+        read_left, read_right (Callable): Return an iterator over each table's chunks.
+        left_template, right_template (pd.DataFrame): Empty tables with their columns.
+        left_on, right_on, plan, how, write: As in join_chunks.
+        partitions (int): Hash partitions (see join_partitions).
+        spill_dir (str, optional): Directory for the spill files (default: system temp).
+    Returns:
+        dict: join_chunks counts plus {"partitions", "spilled_bytes", "spill_seconds",
+            "index_seconds"}
+    """
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="join-", dir=spill_dir) as tmp:
+        paths = {}
+        for side, read, on in (("left", read_left, left_on), ("right", read_right, right_on)):
+            paths[side] = [os.path.join(tmp, f"{side}-{p}.pkl") for p in range(partitions)]
+            files = [open(path, "wb") for path in paths[side]]
+            try:
+                for chunk in read():
+                    keys = key_frame(chunk, on, plan[side])
+                    spill(files, chunk, key_hashes(keys, list(keys.columns)), partitions)
+            finally:
+                for f in files:
+                    f.close()
+        spilled = sum(os.path.getsize(path) for side in paths.values() for path in side)
+        spill_seconds = time.perf_counter() - start
+
+        report = dict.fromkeys(
+            ("left_rows", "right_rows", "matched_left_rows", "matched_right_rows", "output_rows"),
+            0,
+        )
+        index_seconds = probe_seconds = 0.0
+        for p in range(partitions):
+            left = load_partition(paths["left"][p])
+            right = load_partition(paths["right"][p])
+            os.remove(paths["left"][p])
+            os.remove(paths["right"][p])
+            left = left_template if left is None else left
+            right = right_template if right is None else right
+            if not len(left):
+                # No left rows: nothing to output whatever the join
+                report["right_rows"] += len(right)
+                continue
+            lsize = int(left.memory_usage(deep=True).sum())
+            rsize = int(right.memory_usage(deep=True).sum())
+            build_side = "left" if lsize <= rsize else "right"
+            build, probe = (left, right) if build_side == "left" else (right, left)
+            build_on = left_on if build_side == "left" else right_on
+
+            t = time.perf_counter()
+            index = HashIndex(key_frame(build, build_on, plan[build_side]))
+            index_seconds += time.perf_counter() - t
+            counts = join_chunks(
+                build,
+                build_side,
+                index,
+                [probe],
+                probe.iloc[0:0],
+                left_on,
+                right_on,
+                plan,
+                how,
+                write,
+            )
+            probe_seconds += counts.pop("probe_seconds")
+            for name, value in counts.items():
+                report[name] += value
+
+    report.update(
+        partitions=partitions,
+        spilled_bytes=spilled,
+        spill_seconds=round(spill_seconds, 3),
+        index_seconds=round(index_seconds, 3),
+        probe_seconds=round(probe_seconds, 3),
+    )
+    return report
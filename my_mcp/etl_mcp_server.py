@@ -1,193 +1,1109 @@
 from fastmcp import FastMCP
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Union
+from table_format import to_frame
+from etl_store import DatasetStore, file_fingerprint, frame_fingerprint, step_key
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from etl_uploads import DATA_DIR, UploadManager
+from etl_parallel import map_columns
+from etl_dedupe import dedupe_file, dedupe_frame
+from etl_expr import evaluate_columns
+from etl_validate import UniqueIndexStore, commit_keys, validate
+from etl_query import run_query
+from etl_join import (
+    HOWS,
+    JOIN_SCHEMA_ROWS,
+    HashIndex,
+    file_template,
+    join_chunks,
+    join_mode,
+    join_partitions,
+    key_frame,
+    key_plan,
+    match_rates,
+    output_columns,
+    partitioned_join,
+)
+from etl_profile import (
+    PROFILE_CHUNK_ROWS,
+    iter_file_chunks,
+    iter_frame_chunks,
+    profile_chunks,
+    read_file_head,
+)
+
+# Tables can be passed as a list of row dicts or as a payload from encode_table
+Table = Union[List[dict], dict]
+
+# Tools hand stored tables to each other; copy-on-write keeps those untouched
+pd.set_option("mode.copy_on_write", True)
 
 # Create FastMCP server instance
 mcp = FastMCP("etl-server")
 
+# Every tool result is cached under a content-addressed dataset_id, so it can be
+# paged, passed on, and reused when the same step is requested again
+store = DatasetStore()
+
+# Files streamed to this server by clients, referred to by dataset handles
+uploads = UploadManager()
+
+
+def _load(data: Table = None, dataset_id: str = None) -> pd.DataFrame:
+    """Resolves a tool's input table from inline data or a stored dataset_id."""
+    if dataset_id:
+        return store.get(dataset_id).copy(deep=False)
+    if data is None:
+        raise ValueError("Provide either 'data' or 'dataset_id'.")
+    return to_frame(data)
+
+
+def _run_step(
+    tool: str,
+    params: dict,
+    data: Table,
+    dataset_id: str,
+    fn,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
+    """
+    Runs one pipeline step through the cache and returns the first page of its output.
+    fn(df) -> (output_df, extra_fields) is only called on a cache miss.
+    """
+    df = None
+    if dataset_id:
+        parent = dataset_id
+    else:
+        df = _load(data)
+        parent = frame_fingerprint(df)
+    key = step_key(parent, tool, params)
+
+    cached = store.lookup(key)
+    if cached is None:
+        if df is None:
+            df = _load(dataset_id=dataset_id)
+        out, extra = fn(df)
+        store.put(key, out, extra)
+    else:
+        out, extra = cached
+
+    result = paginate(out, key, limit=limit, preview=preview, output_format=output_format)
+    result.update(extra)
+    result["cached"] = cached is not None
+    return result
+
+
+async def _run_step_async(*args) -> dict:
+    # pandas work runs off the event loop, so one large table does not stall
+    # every other request on the server
+    return await asyncio.to_thread(_run_step, *args)
+
 
 @mcp.tool(name="read_csv_file")
-def read_csv_file_tool(path: str, encoding: str = "utf-8") -> dict:
+async def read_csv_file_tool(
+    path: str,
+    encoding: str = "utf-8",
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
     """
-    Reads a CSV file from the given path and returns its contents as a list of dicts.
+    Reads a CSV file from the given path, stores it and returns its first rows.
     Args:
-        path (str): Path to the CSV file.
+        path (str): Path to the CSV file, or a dataset handle ("upload:...") from finish_upload.
         encoding (str, optional): File encoding (default "utf-8").
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"data": [...], "columns": [...]}
+        dict: {"dataset_id", "total_rows", "columns", "data": [...], "next_cursor"}
+    Note:
+        Pass the returned dataset_id to the other tools instead of the rows.
     """
-    df = pd.read_csv(path, encoding=encoding)
-    return {"data": df.to_dict(orient="records"), "columns": list(df.columns)}
+
+    def read():
+        resolved = uploads.resolve(path)
+        key = step_key(file_fingerprint(resolved), "read_csv_file", {"encoding": encoding})
+        cached = store.lookup(key)
+        if cached is None:
+            store.put(key, pd.read_csv(resolved, encoding=encoding))
+        result = paginate(
+            store.get(key), key, limit=limit, preview=preview, output_format=output_format
+        )
+        result["cached"] = cached is not None
+        return result
+
+    return await asyncio.to_thread(read)
+
+
+# Unique keys of earlier batches, for incremental checks in enforce_constraints
+unique_indexes = UniqueIndexStore(os.path.join(DATA_DIR, "unique_indexes"))
+
+# Values of reference columns (foreign keys), by content address of the source
+reference_values: dict = {}
+MAX_REFERENCES = 32
+
+
+def _reference(spec: dict) -> pd.Series:
+    """Values of a {"dataset_id" or "path", "column"} reference."""
+    column = spec.get("column")
+    if not column:
+        raise ValueError('A reference needs a "column".')
+    if spec.get("dataset_id"):
+        return store.get(spec["dataset_id"])[column]
+    if not spec.get("path"):
+        raise ValueError('A reference needs a "dataset_id" or a "path".')
+    resolved = uploads.resolve(spec["path"])
+    key = step_key(file_fingerprint(resolved), "reference", {"column": column})
+    if key not in reference_values:
+        if len(reference_values) >= MAX_REFERENCES:
+            reference_values.pop(next(iter(reference_values)))
+        if resolved.lower().endswith((".parquet", ".pq")):
+            values = pd.read_parquet(resolved, columns=[column])[column]
+        else:
+            values = pd.read_csv(resolved, usecols=[column])[column]
+        reference_values[key] = pd.Index(values.dropna().unique())
+    return reference_values[key].to_series()
+
+
+# Profiles by content address of the dataset and parameters (they are small dicts)
+profiles: dict = {}
+MAX_PROFILES = 128
+
+
+@mcp.tool(name="profile_dataset")
+async def profile_dataset_tool(
+    path: str = None,
+    dataset_id: str = None,
+    data: Table = None,
+    columns: List[str] = None,
+    top_k: int = 5,
+    encoding: str = "utf-8",
+    chunk_rows: int = PROFILE_CHUNK_ROWS,
+) -> dict:
+    """
+    Profiles a dataset in one streaming pass, without loading a file into memory.
+    Args:
+        path (str, optional): CSV or Parquet file path, or a dataset handle ("upload:...").
+        dataset_id (str, optional): Profile a table stored by a previous tool instead.
+        data (Table, optional): Profile inline data instead.
+        columns (List[str], optional): Columns to profile (default: all).
+        top_k (int, optional): Most frequent values per column (default 5).
+        encoding (str, optional): File encoding (default "utf-8").
+        chunk_rows (int, optional): Rows read per chunk (default 100000).
+    Returns:
+        dict: {"rows", "columns": {name: {"inferred_type", "suggested_dtype", "null_rate",
+            "distinct_estimate", "distinct_exact", "top_values", "min", "max", "quantiles", ...}},
+            "candidate_keys", "suggested_type_mapping"}
+    Note:
+        Use the profile to propose type mappings, anomaly rules, missing-value strategies
+        and constraints instead of reading rows.
+    """
+
+    def run():
+        params = {"columns": columns, "top_k": top_k, "encoding": encoding}
+        if path:
+            resolved = uploads.resolve(path)
+            key = step_key(file_fingerprint(resolved), "profile_dataset", params)
+            chunks = iter_file_chunks(resolved, encoding, chunk_rows)
+        else:
+            df = _load(data, dataset_id)
+            key = step_key(dataset_id or frame_fingerprint(df), "profile_dataset", params)
+            chunks = iter_frame_chunks(df, chunk_rows)
+        cached = key in profiles
+        if not cached:
+            if len(profiles) >= MAX_PROFILES:
+                profiles.pop(next(iter(profiles)))
+            profiles[key] = profile_chunks(chunks, columns, top_k)
+        return {**profiles[key], "cached": cached}
+
+    return await asyncio.to_thread(run)
 
 
 @mcp.tool(name="check_data_types")
-def check_data_types_tool(data: List[dict], type_mapping: Dict[str, str]) -> dict:
+async def check_data_types_tool(
+    type_mapping: Dict[str, str],
+    data: Table = None,
+    dataset_id: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
     """
     Ensures each column in data has the correct type according to the provided type mapping.
     Args:
-        data (List[dict]): The data to check.
+        data (Table, optional): The data to check.
         type_mapping (Dict[str, str]): Mapping, e.g., {"column1": "int", "column2": "str"}.
+        dataset_id (str, optional): Use a table stored by a previous tool instead of data.
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"data": [...]}
+        dict: Page of the result: {"dataset_id", "total_rows", "columns", "data": [...], "next_cursor"}
     Note:
-        Agent must ask user for type_mapping if not provided in the request.
+        If type_mapping is not provided, propose one from profile_dataset and ask the user to confirm it.
     """
-    df = pd.DataFrame(data)
-    for col, dtype in type_mapping.items():
-        try:
-            df[col] = df[col].astype(dtype)
-        except Exception as e:
-            raise ValueError(f"Column '{col}' cannot be converted to {dtype}: {e}")
-    return {"data": df.to_dict(orient="records")}
+
+    def run(df):
+        return map_columns(df, "astype", type_mapping), {}
+
+    return await _run_step_async(
+        "check_data_types",
+        {"type_mapping": type_mapping},
+        data,
+        dataset_id,
+        run,
+        limit,
+        preview,
+        output_format,
+    )
 
 
 @mcp.tool(name="detect_and_report_anomalies")
-def detect_and_report_anomalies_tool(
-    data: List[dict], anomaly_rules: Dict[str, dict]
+async def detect_and_report_anomalies_tool(
+    anomaly_rules: Dict[str, dict],
+    data: Table = None,
+    dataset_id: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
 ) -> dict:
     """
     Checks for anomalies in the data based on provided rules (e.g., min/max for columns).
     Args:
-        data (List[dict]): Data to analyze.
+        data (Table, optional): Data to analyze.
         anomaly_rules (Dict[str, dict]): Rules per column, e.g., {"age": {"min": 0, "max": 120}}.
+        dataset_id (str, optional): Use a table stored by a previous tool instead of data.
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"anomalies": [...]}
+        dict: Page of the anomalous rows, plus "anomaly_count".
     Note:
-        Agent must ask user for anomaly_rules if not specified.
-    """
-    df = pd.DataFrame(data)
-    anomalies = []
-    for col, rule in anomaly_rules.items():
-        if "min" in rule:
-            out = df[df[col] < rule["min"]]
-            if not out.empty:
-                anomalies.extend(out.to_dict(orient="records"))
-        if "max" in rule:
-            out = df[df[col] > rule["max"]]
-            if not out.empty:
-                anomalies.extend(out.to_dict(orient="records"))
-    return {"anomalies": anomalies}
+        If anomaly_rules are not specified, propose them from profile_dataset (quantiles, min/max)
+        and ask the user to confirm them.
+    """
+
+    def run(df):
+        anomalies = []
+        for col, rule in anomaly_rules.items():
+            if "min" in rule:
+                out = df[df[col] < rule["min"]]
+                if not out.empty:
+                    anomalies.append(out)
+            if "max" in rule:
+                out = df[df[col] > rule["max"]]
+                if not out.empty:
+                    anomalies.append(out)
+        anomalies = pd.concat(anomalies) if anomalies else df.iloc[0:0]
+        return anomalies, {"anomaly_count": len(anomalies)}
+
+    return await _run_step_async(
+        "detect_and_report_anomalies",
+        {"anomaly_rules": anomaly_rules},
+        data,
+        dataset_id,
+        run,
+        limit,
+        preview,
+        output_format,
+    )
 
 
 @mcp.tool(name="remove_duplicates")
-def remove_duplicates_tool(data: List[dict], subset_cols: List[str] = None) -> dict:
+async def remove_duplicates_tool(
+    data: Table = None,
+    subset_cols: List[str] = None,
+    dataset_id: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
     """
     Removes duplicate rows in the data.
     Args:
-        data (List[dict]): The data to deduplicate.
+        data (Table, optional): The data to deduplicate.
         subset_cols (List[str], optional): Columns to check for duplicates (default: all columns).
+        dataset_id (str, optional): Use a table stored by a previous tool instead of data.
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"data": [...]}
+        dict: Page of the result: {"dataset_id", "total_rows", "columns", "data": [...], "next_cursor"}
     Note:
         If subset_cols is not given, remove duplicates across all columns.
     """
-    df = pd.DataFrame(data)
-    original_len = len(df)
-    df = df.drop_duplicates(subset=subset_cols)
-    new_len = len(df)
-    if new_len == original_len:
-        return {
-            "message": "No duplicates found. No changes needed.",
-            "data": df.to_dict(orient="records"),
-        }
-    return {"data": df.to_dict(orient="records")}
+
+    def run(df):
+        original_len = len(df)
+        df = df.drop_duplicates(subset=subset_cols)
+        new_len = len(df)
+        if new_len == original_len:
+            return df, {"message": "No duplicates found. No changes needed."}
+        return df, {}
+
+    return await _run_step_async(
+        "remove_duplicates",
+        {"subset_cols": subset_cols},
+        data,
+        dataset_id,
+        run,
+        limit,
+        preview,
+        output_format,
+    )
+
+
+@mcp.tool(name="dedupe_dataset")
+async def dedupe_dataset_tool(
+    path: str = None,
+    dataset_id: str = None,
+    data: Table = None,
+    subset_cols: List[str] = None,
+    normalize: bool = False,
+    keep: str = "first",
+    encoding: str = "utf-8",
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
+    """
+    Removes duplicate rows from datasets of any size, spilling hash partitions of the keys to disk.
+    Args:
+        path (str, optional): CSV or Parquet file path, or a dataset handle ("upload:...").
+            The result is written to a new file of the same format (output_path).
+        dataset_id (str, optional): Dedupe a table stored by a previous tool instead.
+        data (Table, optional): Dedupe inline data instead.
+        subset_cols (List[str], optional): Columns to check for duplicates (default: all columns).
+        normalize (bool, optional): Also treat string keys differing only in case or
+            whitespace as duplicates (near duplicates, default False).
+        keep (str, optional): Keep the "first" (default) or "last" occurrence; rows stay in input order.
+        encoding (str, optional): File encoding (default "utf-8").
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
+    Returns:
+        dict: Page of the result plus "dedupe": {"rows_in", "rows_out", "duplicates_removed",
+            "duplicate_keys", "top_duplicate_keys", "near_duplicates", "peak_memory_bytes", ...}.
+            For a path, "output_path" can be passed as the path of the other tools
+            (CSV output is written as UTF-8).
+    """
+    params = {"subset_cols": subset_cols, "normalize": normalize, "keep": keep}
+    if not path:
+
+        def run(df):
+            out, report = dedupe_frame(df, spill_dir=DATA_DIR, **params)
+            return out, {"dedupe": report}
+
+        return await _run_step_async(
+            "dedupe_dataset", params, data, dataset_id, run, limit, preview, output_format
+        )
+
+    def run_file():
+        resolved = uploads.resolve(path)
+        key = step_key(
+            file_fingerprint(resolved), "dedupe_dataset", dict(params, encoding=encoding)
+        )
+        output_path = os.path.join(DATA_DIR, "dedupe", key, os.path.basename(resolved))
+        report_path = output_path + ".json"
+        cached = os.path.exists(report_path)
+        if cached:
+            with open(report_path) as f:
+                report = json.load(f)
+        else:
+            report = dedupe_file(resolved, output_path, encoding, spill_dir=DATA_DIR, **params)
+            with open(report_path, "w") as f:
+                json.dump(report, f)
+        # The page comes from the output file (UTF-8), which is only read up to the page size
+        head = read_file_head(output_path, limit)
+        result = paginate(head, key, limit=limit, preview=preview, output_format=output_format)
+        # The output is not held in memory: the other tools take output_path as their path
+        result.update(
+            dataset_id=None,
+            total_rows=report["rows_out"],
+            matching_rows=report["rows_out"],
+            next_cursor=None,
+            output_path=output_path,
+            dedupe=report,
+            cached=cached,
+        )
+        return result
+
+    return await asyncio.to_thread(run_file)
 
 
 @mcp.tool(name="handle_missing_values")
-def handle_missing_values_tool(data: List[dict], strategy: Dict[str, str]) -> dict:
+async def handle_missing_values_tool(
+    strategy: Dict[str, str],
+    data: Table = None,
+    dataset_id: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
     """
     Handles missing values according to provided strategy.
     Args:
-        data (List[dict]): The data to process.
+        data (Table, optional): The data to process.
         strategy (Dict[str, str]): Per-column strategy, e.g., {"age": "drop", "salary": 0, "city": "ffill"}.
+        dataset_id (str, optional): Use a table stored by a previous tool instead of data.
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"data": [...]}
+        dict: Page of the result: {"dataset_id", "total_rows", "columns", "data": [...], "next_cursor"}
     Note:
-        Agent must ask user for strategy if not specified.
+        If strategy is not specified, propose one from profile_dataset (null rates, types)
+        and ask the user to confirm it.
     """
-    df = pd.DataFrame(data)
-    for col, action in strategy.items():
-        if action == "drop":
-            df = df[df[col].notnull()]
-        elif isinstance(action, (int, float, str)):
-            df[col] = df[col].fillna(action)
-        elif action == "ffill":
-            df[col] = df[col].fillna(method="ffill")
-        elif action == "bfill":
-            df[col] = df[col].fillna(method="bfill")
-    return {"data": df.to_dict(orient="records")}
+
+    def run(df):
+        for col, action in strategy.items():
+            if action == "drop":
+                df = df[df[col].notnull()]
+            elif isinstance(action, (int, float, str)):
+                df[col] = df[col].fillna(action)
+            elif action == "ffill":
+                df[col] = df[col].fillna(method="ffill")
+            elif action == "bfill":
+                df[col] = df[col].fillna(method="bfill")
+        return df, {}
+
+    return await _run_step_async(
+        "handle_missing_values",
+        {"strategy": strategy},
+        data,
+        dataset_id,
+        run,
+        limit,
+        preview,
+        output_format,
+    )
 
 
 @mcp.tool(name="standardize_values")
-def standardize_values_tool(data: List[dict], rules: Dict[str, dict]) -> dict:
+async def standardize_values_tool(
+    rules: Dict[str, dict],
+    data: Table = None,
+    dataset_id: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
     """
     Applies string standardization rules per column (e.g., lowercase, strip).
     Args:
-        data (List[dict]): Data to standardize.
+        data (Table, optional): Data to standardize.
         rules (Dict[str, dict]): Per-column rules, e.g., {"name": {"lower": True, "strip": True}}.
+        dataset_id (str, optional): Use a table stored by a previous tool instead of data.
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"data": [...]}
+        dict: Page of the result: {"dataset_id", "total_rows", "columns", "data": [...], "next_cursor"}
     Note:
         Agent must ask user for rules if not specified.
     """
-    df = pd.DataFrame(data)
-    for col, rule in rules.items():
-        if rule.get("lower"):
-            df[col] = df[col].str.lower()
-        if rule.get("strip"):
-            df[col] = df[col].str.strip()
-        if "date_format" in rule:
-            df[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime(
-                rule["date_format"]
-            )
-    return {"data": df.to_dict(orient="records")}
+
+    def run(df):
+        return map_columns(df, "standardize", rules), {}
+
+    return await _run_step_async(
+        "standardize_values",
+        {"rules": rules},
+        data,
+        dataset_id,
+        run,
+        limit,
+        preview,
+        output_format,
+    )
 
 
 @mcp.tool(name="enforce_constraints")
-def enforce_constraints_tool(data: List[dict], constraints: Dict[str, dict]) -> dict:
+async def enforce_constraints_tool(
+    constraints: Dict[str, dict],
+    data: Table = None,
+    dataset_id: str = None,
+    composite_unique: List[List[str]] = None,
+    on_violation: str = "report",
+    unique_index: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
     """
-    Enforces constraints such as not-null and unique on columns.
+    Checks all constraints in one pass and reports every violation, not just the first.
     Args:
-        data (List[dict]): Data to check.
-        constraints (Dict[str, dict]): e.g., {"id": {"unique": True}, "age": {"not_null": True}}.
+        data (Table, optional): Data to check.
+        constraints (Dict[str, dict]): Per column, any of not_null, unique, min, max, regex,
+            allowed (list of values) and references ({"dataset_id" or "path", "column"}),
+            e.g. {"id": {"unique": True}, "age": {"not_null": True, "min": 0, "max": 120},
+            "country": {"references": {"path": "countries.csv", "column": "code"}}}.
+        dataset_id (str, optional): Use a table stored by a previous tool instead of data.
+        composite_unique (List[List[str]], optional): Column sets unique together,
+            e.g. [["order_id", "line"]].
+        on_violation (str, optional): "report" (default, table unchanged), "drop" (remove the
+            violating rows) or "raise" (fail with the full summary).
+        unique_index (str, optional): Name of a persistent index of the unique keys of earlier
+            batches (e.g. "orders"). Keys are also checked against it, and the keys of a
+            batch without unique violations (or of the kept rows with "drop") are added to it.
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"data": [...]}
+        dict: Page of the result plus "validation": {"valid", "rows", "violating_rows",
+            "violations": [{"constraint", "columns", "count", "sample_rows", "sample_values"}]}.
     Note:
-        Agent must ask user for constraints if not specified.
+        If constraints are not specified, propose them from profile_dataset (null rates,
+        candidate_keys, quantiles) and ask the user to confirm them.
     """
-    df = pd.DataFrame(data)
-    for col, rule in constraints.items():
-        if rule.get("not_null") and df[col].isnull().any():
-            raise ValueError(f"Null values found in '{col}'")
-        if rule.get("unique") and df[col].duplicated().any():
-            raise ValueError(f"Duplicate values found in unique column '{col}'")
-    return {"data": df.to_dict(orient="records")}
+    if on_violation not in ("report", "drop", "raise"):
+        raise ValueError("on_violation must be 'report', 'drop' or 'raise'.")
+    params = {
+        "constraints": constraints,
+        "composite_unique": composite_unique,
+        "on_violation": on_violation,
+    }
+    indexes = None
+    if unique_index:
+
+        def indexes(columns):
+            return unique_indexes.get(unique_index, columns)
+
+        keys = [[c] for c, rule in constraints.items() if rule.get("unique")]
+        keys += [list(cols) for cols in composite_unique or []]
+        # The result depends on the batches indexed so far
+        params["unique_index"] = [unique_index, [len(indexes(k)) for k in keys]]
+
+    def run(df):
+        report = validate(df, constraints, composite_unique, _reference, indexes)
+        mask, keys = report.pop("mask"), report.pop("unique_keys")
+        if on_violation == "raise" and not report["valid"]:
+            summary = "; ".join(
+                f"{v['constraint']}({', '.join(v['columns'])}): {v['count']} rows"
+                for v in report["violations"]
+            )
+            raise ValueError(f"{len(report['violations'])} constraint(s) violated: {summary}")
+        if on_violation == "drop":
+            df = df[~mask]
+        clean = on_violation == "drop" or not any(
+            v["constraint"].startswith(("unique", "composite_unique")) for v in report["violations"]
+        )
+        if indexes is not None and clean:
+            report["index_keys"] = commit_keys(df, keys, indexes)
+        return df, {"validation": report}
+
+    return await _run_step_async(
+        "enforce_constraints",
+        params,
+        data,
+        dataset_id,
+        run,
+        limit,
+        preview,
+        output_format,
+    )
 
 
 @mcp.tool(name="transform_data")
-def transform_data_tool(
-    data: List[dict], transformation_rules: Dict[str, dict]
+async def transform_data_tool(
+    transformation_rules: Dict[str, dict],
+    data: Table = None,
+    dataset_id: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
 ) -> dict:
     """
     Applies transformations to the data (e.g., rename columns, add new columns).
     Args:
-        data (List[dict]): Data to transform.
+        data (Table, optional): Data to transform.
         transformation_rules (Dict[str, dict]): {"rename_columns": {...}, "new_columns": {...}}.
+            new_columns maps a new column to an expression, e.g. {"total": "price * qty"};
+            later expressions may use earlier new columns. Expressions allow columns
+            (col("unit price") for names with spaces), numbers, strings, + - * / // % **
+            (* on numbers only: join strings with concat), comparisons, in [...], and/or/not, "a if cond else b", and the functions
+            abs round floor ceil sqrt log exp clip min max to_number int float isnull
+            notnull coalesce if_else str lower upper strip length substr replace contains
+            startswith endswith concat to_date year month day weekday format_date
+            date_add(x, n, unit) date_diff(a, b, unit).
+        dataset_id (str, optional): Use a table stored by a previous tool instead of data.
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
     Returns:
-        dict: {"data": [...]}
+        dict: Page of the result: {"dataset_id", "total_rows", "columns", "data": [...], "next_cursor"}
     Note:
         Agent must ask user for transformation_rules if not specified.
     """
-    df = pd.DataFrame(data)
-    if "rename_columns" in transformation_rules:
-        df = df.rename(columns=transformation_rules["rename_columns"])
-    if "new_columns" in transformation_rules:
-        for col, expr in transformation_rules["new_columns"].items():
-            # WARNING: eval can be unsafe if the string comes from user input!
-            df[col] = df.eval(expr)
-    return {"data": df.to_dict(orient="records")}
+
+    def run(df):
+        if "rename_columns" in transformation_rules:
+            df = df.rename(columns=transformation_rules["rename_columns"])
+        if "new_columns" in transformation_rules:
+            # Restricted expressions (see etl_expr.py), never Python/pandas eval
+            df = evaluate_columns(df, transformation_rules["new_columns"])
+        return df, {}
+
+    return await _run_step_async(
+        "transform_data",
+        {"transformation_rules": transformation_rules},
+        data,
+        dataset_id,
+        run,
+        limit,
+        preview,
+        output_format,
+    )
+
+
+# Hash tables of join build sides, by content address of the table, keys and key form
+join_indexes: dict = {}
+MAX_JOIN_INDEXES = 16
+
+
+def _join_side(path: str, dataset_id: str, encoding: str) -> dict:
+    """Content address, size and location of one table of a join."""
+    if dataset_id:
+        df = store.get(dataset_id)
+        return {"id": dataset_id, "bytes": int(df.memory_usage(deep=True).sum()), "path": None}
+    if not path:
+        raise ValueError("Provide a dataset_id or a path for both sides of the join.")
+    resolved = uploads.resolve(path)
+    tool = "read_parquet_file" if resolved.lower().endswith((".parquet", ".pq")) else "read_csv_file"
+    key = step_key(file_fingerprint(resolved), tool, {"encoding": encoding})
+    return {"id": key, "bytes": os.path.getsize(resolved), "path": resolved}
+
+
+def _join_frame(side: dict, encoding: str) -> pd.DataFrame:
+    """Whole table of a join side; files are kept in the store, as read_csv_file does."""
+    if side["path"] is None:
+        return store.get(side["id"])
+    cached = store.lookup(side["id"])
+    if cached is not None:
+        return cached[0]
+    if side["path"].lower().endswith((".parquet", ".pq")):
+        df = pd.read_parquet(side["path"])
+    else:
+        df = pd.read_csv(side["path"], encoding=encoding)
+    store.put(side["id"], df)
+    return df
+
+
+def _join_chunks(side: dict, encoding: str):
+    if side["path"] is None:
+        return iter_frame_chunks(store.get(side["id"]))
+    return iter_file_chunks(side["path"], encoding)
+
+
+def _join_schema(side: dict, encoding: str) -> pd.DataFrame:
+    """Table with the dtypes of a join side: the stored table, or a sample of the file."""
+    if side["path"] is None:
+        return store.get(side["id"])
+    return read_file_head(side["path"], JOIN_SCHEMA_ROWS, encoding)
+
+
+def _join_template(side: dict, encoding: str) -> pd.DataFrame:
+    if side["path"] is None:
+        return store.get(side["id"]).iloc[0:0]
+    return file_template(side["path"], encoding)
+
+
+def _join_index(side: dict, frame: pd.DataFrame, on: List[str], forms: List[str]):
+    """(HashIndex, cached) for the build side, reused across calls."""
+    key = step_key(side["id"], "join_index", {"on": on, "forms": forms})
+    index = join_indexes.get(key)
+    if index is not None:
+        return index, True
+    index = HashIndex(key_frame(frame, on, forms))
+    if len(join_indexes) >= MAX_JOIN_INDEXES:
+        join_indexes.pop(next(iter(join_indexes)))
+    join_indexes[key] = index
+    return index, False
+
+
+@mcp.tool(name="join_datasets")
+async def join_datasets_tool(
+    on: List[str] = None,
+    left_on: List[str] = None,
+    right_on: List[str] = None,
+    how: str = "inner",
+    left_dataset_id: str = None,
+    left_path: str = None,
+    right_dataset_id: str = None,
+    right_path: str = None,
+    encoding: str = "utf-8",
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
+    """
+    Joins two tables on key columns with a hash join, e.g. to enrich rows from a reference table.
+    Args:
+        on (List[str], optional): Key columns with the same name in both tables.
+        left_on, right_on (List[str], optional): Key columns of each table, when named differently.
+        how (str, optional): "inner" (default, matching rows only), "left" (all left rows,
+            with nulls where nothing matches) or "anti" (left rows without a match).
+        left_dataset_id / left_path (str): Left table: a stored dataset_id, or a CSV or
+            Parquet file path or dataset handle ("upload:...").
+        right_dataset_id / right_path (str): Right table, likewise.
+        encoding (str, optional): File encoding (default "utf-8").
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
+    Returns:
+        dict: Page of the result plus "join": {"mode", "build_side", "left_rows",
+            "right_rows", "left_match_rate", "right_match_rate", "output_rows",
+            "index_cached", "index_seconds", "probe_seconds", "seconds", ...}.
+            If a table is too large for memory, the result is written to a CSV file
+            instead (output_path, no dataset_id) that can be passed as the path of
+            the other tools.
+    Note:
+        Null keys never match. Right columns whose name is taken get a "_right" suffix.
+    """
+    if how not in HOWS:
+        raise ValueError(f"how must be one of {list(HOWS)}.")
+    if on:
+        left_on = right_on = list(on)
+    if not left_on or not right_on or len(left_on) != len(right_on):
+        raise ValueError("Provide 'on', or 'left_on' and 'right_on' of the same length.")
+
+    def run():
+        start = time.perf_counter()
+        left = _join_side(left_path, left_dataset_id, encoding)
+        right = _join_side(right_path, right_dataset_id, encoding)
+        mode = join_mode(left["bytes"], right["bytes"])
+        params = {"right": right["id"], "left_on": left_on, "right_on": right_on, "how": how}
+        key = step_key(left["id"], "join_datasets", params)
+        build_side = "left" if left["bytes"] <= right["bytes"] else "right"
+        build, probe = (left, right) if build_side == "left" else (right, left)
+        build_on = left_on if build_side == "left" else right_on
+        # One plan for every mode, so a join gives the same rows whatever the table sizes
+        plan = key_plan(
+            _join_schema(left, encoding), _join_schema(right, encoding), left_on, right_on
+        )
+
+        if mode == "memory":
+            cached = store.lookup(key)
+            if cached is None:
+                frames = {"left": _join_frame(left, encoding), "right": _join_frame(right, encoding)}
+                t = time.perf_counter()
+                index, index_cached = _join_index(
+                    build, frames[build_side], build_on, plan[build_side]
+                )
+                index_seconds = time.perf_counter() - t
+                probe_frame = frames["right" if build_side == "left" else "left"]
+                parts = []
+                report = join_chunks(
+                    frames[build_side],
+                    build_side,
+                    index,
+                    [probe_frame],
+                    probe_frame.iloc[0:0],
+                    left_on,
+                    right_on,
+                    plan,
+                    how,
+                    parts.append,
+                )
+                report.update(
+                    mode=mode,
+                    build_side=build_side,
+                    index_cached=index_cached,
+                    index_seconds=round(index_seconds, 3),
+                    seconds=round(time.perf_counter() - start, 3),
+                )
+                out = pd.concat(parts, ignore_index=True)
+                store.put(key, out, {"join": match_rates(report)})
+            else:
+                out, extra = cached
+                report = extra["join"]
+            result = paginate(out, key, limit=limit, preview=preview, output_format=output_format)
+            result.update(join=report, cached=cached is not None)
+            return result
+
+        # Too large for memory: stream the larger table (or partition both) into a file
+        output_path = os.path.join(DATA_DIR, "join", key, "joined.csv")
+        report_path = output_path + ".json"
+        cached = os.path.exists(report_path)
+        if cached:
+            with open(report_path) as f:
+                report = json.load(f)
+        else:
+            left_template = _join_template(left, encoding)
+            right_template = _join_template(right, encoding)
+            columns = output_columns(left_template, right_template, left_on, right_on, how)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            pd.DataFrame(columns=columns).to_csv(output_path, index=False)
+
+            def write(part):
+                part.to_csv(output_path, mode="a", header=False, index=False)
+
+            if mode == "streamed":
+                frame = _join_frame(build, encoding)
+                t = time.perf_counter()
+                index, index_cached = _join_index(build, frame, build_on, plan[build_side])
+                index_seconds = time.perf_counter() - t
+                report = join_chunks(
+                    frame,
+                    build_side,
+                    index,
+                    _join_chunks(probe, encoding),
+                    right_template if build_side == "left" else left_template,
+                    left_on,
+                    right_on,
+                    plan,
+                    how,
+                    write,
+                )
+                report.update(index_cached=index_cached, index_seconds=round(index_seconds, 3))
+            else:
+                report = partitioned_join(
+                    lambda: _join_chunks(left, encoding),
+                    lambda: _join_chunks(right, encoding),
+                    left_template,
+                    right_template,
+                    left_on,
+                    right_on,
+                    plan,
+                    how,
+                    write,
+                    join_partitions(min(left["bytes"], right["bytes"])),
+                    spill_dir=DATA_DIR,
+                )
+                build_side = "per partition"
+                report["index_cached"] = False
+            report.update(
+                mode=mode,
+                build_side=build_side,
+                output_path=output_path,
+                seconds=round(time.perf_counter() - start, 3),
+            )
+            report = match_rates(report)
+            with open(report_path, "w") as f:
+                json.dump(report, f)
+        head = read_file_head(output_path, limit)
+        result = paginate(head, key, limit=limit, preview=preview, output_format=output_format)
+        result.update(
+            dataset_id=None,
+            total_rows=report["output_rows"],
+            matching_rows=report["output_rows"],
+            next_cursor=None,
+            output_path=output_path,
+            join=report,
+            cached=cached,
+        )
+        return result
+
+    return await asyncio.to_thread(run)
+
+
+@mcp.tool(name="query_dataset")
+async def query_dataset_tool(
+    sql: str,
+    tables: Dict[str, str],
+    encoding: str = "utf-8",
+    explain: bool = False,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    output_format: str = "records",
+) -> dict:
+    """
+    Runs a read-only SQL query (DuckDB) over files and stored tables and returns only its result.
+    Args:
+        sql (str): One SELECT statement, e.g. "SELECT city, count(*) AS n, avg(amount) AS avg_amount
+            FROM sales WHERE amount > 0 GROUP BY city ORDER BY n DESC".
+        tables (Dict[str, str]): Table name used in the query -> a stored dataset_id, or a
+            CSV or Parquet file path or dataset handle ("upload:..."),
+            e.g. {"sales": "data/sales.csv"}.
+        encoding (str, optional): Encoding of the CSV files (default "utf-8").
+        explain (bool, optional): Also return the query plan (default False).
+        limit (int, optional): Rows to return in this page (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
+    Returns:
+        dict: Page of the result plus "query": {"rows", "truncated", "threads", "seconds"}.
+    Note:
+        Use it for counts, sums, averages, group-bys and filters instead of reading rows.
+        Files are scanned where they are, reading only the columns and rows the query needs.
+    """
+
+    def run():
+        sources = {}
+        ids = {}
+        for name, source in tables.items():
+            if source in store:
+                sources[name] = store.get(source)
+                ids[name] = source
+            else:
+                sources[name] = uploads.resolve(source)
+                ids[name] = file_fingerprint(sources[name])
+        parent = ",".join(f"{name}={ids[name]}" for name in sorted(ids))
+        key = step_key(parent, "query_dataset", {"sql": sql, "encoding": encoding})
+
+        cached = store.lookup(key)
+        if cached is None or (explain and "plan" not in cached[1]["query"]):
+            out, report = run_query(
+                sql,
+                sources,
+                encoding=encoding,
+                temp_dir=os.path.join(DATA_DIR, "query"),
+                explain=explain,
+            )
+            store.put(key, out, {"query": report})
+        else:
+            out, extra = cached
+            report = extra["query"]
+        result = paginate(out, key, limit=limit, preview=preview, output_format=output_format)
+        result.update(query=report, cached=cached is not None)
+        return result
+
+    return await asyncio.to_thread(run)
+
+
+@mcp.tool(name="fetch_rows")
+async def fetch_rows_tool(
+    dataset_id: str = None,
+    cursor: str = None,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    sort_by: List[str] = None,
+    descending: bool = False,
+    filters: List[dict] = None,
+    output_format: str = "records",
+) -> dict:
+    """
+    Fetches a page of a stored table, optionally sorted and filtered server-side.
+    Args:
+        dataset_id (str, optional): Table returned by a previous tool.
+        cursor (str, optional): next_cursor from a previous page (overrides the other paging args).
+        offset (int, optional): First row to return (default 0).
+        limit (int, optional): Rows to return (default 50, 0 = all rows).
+        preview (str, optional): "head" (default) or "sample".
+        sort_by (List[str], optional): Columns to sort by.
+        descending (bool, optional): Sort descending (default False).
+        filters (List[dict], optional): e.g. [{"column": "age", "op": ">", "value": 30}].
+            Ops: ==, !=, <, <=, >, >=, in, not_in, contains, startswith, is_null, not_null.
+        output_format (str, optional): "records" (default), "columns", "arrow" or "parquet".
+    Returns:
+        dict: {"dataset_id", "total_rows", "matching_rows", "offset", "data": [...], "next_cursor"}
+    """
+    if cursor:
+        state = decode_cursor(cursor)
+        dataset_id = state["dataset_id"]
+        offset = state["offset"]
+        sort_by = state["sort_by"]
+        descending = state["descending"]
+        filters = state["filters"]
+    if not dataset_id:
+        raise ValueError("Provide either 'dataset_id' or 'cursor'.")
+    return await asyncio.to_thread(
+        paginate,
+        store.get(dataset_id),
+        dataset_id,
+        offset=offset,
+        limit=limit,
+        preview=preview,
+        sort_by=sort_by,
+        descending=descending,
+        filters=filters,
+        output_format=output_format,
+    )
+
+
+@mcp.tool(name="cache_stats")
+def cache_stats_tool() -> dict:
+    """
+    Reports the ETL result cache: entries, total/max bytes, hits and misses.
+    Returns:
+        dict: {"entries", "total_bytes", "max_bytes", "hits", "misses"}
+    """
+    return store.stats()
+
+
+@mcp.tool(name="begin_upload")
+def begin_upload_tool(filename: str, total_size: int, sha256: str) -> dict:
+    """
+    Starts (or resumes) a chunked upload of a file to the ETL server.
+    Args:
+        filename (str): Original file name.
+        total_size (int): File size in bytes.
+        sha256 (str): Hex SHA-256 of the whole file, verified by finish_upload.
+    Returns:
+        dict: {"upload_id", "received", "total_size", "complete"}; send chunks from "received" on.
+            If the same content was uploaded before, "complete" is True and "dataset_handle" is set.
+    """
+    return uploads.begin(filename, total_size, sha256)
+
+
+@mcp.tool(name="upload_chunk")
+def upload_chunk_tool(upload_id: str, offset: int, chunk: str) -> dict:
+    """
+    Appends a base64-encoded chunk at the given byte offset of an upload.
+    Args:
+        upload_id (str): Id returned by begin_upload.
+        offset (int): Byte offset of the chunk in the file.
+        chunk (str): Base64-encoded bytes.
+    Returns:
+        dict: {"upload_id", "received", "total_size"}
+    """
+    return uploads.write_chunk(upload_id, offset, chunk)
+
+
+@mcp.tool(name="upload_status")
+def upload_status_tool(upload_id: str) -> dict:
+    """
+    Reports how many bytes of an upload the server has, to resume after a failure.
+    Args:
+        upload_id (str): Id returned by begin_upload.
+    Returns:
+        dict: {"upload_id", "received", "total_size", "complete"}
+    """
+    return uploads.status(upload_id)
+
+
+@mcp.tool(name="finish_upload")
+def finish_upload_tool(upload_id: str) -> dict:
+    """
+    Verifies the checksum of a fully received upload and registers it as a dataset.
+    Args:
+        upload_id (str): Id returned by begin_upload.
+    Returns:
+        dict: {"upload_id", "complete", "dataset_handle"}; pass dataset_handle as the
+            path of read_csv_file.
+    """
+    return uploads.finish(upload_id)
 
 
 if __name__ == "__main__":
-    print("Running MCP server on default host/port...", flush=True)
-    mcp.run()
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from runtime.config import server_host, server_port
+    from runtime.registry import advertise
+
+    parser = argparse.ArgumentParser(description="ETL MCP server")
+    parser.add_argument(
+        "--sse",
+        action="store_true",
+        help="Serve over SSE so apps and agents on other hosts can reach it",
+    )
+    parser.add_argument("--host", default=server_host())
+    parser.add_argument("--port", type=int, default=server_port("etl_server"))
+    args = parser.parse_args()
+    if args.sse:
+        print(f"Running MCP server on {args.host}:{args.port} (SSE)...", flush=True)
+        advertise(mcp, "etl_server")
+        mcp.run(transport="sse", host=args.host, port=args.port)
+    else:
+        print("Running MCP server on default host/port...", flush=True)
+        mcp.run()
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+import pandas as pd
+
+# Tables with at least this many rows are processed column by column in a process
+# pool; smaller ones are handled inline, where the pool round trip would cost more
+PARALLEL_MIN_ROWS = int(os.getenv("ETL_PARALLEL_MIN_ROWS", "200000"))
+PARALLEL_WORKERS = int(os.getenv("ETL_PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+
+_pool = None
+
+
+def standardize_column(s: pd.Series, rule: dict) -> pd.Series:
+    if rule.get("lower"):
+        s = s.str.lower()
+    if rule.get("strip"):
+        s = s.str.strip()
+    if "date_format" in rule:
+        s = pd.to_datetime(s, errors="coerce").dt.strftime(rule["date_format"])
+    return s
+
+
+def cast_column(s: pd.Series, dtype: str) -> pd.Series:
+    try:
+        return s.astype(dtype)
+    except Exception as e:
+        raise ValueError(f"Column '{s.name}' cannot be converted to {dtype}: {e}")
+
+
+COLUMN_OPS = {"standardize": standardize_column, "astype": cast_column}
+
+
+def _pack(s: pd.Series):
+    # Arrow IPC moves string/date columns as flat buffers instead of pickling every
+    # Python object; columns Arrow cannot represent fall back to pickle
+    try:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(s.to_frame("v"), preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return "arrow", sink.getvalue().to_pybytes()
+    except Exception:
+        return "pickle", s.reset_index(drop=True)
+
+
+def _unpack(packed, name, index=None) -> pd.Series:
+    kind, payload = packed
+    if kind == "arrow":
+        import pyarrow as pa
+
+        s = pa.ipc.open_stream(payload).read_all().column(0).to_pandas()
+    else:
+        s = payload
+    if index is not None:
+        s.index = index
+    s.name = name
+    return s
+
+
+def _apply_packed(op: str, name, packed, arg):
+    """Process-pool entry point: unpack one column, apply op, pack the result."""
+    return _pack(COLUMN_OPS[op](_unpack(packed, name), arg))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the server process has threads (event loop, to_thread workers),
+        # which fork does not copy safely
+        _pool = ProcessPoolExecutor(
+            max_workers=PARALLEL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def use_pool(df: pd.DataFrame) -> bool:
+    return PARALLEL_WORKERS > 1 and len(df) >= PARALLEL_MIN_ROWS
+
+
+def map_columns(df: pd.DataFrame, op: str, args: Dict[str, object]) -> pd.DataFrame:
+    """
+    Applies a per-column operation (see COLUMN_OPS) to the given columns.
+    Args:
+        df (pd.DataFrame): Input table (not modified).
+        op (str): "standardize" (arg = rule dict) or "astype" (arg = dtype).
+        args (Dict[str, object]): Column name -> argument of op.
+    Returns:
+        pd.DataFrame: df with the processed columns replaced. Large tables are
+            processed one column per pool task, so columns run on separate cores.
+    """
+    for col in args:
+        if col not in df.columns:
+            raise KeyError(col)
+    if not use_pool(df):
+        for col, arg in args.items():
+            df[col] = COLUMN_OPS[op](df[col], arg)
+        return df
+
+    pool = _get_pool()
+    futures = {
+        col: pool.submit(_apply_packed, op, col, _pack(df[col]), arg)
+        for col, arg in args.items()
+    }
+    for col, future in futures.items():
+        df[col] = _unpack(future.result(), col, df.index)
+    return df
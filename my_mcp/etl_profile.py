@@ -0,0 +1,386 @@
+import os
+import time
+import warnings
+from typing import Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+# Rows per chunk read from a file; memory use is bounded by one chunk plus the
+# fixed-size sketches below, whatever the size of the file
+PROFILE_CHUNK_ROWS = int(os.getenv("ETL_PROFILE_CHUNK_ROWS", "100000"))
+
+# Values kept per column for quantiles (reservoir sample) and for top values
+PROFILE_SAMPLE_SIZE = int(os.getenv("ETL_PROFILE_SAMPLE_SIZE", "10000"))
+TOPK_CAPACITY = 200
+
+# HyperLogLog precision: 2**14 registers, about 0.8% relative error
+HLL_PRECISION = 14
+
+# Distinct values counted exactly (8 bytes each) before a column falls back to the sketch
+DISTINCT_EXACT_LIMIT = int(os.getenv("ETL_PROFILE_DISTINCT_EXACT", "50000"))
+
+# Share of the non-null values that must parse as a type for it to be inferred
+TYPE_MIN_SHARE = 0.99
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+BOOL_VALUES = {"true", "false", "yes", "no", "t", "f", "y", "n"}
+
+
+def _plain(value):
+    """JSON-friendly scalar."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+class HyperLogLog:
+    """Approximate distinct count in a fixed 2**precision bytes."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        rest_bits = 64 - self.p
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # frexp's exponent is the bit length; exact since rest has at most 50 bits
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m**2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / np.sqrt(self.m)
+
+
+class TopK:
+    """Most frequent values, keeping at most `capacity` counters."""
+
+    def __init__(self, capacity: int = TOPK_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        # Largest count dropped so far: kept counts may be low by at most this much
+        self.error = 0
+
+    def _trim(self, counts: pd.Series) -> pd.Series:
+        if len(counts) > self.capacity:
+            counts = counts.nlargest(self.capacity + 1)
+            self.error = max(self.error, int(counts.iloc[-1]))
+            counts = counts.iloc[:-1]
+        return counts
+
+    def add(self, values: pd.Series):
+        # The chunk's own long tail is dropped before the merge
+        counts = self._trim(values.value_counts(sort=False))
+        merged = self.counts.add(counts, fill_value=0) if len(self.counts) else counts
+        self.counts = self._trim(merged).astype(np.int64)
+
+    def top(self, k: int) -> list:
+        return [[_plain(value), int(count)] for value, count in self.counts.nlargest(k).items()]
+
+
+class Reservoir:
+    """Uniform sample of at most `size` numbers from a stream (algorithm R)."""
+
+    def __init__(self, size: int = PROFILE_SAMPLE_SIZE, seed: int = 0):
+        self.size = size
+        self.seen = 0
+        self.sample = np.empty(0, dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, values: np.ndarray):
+        free = self.size - len(self.sample)
+        if free > 0:
+            self.sample = np.concatenate([self.sample, values[:free]])
+            self.seen += min(free, len(values))
+            values = values[free:]
+        if not len(values):
+            return
+        positions = self.seen + 1 + np.arange(len(values))
+        slots = (self.rng.random(len(values)) * positions).astype(np.int64)
+        keep = slots < self.size
+        # Later values overwrite earlier ones in the same slot, as in the sequential algorithm
+        self.sample[slots[keep]] = values[keep]
+        self.seen += len(values)
+
+    def quantiles(self, qs=QUANTILES) -> dict:
+        if not len(self.sample):
+            return {}
+        values = np.quantile(self.sample, qs)
+        return {f"p{int(q * 100):02d}": round(float(v), 6) for q, v in zip(qs, values)}
+
+
+class ColumnProfile:
+    """Running statistics of one column, updated chunk by chunk."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.nulls = 0
+        self.bool_ok = 0
+        self.int_ok = 0
+        self.num_ok = 0
+        self.date_ok = 0
+        self.distinct = HyperLogLog()
+        # Sorted distinct value hashes while there are at most DISTINCT_EXACT_LIMIT, else None
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.top = TopK()
+        self.sample = Reservoir()
+        self.num_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.date_min = None
+        self.date_max = None
+        self.min_length = None
+        self.max_length = None
+        # Cleared once a chunk's first values do not look like dates
+        self.maybe_dates = True
+
+    def _add_numbers(self, numbers: np.ndarray):
+        if not len(numbers):
+            return
+        # Chan et al. merge of the chunk's mean/variance into the running ones
+        n, mean = len(numbers), float(numbers.mean())
+        m2 = float(((numbers - mean) ** 2).sum())
+        total = self.num_count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.num_count * n / total
+        self.num_count = total
+        low, high = float(numbers.min()), float(numbers.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.sample.add(numbers)
+
+    def _add_dates(self, dates: pd.Series):
+        if dates.empty:
+            return
+        low, high = dates.min(), dates.max()
+        self.date_min = low if self.date_min is None else min(self.date_min, low)
+        self.date_max = high if self.date_max is None else max(self.date_max, high)
+
+    def _add_date_strings(self, text: pd.Series) -> bool:
+        """Counts the values that parse as dates; False if the column is not a date column."""
+        with warnings.catch_warnings():
+            # The date format is inferred from the first value
+            warnings.simplefilter("ignore")
+            # Unparseable strings fall back to a slow per-value parser, so check a few first
+            if pd.to_datetime(text.head(20), errors="coerce").isna().mean() > 0.5:
+                return False
+            dates = pd.to_datetime(text, errors="coerce").dropna()
+        self.date_ok += len(dates)
+        self._add_dates(dates)
+        return True
+
+    def add(self, s: pd.Series):
+        self.rows += len(s)
+        values = s.dropna()
+        self.nulls += len(s) - len(values)
+        if values.empty:
+            return
+        hashes = pd.util.hash_array(values.to_numpy())
+        self.distinct.add(hashes)
+        if self.hashes is not None:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) > DISTINCT_EXACT_LIMIT:
+                self.hashes = None
+        self.top.add(values)
+
+        if pd.api.types.is_bool_dtype(values):
+            self.bool_ok += len(values)
+        elif pd.api.types.is_numeric_dtype(values):
+            numbers = values.to_numpy(dtype=np.float64)
+            self.num_ok += len(values)
+            self.int_ok += int(np.count_nonzero(numbers == np.floor(numbers)))
+            self._add_numbers(numbers)
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            self.date_ok += len(values)
+            self._add_dates(values)
+        else:
+            text = values.astype(str).str.strip()
+            lengths = text.str.len()
+            low, high = int(lengths.min()), int(lengths.max())
+            self.min_length = low if self.min_length is None else min(self.min_length, low)
+            self.max_length = high if self.max_length is None else max(self.max_length, high)
+            self.bool_ok += int(text.str.lower().isin(BOOL_VALUES).sum())
+
+            numbers = pd.to_numeric(text, errors="coerce")
+            parsed = numbers.notna()
+            numbers = numbers[parsed].to_numpy(dtype=np.float64)
+            self.num_ok += len(numbers)
+            self.int_ok += int(np.count_nonzero(numbers == np.floor(numbers)))
+            self._add_numbers(numbers)
+
+            if self.maybe_dates and not parsed.all():
+                self.maybe_dates = self._add_date_strings(text[~parsed])
+
+    def inferred_type(self):
+        """(type, share of the non-null values that conform to it)."""
+        non_null = self.rows - self.nulls
+        if not non_null:
+            return "empty", 1.0
+        for kind, ok in (
+            ("bool", self.bool_ok),
+            ("int", self.int_ok if self.int_ok == self.num_ok else 0),
+            ("float", self.num_ok),
+            ("datetime", self.date_ok),
+        ):
+            if ok / non_null >= TYPE_MIN_SHARE:
+                return kind, ok / non_null
+        return "string", 1.0
+
+    def result(self, top_k: int) -> dict:
+        kind, share = self.inferred_type()
+        non_null = self.rows - self.nulls
+        if self.hashes is not None:
+            distinct = len(self.hashes)
+        else:
+            distinct = min(self.distinct.count(), non_null)
+        dtype = {
+            "bool": "boolean",
+            "int": "Int64" if self.nulls else "int64",
+            "float": "float64",
+            "datetime": "datetime64[ns]",
+            "string": "string",
+            "empty": "object",
+        }[kind]
+        profile = {
+            "inferred_type": kind,
+            "suggested_dtype": dtype,
+            "type_share": round(share, 4),
+            "nonconforming": non_null - int(round(share * non_null)),
+            "null_count": self.nulls,
+            "null_rate": round(self.nulls / self.rows, 4) if self.rows else 0.0,
+            "distinct_estimate": distinct,
+            "distinct_exact": self.hashes is not None,
+            "top_values": self.top.top(top_k),
+            "top_values_exact": self.top.error == 0,
+        }
+        if kind in ("int", "float") and self.num_count:
+            std = (self.m2 / (self.num_count - 1)) ** 0.5 if self.num_count > 1 else 0.0
+            profile.update(
+                min=self.min,
+                max=self.max,
+                mean=round(self.mean, 6),
+                std=round(std, 6),
+                quantiles=self.sample.quantiles(),
+                quantiles_exact=self.sample.seen <= self.sample.size,
+            )
+        elif kind == "datetime" and self.date_min is not None:
+            profile.update(min=_plain(self.date_min), max=_plain(self.date_max))
+        elif kind == "string" and self.min_length is not None:
+            profile.update(min_length=self.min_length, max_length=self.max_length)
+        return profile
+
+
+def iter_file_chunks(
+    path: str, encoding: str = "utf-8", chunk_rows: int = PROFILE_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """Streams a CSV (read as text, types are inferred by the profile) or Parquet file."""
+    if path.lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+    with pd.read_csv(path, encoding=encoding, dtype=str, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def read_file_head(path: str, rows: int = None, encoding: str = "utf-8") -> pd.DataFrame:
+    """First rows of a CSV or Parquet file (all rows if rows is falsy), with inferred dtypes."""
+    if path.lower().endswith((".parquet", ".pq")):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        if not rows:
+            return parquet.read().to_pandas()
+        batches = []
+        for batch in parquet.iter_batches(batch_size=rows):
+            batches.append(batch)
+            if sum(len(b) for b in batches) >= rows:
+                break
+        return pa.Table.from_batches(batches, parquet.schema_arrow).slice(0, rows).to_pandas()
+    return pd.read_csv(path, encoding=encoding, nrows=rows or None)
+
+
+def iter_frame_chunks(
+    df: pd.DataFrame, chunk_rows: int = PROFILE_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def profile_chunks(
+    chunks: Iterable[pd.DataFrame], columns: List[str] = None, top_k: int = 5
+) -> dict:
+    """
+    Profiles a table in one pass over its chunks.
+    Args:
+        chunks (Iterable[pd.DataFrame]): The table, chunk by chunk (see iter_file_chunks).
+        columns (List[str], optional): Columns to profile (default: all).
+        top_k (int, optional): Most frequent values reported per column (default 5).
+    Returns:
+        dict: {"rows", "columns": {name: stats}, "candidate_keys", "suggested_type_mapping",
+            "chunks", "seconds"}. Distinct counts, quantiles and top values are
+            approximate on large tables (see the *_exact flags).
+    """
+    start = time.perf_counter()
+    profiles = {}
+    rows = n_chunks = 0
+    for chunk in chunks:
+        n_chunks += 1
+        rows += len(chunk)
+        for col in columns or chunk.columns:
+            if col not in chunk.columns:
+                raise KeyError(col)
+            if col not in profiles:
+                profiles[col] = ColumnProfile(col)
+            profiles[col].add(chunk[col])
+
+    results = {str(col): p.result(top_k) for col, p in profiles.items()}
+    candidate_keys = []
+    for col, p in profiles.items():
+        non_null = p.rows - p.nulls
+        distinct = results[str(col)]["distinct_estimate"]
+        # Top value counts are never overestimated: a count above 1 is a real duplicate
+        if not non_null or p.nulls or (p.top.counts > 1).any():
+            continue
+        if p.hashes is not None:
+            is_key = distinct == non_null
+        else:
+            # Within the sketch's error of one distinct value per row
+            is_key = distinct >= non_null * (1 - 3 * p.distinct.relative_error)
+        if is_key:
+            candidate_keys.append(str(col))
+    return {
+        "rows": rows,
+        "columns": results,
+        "candidate_keys": candidate_keys,
+        "suggested_type_mapping": {
+            col: r["suggested_dtype"]
+            for col, r in results.items()
+            if r["inferred_type"] != "empty"
+        },
+        "chunks": n_chunks,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,120 @@
+import os
+import re
+import time
+from typing import Dict, Union
+
+import pandas as pd
+
+# DuckDB runs each query on this many threads (default: all cores)
+QUERY_THREADS = int(os.getenv("ETL_QUERY_THREADS", str(os.cpu_count() or 1)))
+
+# Memory DuckDB may use before spilling to disk, e.g. "4GB" (default: 80% of RAM)
+QUERY_MEMORY_LIMIT = os.getenv("ETL_QUERY_MEMORY_LIMIT")
+
+# Rows of a query result kept; queries are meant to aggregate, not to export tables
+QUERY_MAX_ROWS = int(os.getenv("ETL_QUERY_MAX_ROWS", "10000"))
+
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _require_duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ValueError("query_dataset requires duckdb (pip install duckdb).") from e
+    return duckdb
+
+
+def _literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def run_query(
+    sql: str,
+    tables: Dict[str, Union[str, pd.DataFrame]],
+    max_rows: int = QUERY_MAX_ROWS,
+    encoding: str = "utf-8",
+    temp_dir: str = None,
+    explain: bool = False,
+):
+    """
+    Runs one read-only SQL query with DuckDB over files and DataFrames.
+    Files are scanned in place, reading only the columns and row groups the query
+    needs, and DataFrames are scanned without copying them.
+    Args:
+        sql (str): A single SELECT (or WITH ... SELECT) statement.
+        tables (Dict[str, str | pd.DataFrame]): Table name in the query -> CSV or
+            Parquet file path, or DataFrame.
+        max_rows (int, optional): Result rows kept (default QUERY_MAX_ROWS).
+        encoding (str, optional): Encoding of the CSV files (default "utf-8").
+        temp_dir (str, optional): Where DuckDB spills when it runs out of memory.
+        explain (bool, optional): Also return DuckDB's physical plan.
+    Returns:
+        (pd.DataFrame, dict): The result and {"rows", "truncated", "threads",
+            "seconds", "plan"}.
+    """
+    duckdb = _require_duckdb()
+    con = duckdb.connect(
+        config={
+            "threads": QUERY_THREADS,
+            "autoinstall_known_extensions": False,
+            "autoload_known_extensions": False,
+        }
+    )
+    try:
+        if QUERY_MEMORY_LIMIT:
+            con.execute(f"SET memory_limit = {_literal(QUERY_MEMORY_LIMIT)}")
+        if temp_dir:
+            os.makedirs(temp_dir, exist_ok=True)
+            con.execute(f"SET temp_directory = {_literal(temp_dir)}")
+            con.execute(f"SET allowed_directories = [{_literal(temp_dir)}]")
+        # The query can read the given files and nothing else on the host
+        files = [source for source in tables.values() if isinstance(source, str)]
+        con.execute(f"SET allowed_paths = [{', '.join(map(_literal, files))}]")
+        con.execute("SET enable_external_access = false")
+
+        for name, source in tables.items():
+            if not _NAME_RE.match(name):
+                raise ValueError(f"Invalid table name '{name}': use letters, digits and _.")
+            if isinstance(source, pd.DataFrame):
+                con.register(name, source)
+            elif source.lower().endswith((".parquet", ".pq")):
+                scan = f"read_parquet({_literal(source)})"
+                con.execute(f'CREATE VIEW "{name}" AS SELECT * FROM {scan}')
+            else:
+                options = ""
+                if encoding.lower() not in ("utf-8", "utf8"):
+                    options = f", encoding = {_literal(encoding)}"
+                scan = f"read_csv({_literal(source)}{options})"
+                con.execute(f'CREATE VIEW "{name}" AS SELECT * FROM {scan}')
+        con.execute("SET lock_configuration = true")
+
+        try:
+            statements = con.extract_statements(sql)
+        except duckdb.Error as e:
+            raise ValueError(f"Invalid SQL: {e}") from e
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("query_dataset runs a single read-only SELECT statement.")
+        query = statements[0].query.strip().rstrip(";")
+
+        start = time.perf_counter()
+        try:
+            plan = con.execute(f"EXPLAIN {query}").fetchall()[0][1] if explain else None
+            # One row over the cap tells whether the result was cut
+            df = con.execute(f"SELECT * FROM ({query}) LIMIT {int(max_rows) + 1}").df()
+        except duckdb.Error as e:
+            raise ValueError(f"Query failed: {e}") from e
+        seconds = time.perf_counter() - start
+    finally:
+        con.close()
+
+    truncated = len(df) > max_rows
+    report = {
+        "rows": min(len(df), max_rows),
+        "truncated": truncated,
+        "threads": QUERY_THREADS,
+        "seconds": round(seconds, 3),
+    }
+    if explain:
+        report["plan"] = plan
+    return df.iloc[:max_rows], report
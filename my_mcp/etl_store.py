@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Total in-memory size of cached tables before least-recently-used ones are evicted
+DEFAULT_MAX_BYTES = int(os.getenv("ETL_CACHE_MAX_BYTES", str(1024**3)))
+
+
+def step_key(parent: str, tool: str, params: dict) -> str:
+    """Content address of applying `tool` with `params` to the dataset `parent`."""
+    payload = json.dumps([parent, tool, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (values, column names and dtypes)."""
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+_file_hashes: dict = {}
+
+
+def file_fingerprint(path: str) -> str:
+    """Content hash of a file, memoized on (path, size, mtime) to avoid re-reading it."""
+    st = os.stat(path)
+    stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if stamp not in _file_hashes:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        _file_hashes[stamp] = h.hexdigest()[:16]
+    return _file_hashes[stamp]
+
+
+class DatasetStore:
+    """
+    Content-addressed cache of the tables produced by the ETL tools.
+
+    A dataset_id is the hash of the input file (or inline table) followed by every
+    tool and parameters applied to it, so repeating a pipeline over the same upload
+    resolves each step to the same id and only new steps are computed. Entries are
+    evicted least-recently-used once their total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, df: pd.DataFrame, extra: dict = None) -> str:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if key in self._items:
+                self.total_bytes -= self._items.pop(key)[2]
+            self._items[key] = (df, extra or {}, size)
+            self.total_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.total_bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, _, evicted) = self._items.popitem(last=False)
+                self.total_bytes -= evicted
+        return key
+
+    def lookup(self, key: str):
+        """Returns (df, extra) for a cached step, or None on a miss."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return item[0], item[1]
+
+    def get(self, dataset_id: str) -> pd.DataFrame:
+        with self._lock:
+            item = self._items.get(dataset_id)
+            if item is not None:
+                self._items.move_to_end(dataset_id)
+        if item is None:
+            raise ValueError(
+                f"Unknown or expired dataset_id '{dataset_id}'. Re-run the tool that produced it."
+            )
+        return item[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def __contains__(self, dataset_id: str) -> bool:
+        return dataset_id in self._items
@@ -0,0 +1,128 @@
+import asyncio
+import atexit
+import inspect
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Type
+
+import pydantic_core
+from mcp import StdioServerParameters
+from pydantic import BaseModel
+
+# "subprocess" (default): one warm etl_mcp_server.py child shared by all questions
+# "inprocess": call the ETL tool functions directly, no subprocess or MCP round trip
+ETL_TOOLS_MODE = os.getenv("ETL_TOOLS_MODE", "subprocess")
+
+# Tool used as a cheap liveness probe before reusing the warm server
+HEALTH_TOOL = "cache_stats"
+
+
+def _in_process_tools() -> list:
+    """Wraps the ETL server's tool functions as CrewAI tools with the same schemas."""
+    from crewai.tools import BaseTool
+    from mcpadapt.utils.modeling import create_model_from_json_schema
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import etl_mcp_server
+
+    tools = []
+    for etl_tool in etl_mcp_server.mcp._tool_manager.list_tools():
+
+        class InProcessEtlTool(BaseTool):
+            name: str = etl_tool.name
+            description: str = etl_tool.description or ""
+            args_schema: Type[BaseModel] = create_model_from_json_schema(
+                etl_tool.parameters
+            )
+
+            def _run(self, _fn=etl_tool.fn, **kwargs):
+                result = _fn(**kwargs)
+                if inspect.isawaitable(result):
+                    result = asyncio.run(result)
+                # Same JSON text the MCP server would have sent back
+                return pydantic_core.to_json(result, fallback=str).decode()
+
+        tools.append(InProcessEtlTool())
+    return tools
+
+
+class EtlToolServer:
+    """
+    Supervised, long-lived ETL tool server for the ETL agent.
+
+    The MCP adapter (and its etl_mcp_server.py subprocess, or SSE connection when
+    server_url is given) is started on first use and reused by every question, so
+    pandas/fastmcp are imported once and the server's dataset cache survives
+    between turns. A liveness probe before each use restarts it if it died.
+    """
+
+    def __init__(self, server_url: str = None, mode: str = ETL_TOOLS_MODE):
+        self.server_url = server_url
+        self.mode = mode
+        self.startup_seconds = None
+        self.restarts = 0
+        self._adapter = None
+        self._tools = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def _server_params(self):
+        if self.server_url:
+            return {"url": self.server_url}
+        return StdioServerParameters(
+            command=sys.executable,
+            args=[str(Path(__file__).resolve().parent / "etl_mcp_server.py")],
+        )
+
+    def _start(self):
+        start = time.perf_counter()
+        if self.mode == "inprocess" and not self.server_url:
+            self._tools = _in_process_tools()
+        else:
+            from crewai_tools import MCPServerAdapter
+
+            self._adapter = MCPServerAdapter(self._server_params())
+            self._tools = self._adapter.tools
+        self.startup_seconds = time.perf_counter() - start
+        print(
+            f"ETL tools ready ({self.mode}) in {self.startup_seconds:.2f}s", flush=True
+        )
+
+    def _healthy(self) -> bool:
+        if self._adapter is None:
+            return self._tools is not None
+        probe = next((t for t in self._tools if t.name == HEALTH_TOOL), None)
+        if probe is None:
+            return True
+        try:
+            probe.run()
+            return True
+        except Exception:
+            return False
+
+    def tools(self) -> list:
+        """Returns the warm server's CrewAI tools, (re)starting it when needed."""
+        with self._lock:
+            if self._tools is not None and not self._healthy():
+                print("ETL tool server is not responding, restarting it", flush=True)
+                self._stop_locked()
+                self.restarts += 1
+            if self._tools is None:
+                self._start()
+            return self._tools
+
+    def _stop_locked(self):
+        if self._adapter is not None:
+            try:
+                self._adapter.stop()
+            except Exception:
+                pass
+        self._adapter = None
+        self._tools = None
+
+    def stop(self):
+        with self._lock:
+            self._stop_locked()
@@ -0,0 +1,152 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+# Where uploaded files are streamed and kept on the ETL server
+DATA_DIR = os.getenv("ETL_DATA_DIR", os.path.join(tempfile.gettempdir(), "etl_data"))
+
+# Prefix of dataset handles returned by finish_upload, e.g. "upload:9f86d08..."
+HANDLE_PREFIX = "upload:"
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _check_id(upload_id: str) -> str:
+    # Ids become file names on disk, so only accept plain SHA-256 hex digests
+    upload_id = upload_id.lower()
+    if not _SHA256_RE.match(upload_id):
+        raise ValueError(f"Invalid upload id / sha256 '{upload_id}'.")
+    return upload_id
+
+
+class UploadManager:
+    """
+    Resumable chunked uploads, streamed to disk and verified by SHA-256.
+
+    An upload is identified by the checksum the client announces, so starting
+    the same upload again (after a dropped connection or a server restart)
+    resumes at the bytes already received. Finished files are kept under
+    files/<sha256>/ and referred to by a dataset handle instead of a path.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.partial_dir = os.path.join(data_dir, "partial")
+        self.files_dir = os.path.join(data_dir, "files")
+        os.makedirs(self.partial_dir, exist_ok=True)
+        os.makedirs(self.files_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.partial_dir, f"{upload_id}.json")
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.partial_dir, f"{upload_id}.part")
+
+    def _load_meta(self, upload_id: str) -> dict:
+        _check_id(upload_id)
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"Unknown upload_id '{upload_id}'. Call begin_upload first.")
+
+    def _finished_path(self, sha256: str):
+        folder = os.path.join(self.files_dir, sha256)
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                return os.path.join(folder, name)
+        return None
+
+    def begin(self, filename: str, total_size: int, sha256: str) -> dict:
+        sha256 = _check_id(sha256)
+        filename = os.path.basename(filename) or "upload.csv"
+        if self._finished_path(sha256):
+            # Same content already uploaded: nothing to transfer
+            return {
+                "upload_id": sha256,
+                "received": total_size,
+                "total_size": total_size,
+                "complete": True,
+                "dataset_handle": HANDLE_PREFIX + sha256,
+            }
+        with self._lock:
+            meta_path = self._meta_path(sha256)
+            if not os.path.exists(meta_path):
+                with open(meta_path, "w") as f:
+                    json.dump(
+                        {"filename": filename, "total_size": total_size, "sha256": sha256}, f
+                    )
+                open(self._part_path(sha256), "wb").close()
+        return self.status(sha256)
+
+    def status(self, upload_id: str) -> dict:
+        meta = self._load_meta(upload_id)
+        return {
+            "upload_id": upload_id,
+            "received": os.path.getsize(self._part_path(upload_id)),
+            "total_size": meta["total_size"],
+            "complete": False,
+        }
+
+    def write_chunk(self, upload_id: str, offset: int, chunk_b64: str) -> dict:
+        chunk = base64.b64decode(chunk_b64)
+        with self._lock:
+            meta = self._load_meta(upload_id)
+            part = self._part_path(upload_id)
+            received = os.path.getsize(part)
+            if offset > received:
+                raise ValueError(
+                    f"Chunk at offset {offset} leaves a gap; resume from offset {received}."
+                )
+            # Re-sent chunks (offset < received) only append their unseen tail
+            chunk = chunk[received - offset :]
+            if received + len(chunk) > meta["total_size"]:
+                raise ValueError("Chunk goes past the announced total_size.")
+            with open(part, "ab") as f:
+                f.write(chunk)
+            received += len(chunk)
+        return {"upload_id": upload_id, "received": received, "total_size": meta["total_size"]}
+
+    def finish(self, upload_id: str) -> dict:
+        with self._lock:
+            meta = self._load_meta(upload_id)
+            part = self._part_path(upload_id)
+            received = os.path.getsize(part)
+            if received != meta["total_size"]:
+                raise ValueError(
+                    f"Upload incomplete: {received} of {meta['total_size']} bytes received."
+                )
+            h = hashlib.sha256()
+            with open(part, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(block)
+            if h.hexdigest() != meta["sha256"]:
+                os.remove(part)
+                os.remove(self._meta_path(upload_id))
+                raise ValueError("Checksum mismatch: the upload was discarded, start again.")
+
+            folder = os.path.join(self.files_dir, meta["sha256"])
+            os.makedirs(folder, exist_ok=True)
+            shutil.move(part, os.path.join(folder, meta["filename"]))
+            os.remove(self._meta_path(upload_id))
+        return {
+            "upload_id": upload_id,
+            "received": received,
+            "total_size": received,
+            "complete": True,
+            "dataset_handle": HANDLE_PREFIX + meta["sha256"],
+        }
+
+    def resolve(self, path_or_handle: str) -> str:
+        """Maps a dataset handle to its server-side path; plain paths pass through."""
+        if not path_or_handle.startswith(HANDLE_PREFIX):
+            return path_or_handle
+        path = self._finished_path(_check_id(path_or_handle[len(HANDLE_PREFIX) :]))
+        if path is None:
+            raise ValueError(f"Unknown dataset handle '{path_or_handle}'.")
+        return path
@@ -0,0 +1,221 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Rows and values shown per violated constraint
+SAMPLE_VIOLATIONS = 5
+
+_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def key_hashes(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """64-bit hash per row of the key columns (collisions are negligible below billions of keys)."""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+def _number_text(numbers: pd.Series) -> pd.Series:
+    """Integral numbers as int text ("3" for 3 and 3.0), other numbers as float text."""
+    if pd.api.types.is_integer_dtype(numbers):
+        return numbers.astype(str).astype(object).where(numbers.notna())
+    values = numbers.astype("float64")
+    integral = np.isfinite(values) & (values == np.floor(values)) & (values.abs() < 2**63)
+    text = values.astype(str).astype(object).where(values.notna())
+    text[integral] = values[integral].astype("int64").astype(str)
+    return text
+
+
+def canonical_text(s: pd.Series) -> pd.Series:
+    """
+    One text form per key value, whatever the column's dtype: integral numbers as int
+    text, other numbers as float text, anything else as stripped text (nulls stay null).
+    """
+    if pd.api.types.is_bool_dtype(s):
+        return s.astype(str).astype(object).where(s.notna())
+    if pd.api.types.is_numeric_dtype(s):
+        return _number_text(s)
+    text = s.astype(str).str.strip().astype(object).where(s.notna())
+    # Values that are numbers already, e.g. in a column of mixed objects
+    numbers = pd.to_numeric(s, errors="coerce")
+    number = numbers.notna() & ~s.map(lambda v: isinstance(v, (str, bool, np.bool_)))
+    if number.any():
+        text[number] = _number_text(numbers[number].astype("float64"))
+    return text
+
+
+def canonical_keys(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Key columns in canonical_text form, so keys hash alike whatever their dtype."""
+    return pd.DataFrame({col: canonical_text(df[col]) for col in columns}, index=df.index)
+
+
+class UniqueIndex:
+    """
+    Persistent set of key hashes of everything validated so far for one key.
+
+    Stored as a sorted uint64 array, so a new batch is checked with a binary search
+    per row and merged in, without rescanning earlier batches.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.hashes = np.load(path) if os.path.exists(path) else np.empty(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=bool)
+        pos = np.searchsorted(self.hashes, hashes)
+        pos[pos == len(self.hashes)] = 0
+        return self.hashes[pos] == hashes
+
+    def add(self, hashes: np.ndarray):
+        # Concurrent batches of the same key must not drop each other's hashes
+        with self._lock:
+            self.hashes = np.union1d(self.hashes, hashes)
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, self.hashes)
+            os.replace(tmp, self.path)
+
+
+class UniqueIndexStore:
+    """UniqueIndex per (index name, key columns), kept on disk under directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, columns: List[str]) -> UniqueIndex:
+        digest = hashlib.sha256("\0".join(columns).encode()).hexdigest()[:12]
+        filename = f"{_NAME_RE.sub('_', name)}-{digest}.npy"
+        with self._lock:
+            if filename not in self._indexes:
+                os.makedirs(self.directory, exist_ok=True)
+                self._indexes[filename] = UniqueIndex(os.path.join(self.directory, filename))
+            return self._indexes[filename]
+
+
+def _violation(constraint: str, columns: List[str], mask: np.ndarray, df: pd.DataFrame) -> dict:
+    rows = np.flatnonzero(mask)
+    sample = df.iloc[rows[:SAMPLE_VIOLATIONS]][columns]
+    return {
+        "constraint": constraint,
+        "columns": columns,
+        "count": int(len(rows)),
+        "sample_rows": [int(r) for r in rows[:SAMPLE_VIOLATIONS]],
+        "sample_values": sample.astype(object).where(sample.notna(), None).values.tolist(),
+    }
+
+
+def _numeric(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return pd.to_numeric(s, errors="coerce")
+
+
+def validate(
+    df: pd.DataFrame,
+    constraints: Dict[str, dict],
+    composite_unique: List[List[str]] = None,
+    reference: Callable[[dict], pd.Series] = None,
+    indexes: Callable[[List[str]], UniqueIndex] = None,
+) -> dict:
+    """
+    Checks every constraint over the whole table and reports all violations.
+    Args:
+        df (pd.DataFrame): Table to check.
+        constraints (Dict[str, dict]): Per column, any of
+            {"not_null": True, "unique": True, "min": 0, "max": 120, "regex": "^[A-Z]{2}$",
+             "allowed": ["a", "b"], "references": {"dataset_id" or "path": ..., "column": ...}}.
+        composite_unique (List[List[str]], optional): Column sets that must be unique together.
+        reference (Callable, optional): Returns the values of a "references" spec.
+        indexes (Callable, optional): Returns the UniqueIndex of earlier batches for key columns;
+            unique keys are then also checked against those batches.
+    Returns:
+        dict: {"valid", "rows", "violating_rows", "violations": [{"constraint", "columns",
+            "count", "sample_rows", "sample_values"}], "mask", "unique_keys"}; mask marks the
+            violating rows and unique_keys lists the key column sets (see commit_keys).
+    """
+    missing = [c for c in constraints if c not in df.columns]
+    missing += [c for cols in composite_unique or [] for c in cols if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {sorted(set(missing))}. Columns: {list(df.columns)}")
+
+    violations = []
+    bad = np.zeros(len(df), dtype=bool)
+
+    def record(name: str, columns: List[str], mask):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            violations.append(_violation(name, columns, mask, df))
+            bad[mask] = True
+
+    unique_keys = [[col] for col, rule in constraints.items() if rule.get("unique")]
+    unique_keys += [list(cols) for cols in composite_unique or []]
+
+    for col, rule in constraints.items():
+        s = df[col]
+        null = s.isna().to_numpy()
+        if rule.get("not_null"):
+            record("not_null", [col], null)
+        if "min" in rule or "max" in rule:
+            values = _numeric(s)
+            unparsed = values.isna().to_numpy() & ~null
+            record("numeric", [col], unparsed)
+            if "min" in rule:
+                record("min", [col], (values < rule["min"]).to_numpy())
+            if "max" in rule:
+                record("max", [col], (values > rule["max"]).to_numpy())
+        if "regex" in rule:
+            try:
+                matches = s.astype(str).str.fullmatch(rule["regex"]).to_numpy(dtype=bool)
+            except re.error as e:
+                raise ValueError(f"Invalid regex for '{col}': {e}")
+            record("regex", [col], ~matches & ~null)
+        if "allowed" in rule:
+            record("allowed", [col], ~s.isin(rule["allowed"]).to_numpy() & ~null)
+        if "references" in rule:
+            if reference is None:
+                raise ValueError("references constraints need a reference resolver.")
+            allowed = pd.Index(reference(rule["references"])).unique()
+            record("references", [col], ~s.isin(allowed).to_numpy() & ~null)
+
+    for columns in unique_keys:
+        # Like SQL UNIQUE, keys with a null part are not compared
+        complete = df[columns].notna().all(axis=1).to_numpy()
+        # Keys are compared in one form across batches, e.g. 3, 3.0 and "3" are the same key
+        hashes = key_hashes(canonical_keys(df, columns), columns)
+        dup = pd.Series(hashes).duplicated(keep=False).to_numpy() & complete
+        name = "unique" if len(columns) == 1 else "composite_unique"
+        record(name, columns, dup)
+        if indexes is not None:
+            seen = indexes(columns).contains(hashes) & complete
+            record(f"{name}_existing", columns, seen)
+
+    return {
+        "valid": not violations,
+        "rows": len(df),
+        "violating_rows": int(bad.sum()),
+        "violations": violations,
+        "mask": bad,
+        "unique_keys": unique_keys,
+    }
+
+
+def commit_keys(df: pd.DataFrame, unique_keys: List[List[str]], indexes) -> dict:
+    """Adds the table's unique keys to their indexes; returns the key count per index."""
+    counts = {}
+    for columns in unique_keys:
+        complete = df[columns].notna().all(axis=1).to_numpy()
+        index = indexes(columns)
+        index.add(key_hashes(canonical_keys(df, columns), columns)[complete])
+        counts["+".join(columns)] = len(index)
+    return counts
@@ -0,0 +1,184 @@
+import base64
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import pandas as pd
+
+from table_format import encode_table
+
+# Rows returned by a tool unless the caller asks for more (0 = whole table)
+DEFAULT_PAGE_SIZE = 50
+
+FILTER_OPS = (
+    "==",
+    "!=",
+    "<",
+    "<=",
+    ">",
+    ">=",
+    "in",
+    "not_in",
+    "contains",
+    "startswith",
+    "is_null",
+    "not_null",
+)
+
+# Sorted/filtered views are cached so paging through them does not re-sort per page
+_VIEW_CACHE_SIZE = 8
+_views: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+_views_lock = threading.Lock()
+
+
+def encode_cursor(
+    dataset_id: str,
+    offset: int,
+    sort_by: Optional[List[str]] = None,
+    descending: bool = False,
+    filters: Optional[List[dict]] = None,
+) -> str:
+    state = {"d": dataset_id, "o": offset, "s": sort_by, "desc": descending, "f": filters}
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"Invalid cursor '{cursor}'.")
+    return {
+        "dataset_id": state["d"],
+        "offset": state["o"],
+        "sort_by": state.get("s"),
+        "descending": state.get("desc", False),
+        "filters": state.get("f"),
+    }
+
+
+def _filter_mask(df: pd.DataFrame, flt: dict) -> pd.Series:
+    col, op, value = flt.get("column"), flt.get("op", "=="), flt.get("value")
+    if col not in df.columns:
+        raise ValueError(f"Filter column '{col}' not found.")
+    if op not in FILTER_OPS:
+        raise ValueError(f"Unknown filter op '{op}'. Use one of {FILTER_OPS}.")
+    s = df[col]
+    if op == "==":
+        return s == value
+    if op == "!=":
+        return s != value
+    if op == "<":
+        return s < value
+    if op == "<=":
+        return s <= value
+    if op == ">":
+        return s > value
+    if op == ">=":
+        return s >= value
+    if op == "in":
+        return s.isin(value)
+    if op == "not_in":
+        return ~s.isin(value)
+    if op == "contains":
+        return s.astype("string").str.contains(str(value), regex=False, na=False)
+    if op == "startswith":
+        return s.astype("string").str.startswith(str(value), na=False)
+    if op == "is_null":
+        return s.isna()
+    return s.notna()
+
+
+def apply_view(
+    df: pd.DataFrame,
+    dataset_id: str,
+    sort_by: Optional[List[str]] = None,
+    descending: bool = False,
+    filters: Optional[List[dict]] = None,
+) -> pd.DataFrame:
+    """Applies server-side filters and sorting, caching the resulting view."""
+    if not sort_by and not filters:
+        return df
+    key = (dataset_id, json.dumps([sort_by, descending, filters], sort_keys=True, default=str))
+    with _views_lock:
+        if key in _views:
+            _views.move_to_end(key)
+            return _views[key]
+
+    view = df
+    if filters:
+        mask = pd.Series(True, index=df.index)
+        for flt in filters:
+            mask &= _filter_mask(df, flt)
+        view = view[mask]
+    if sort_by:
+        missing = [c for c in sort_by if c not in view.columns]
+        if missing:
+            raise ValueError(f"Sort columns not found: {missing}")
+        view = view.sort_values(sort_by, ascending=not descending, kind="stable")
+
+    with _views_lock:
+        _views[key] = view
+        while len(_views) > _VIEW_CACHE_SIZE:
+            _views.popitem(last=False)
+    return view
+
+
+def paginate(
+    df: pd.DataFrame,
+    dataset_id: str,
+    offset: int = 0,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE,
+    preview: str = "head",
+    sort_by: Optional[List[str]] = None,
+    descending: bool = False,
+    filters: Optional[List[dict]] = None,
+    output_format: str = "records",
+) -> dict:
+    """
+    Builds the standard paginated response for a tabular tool result.
+    Args:
+        df (pd.DataFrame): The full table (as stored under dataset_id).
+        dataset_id (str): Handle of the stored table.
+        offset (int): First row of the page (after filtering/sorting).
+        limit (int): Page size (default 50, 0 or None = all remaining rows).
+        preview (str): "head" for consecutive pages, "sample" for a random sample.
+        sort_by (List[str], optional): Columns to sort by before paging.
+        descending (bool): Sort order.
+        filters (List[dict], optional): e.g. [{"column": "age", "op": ">", "value": 30}].
+        output_format (str): Wire format of the page rows (see table_format).
+    Returns:
+        dict: {"dataset_id", "columns", "total_rows", "matching_rows", "offset",
+               "limit", "data", "next_cursor"}
+    """
+    if preview not in ("head", "sample"):
+        raise ValueError("preview must be 'head' or 'sample'.")
+    view = apply_view(df, dataset_id, sort_by, descending, filters)
+    matching = len(view)
+    offset = max(0, int(offset or 0))
+    limit = int(limit) if limit else 0
+
+    next_cursor = None
+    if preview == "sample":
+        n = matching if not limit else min(limit, matching)
+        page = view.sample(n=n, random_state=0) if n < matching else view
+    elif limit:
+        page = view.iloc[offset : offset + limit]
+        if offset + limit < matching:
+            next_cursor = encode_cursor(
+                dataset_id, offset + limit, sort_by, descending, filters
+            )
+    else:
+        page = view.iloc[offset:]
+
+    return {
+        "dataset_id": dataset_id,
+        "columns": [str(c) for c in df.columns],
+        "total_rows": len(df),
+        "matching_rows": matching,
+        "offset": offset,
+        "limit": limit,
+        "preview": preview,
+        "data": encode_table(page, output_format),
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,114 @@
+import base64
+import io
+import json
+from typing import Any, List, Union
+
+import pandas as pd
+
+# Wire formats for tabular tool results:
+# - "records": list of row dicts (default, what every tool returned originally)
+# - "columns": column-oriented JSON, each column name appears once
+# - "arrow":   Arrow IPC stream, base64 encoded
+# - "parquet": Parquet file bytes, base64 encoded
+TABLE_FORMATS = ("records", "columns", "arrow", "parquet")
+
+
+def _require_pyarrow(fmt: str):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ValueError(
+            f"The '{fmt}' table format requires pyarrow (pip install pyarrow)."
+        ) from e
+
+
+def encode_table(df: pd.DataFrame, fmt: str = "records") -> Union[List[dict], dict]:
+    """
+    Encodes a DataFrame for a tool result.
+    Args:
+        df (pd.DataFrame): The table to encode.
+        fmt (str): One of TABLE_FORMATS (default "records").
+    Returns:
+        list | dict: A list of row dicts for "records", otherwise
+            {"format": ..., "columns": [...], "num_rows": n, "data": ...}.
+    """
+    if fmt == "records":
+        return df.to_dict(orient="records")
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format '{fmt}'. Use one of {TABLE_FORMATS}.")
+
+    payload = {"format": fmt, "columns": [str(c) for c in df.columns], "num_rows": len(df)}
+    if fmt == "columns":
+        # Series.to_json handles NaN/NaT -> null and timestamps in C, then each column
+        # is a plain JSON array.
+        payload["data"] = {
+            str(col): json.loads(df[col].to_json(orient="values", date_format="iso"))
+            for col in df.columns
+        }
+        return payload
+
+    _require_pyarrow(fmt)
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    buf = io.BytesIO()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(buf, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, buf)
+    payload["encoding"] = "base64"
+    payload["data"] = base64.b64encode(buf.getvalue()).decode("ascii")
+    return payload
+
+
+def is_encoded_table(obj: Any) -> bool:
+    """True if obj is a payload produced by encode_table with a non-records format."""
+    return (
+        isinstance(obj, dict)
+        and obj.get("format") in TABLE_FORMATS
+        and "data" in obj
+        and "columns" in obj
+    )
+
+
+def decode_table(payload: Union[List[dict], dict]) -> pd.DataFrame:
+    """
+    Decodes a tool table payload back into a DataFrame.
+    Args:
+        payload (list | dict): Row dicts or a dict produced by encode_table.
+    Returns:
+        pd.DataFrame: The decoded table. Columnar payloads are decoded column by
+            column, without building per-row dicts.
+    """
+    if isinstance(payload, list):
+        return pd.DataFrame(payload)
+    if not is_encoded_table(payload):
+        raise ValueError("Payload is not a table: expected a list of rows or an encoded table.")
+
+    fmt = payload["format"]
+    if fmt == "records":
+        return pd.DataFrame(payload["data"], columns=payload["columns"] or None)
+    if fmt == "columns":
+        return pd.DataFrame(payload["data"], columns=payload["columns"])
+
+    _require_pyarrow(fmt)
+    import pyarrow as pa
+
+    raw = base64.b64decode(payload["data"])
+    if fmt == "arrow":
+        table = pa.ipc.open_stream(raw).read_all()
+    else:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(raw))
+    return table.to_pandas()
+
+
+def to_frame(data: Union[List[dict], dict]) -> pd.DataFrame:
+    """Builds the input DataFrame for a tool from row dicts or an encoded table."""
+    if is_encoded_table(data):
+        return decode_table(data)
+    return pd.DataFrame(data)
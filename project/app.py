@@ -5,6 +5,12 @@ import json
 import pandas as pd
 import uuid
 import nest_asyncio
+import sys
+from pathlib import Path
+
+# Server URLs come from servers.toml at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_url  # noqa: E402
 
 nest_asyncio.apply()
 
@@ -24,13 +30,22 @@ for message in st.session_state.messages:
         st.markdown(message["content"])
 
 
-# Async call to MCP
+# Async call to MCP: submit a background job, then long-poll it until it finishes
 async def call_agent(question: str, user_id: str):
-    client = Client("http://127.0.0.1:8005/sse")
+    client = Client(server_url("multi_analyst"))
     async with client:
         result = await client.call_tool(
-            "multi_analyst", {"question": question, "user_id": user_id}
+            "submit_multi_analyst", {"question": question, "user_id": user_id}
         )
+        job_id = json.loads(result[0].text)["job_id"]
+        while True:
+            result = await client.call_tool("wait_job", {"job_id": job_id, "timeout": 20})
+            status = json.loads(result[0].text)
+            if status["state"] in ("succeeded", "failed", "cancelled"):
+                break
+        if status["state"] != "succeeded":
+            raise RuntimeError(status["error"] or f"Job {status['state']}.")
+        result = await client.call_tool("job_result", {"job_id": job_id})
         return result[0].text if result and hasattr(result[0], "text") else str(result)
 
 
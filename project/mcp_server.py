@@ -1,19 +1,53 @@
+import asyncio
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from langchain_openai import ChatOpenAI
-from crewai import Agent, Task, Crew, Process
-from crewai.memory import EntityMemory
-from crewai.memory.storage.rag_storage import RAGStorage
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.jobs import JobManager, register_job_tools, report_progress
+from runtime.lazy import preload_in_background
+from runtime import upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 load_dotenv()
 mcp = FastMCP("multi-agent-server")
+jobs = JobManager()
+register_job_tools(mcp, jobs)
+
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
+
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "multi_analyst", jobs=jobs)
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
+
+# The same warm upstreams as the yfinance and supabase servers when the launcher
+# runs them in one process (see runtime/upstreams.py)
+yfinance_upstream = upstreams.upstream(StdioServerParameters(command="uvx", args=["yfmcp@latest"]))
+supabase_upstream = upstreams.upstream(
+    StdioServerParameters(
+        command="npx",
+        args=["-y", "@supabase/mcp-server-supabase@latest"],
+        env={"SUPABASE_ACCESS_TOKEN": os.getenv("SUPABASE_ACCESS_TOKEN"), **os.environ},
+    )
+)
 
 
 # Function for per-user memory
 def get_user_memory(user_id: str):
+    from crewai.memory import EntityMemory
+    from crewai.memory.storage.rag_storage import RAGStorage
+
     return EntityMemory(
         storage=RAGStorage(
             embedder_config={
@@ -27,62 +61,55 @@ def get_user_memory(user_id: str):
 
 
 @mcp.tool(name="multi_analyst")
-async def multi_analyst_tool(question: str, user_id: str) -> str:
+async def multi_analyst_tool(question: str, user_id: str, llm: str = None) -> str:
     """Handle financial and DB questions using unified tool access."""
-    yfinance_params = StdioServerParameters(command="uvx", args=["yfmcp@latest"])
-    supabase_params = StdioServerParameters(
-        command="npx",
-        args=["-y", "@supabase/mcp-server-supabase@latest"],
-        env={"SUPABASE_ACCESS_TOKEN": os.getenv("SUPABASE_ACCESS_TOKEN"), **os.environ},
+    from crewai import Agent, Task, Crew, Process
+
+    yfinance_tools = await asyncio.to_thread(yfinance_upstream.tools)
+    supabase_tools = await asyncio.to_thread(supabase_upstream.tools)
+    tools = stable_tools(compactor.wrap(yfinance_tools + supabase_tools))
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+    memory = get_user_memory(user_id)
+
+    multi_analyst = Agent(
+        role="Professional Data & Finance Analyst",
+        goal="Answer any financial or database question using YFinance and Supabase tools.",
+        backstory="Expert in SQL, stocks, KPIs, and databases. Decides the best tool for each query.",
+        tools=tools,
+        verbose=True,
+        llm=route.llm,
+        allow_delegation=False,
+        memory=memory,
     )
 
-    mcp_adapters = []
-    try:
-        yfinance_adapter = MCPServerAdapter(yfinance_params)
-        supabase_adapter = MCPServerAdapter(supabase_params)
-        mcp_adapters = [yfinance_adapter, supabase_adapter]
-
-        tools = yfinance_adapter.tools + supabase_adapter.tools
-        llm = ChatOpenAI(model="gpt-4.1-mini")
-        memory = get_user_memory(user_id)
-
-        multi_analyst = Agent(
-            role="Professional Data & Finance Analyst",
-            goal="Answer any financial or database question using YFinance and Supabase tools.",
-            backstory="Expert in SQL, stocks, KPIs, and databases. Decides the best tool for each query.",
-            tools=tools,
-            verbose=True,
-            llm=llm,
-            allow_delegation=False,
-            memory=memory,
-        )
+    task = Task(
+        description=f"Handle this user question: {question}",
+        expected_output="Useful response using the most suitable tool.",
+        tools=tools,
+        agent=multi_analyst,
+        memory=memory,
+    )
 
-        task = Task(
-            description=f"Handle this user question: {question}",
-            expected_output="Useful response using the most suitable tool.",
-            tools=tools,
-            agent=multi_analyst,
-            memory=memory,
-        )
+    crew = Crew(
+        agents=[multi_analyst],
+        tasks=[task],
+        process=Process.sequential,
+        memory=True,
+        entity_memory=memory,
+        verbose=True,
+        step_callback=lambda step: report_progress("Agent step finished"),
+    )
+
+    result = await route.kickoff_async(crew)
+    return result
 
-        crew = Crew(
-            agents=[multi_analyst],
-            tasks=[task],
-            process=Process.sequential,
-            memory=True,
-            entity_memory=memory,
-            verbose=True,
-        )
 
-        result = await crew.kickoff_async()
-        return result
-    finally:
-        for adapter in mcp_adapters:
-            try:
-                adapter.stop()
-            except Exception:
-                pass
+@mcp.tool(name="submit_multi_analyst")
+async def submit_multi_analyst(question: str, user_id: str, llm: str = None) -> dict:
+    """Starts multi_analyst as a background job and returns its job_id at once."""
+    return await jobs.submit("multi_analyst", multi_analyst_tool, question, user_id, llm)
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8005)
+    mcp.run(transport="sse", host=server_host(), port=server_port("multi_analyst"))
@@ -0,0 +1,287 @@
+"""
+Record/replay of LLM calls and upstream MCP tool calls.
+
+    MCP_CASSETTE=cassettes/supabase.jsonl.gz MCP_CASSETTE_MODE=record python src/supabase_mcp_server.py
+    MCP_CASSETTE=cassettes/supabase.jsonl.gz MCP_CASSETTE_MODE=replay MCP_CASSETTE_LATENCY=0 ...
+
+In record mode every litellm completion (the request's hash, the response and
+its latency) and every upstream MCP tool call (server, tool, arguments, result,
+latency, plus the server's tool schemas) is appended to the cassette. In replay
+mode no model or `npx`/`uvx` server is contacted: completions and tool results
+are served from the cassette, matched by request hash (falling back to the
+recorded order), after the recorded latency times MCP_CASSETTE_LATENCY
+(1 = original, 0.5 = half, 0 = no waiting). Servers get their upstream tools
+through adapter(params) instead of MCPServerAdapter(params).
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Type
+
+CASSETTE_PATH = os.getenv("MCP_CASSETTE", "")
+MODE = os.getenv("MCP_CASSETTE_MODE", "record" if CASSETTE_PATH else "off")
+LATENCY_SCALE = float(os.getenv("MCP_CASSETTE_LATENCY", "1"))
+
+
+def request_key(*parts) -> str:
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+def server_label(params) -> str:
+    """Stable name of an upstream server: its command line or URL."""
+    if isinstance(params, dict):
+        return params.get("url", json.dumps(params, sort_keys=True))
+    return " ".join([params.command, *params.args])
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "off", latency_scale: float = 1.0):
+        self.path = path
+        self.mode = mode if path else "off"
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(deque)
+        self._by_kind = defaultdict(deque)
+        self._schemas = {}
+        self.misses = 0
+        if self.mode == "replay":
+            self._load()
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t")
+        return open(self.path, mode)
+
+    def _load(self):
+        with self._open("r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["kind"] == "schema":
+                    self._schemas[entry["server"]] = entry["tools"]
+                    continue
+                self._by_key[entry["key"]].append(entry)
+                self._by_kind[(entry["kind"], entry.get("group"))].append(entry)
+
+    def write(self, entry: dict):
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with self._open("a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+    def take(self, kind: str, key: str, group: str = None) -> dict:
+        """Next recorded entry with this key, else the next unused one of the same kind."""
+        with self._lock:
+            queue = self._by_key.get(key)
+            entry = None
+            while queue:
+                candidate = queue.popleft()
+                if not candidate.get("used"):
+                    entry = candidate
+                    break
+            if entry is None:
+                self.misses += 1
+                queue = self._by_kind.get((kind, group), deque())
+                while queue and queue[0].get("used"):
+                    queue.popleft()
+                if not queue:
+                    raise KeyError(f"Cassette {self.path} has no {kind} entry left for {group or key}.")
+                entry = queue.popleft()
+            entry["used"] = True
+            return entry
+
+    def delay(self, entry: dict) -> float:
+        return (entry.get("seconds") or 0) * self.latency_scale
+
+    def schemas(self, server: str) -> list:
+        if server not in self._schemas:
+            raise KeyError(f"Cassette {self.path} has no tools recorded for '{server}'.")
+        return self._schemas[server]
+
+
+cassette = Cassette(CASSETTE_PATH, MODE, LATENCY_SCALE)
+
+_installed = False
+
+
+def _completion_key(kwargs: dict) -> str:
+    return request_key(
+        kwargs.get("model"), kwargs.get("messages"), kwargs.get("tools"), kwargs.get("stop")
+    )
+
+
+def _to_dict(response) -> dict:
+    return response.model_dump() if hasattr(response, "model_dump") else dict(response)
+
+
+def install():
+    """Routes litellm completions through the cassette (no-op when the mode is off)."""
+    global _installed
+    if _installed or cassette.mode == "off":
+        return
+    import litellm
+
+    completion, acompletion = litellm.completion, litellm.acompletion
+
+    def replayed(kwargs: dict):
+        entry = cassette.take("llm", _completion_key(kwargs), kwargs.get("model"))
+        return litellm.ModelResponse(**entry["response"]), cassette.delay(entry)
+
+    def recorded(kwargs: dict, response, seconds: float):
+        if kwargs.get("stream"):
+            # Streams are consumed by the caller; they are not recorded
+            return
+        cassette.write(
+            {
+                "kind": "llm",
+                "group": kwargs.get("model"),
+                "key": _completion_key(kwargs),
+                "seconds": round(seconds, 4),
+                "response": _to_dict(response),
+            }
+        )
+
+    def cassette_completion(*args, **kwargs):
+        if args:
+            kwargs.setdefault("model", args[0])
+            args = args[1:]
+        if cassette.mode == "replay":
+            response, delay = replayed(kwargs)
+            time.sleep(delay)
+            return response
+        start = time.perf_counter()
+        response = completion(*args, **kwargs)
+        recorded(kwargs, response, time.perf_counter() - start)
+        return response
+
+    async def cassette_acompletion(*args, **kwargs):
+        if args:
+            kwargs.setdefault("model", args[0])
+            args = args[1:]
+        if cassette.mode == "replay":
+            response, delay = replayed(kwargs)
+            await asyncio.sleep(delay)
+            return response
+        start = time.perf_counter()
+        response = await acompletion(*args, **kwargs)
+        recorded(kwargs, response, time.perf_counter() - start)
+        return response
+
+    litellm.completion = cassette_completion
+    litellm.acompletion = cassette_acompletion
+    _installed = True
+
+
+def _record_tools(server: str, tools) -> list:
+    """Wraps live adapter tools so their calls (and schemas) are written to the cassette."""
+    from crewai.tools import BaseTool
+    from pydantic import BaseModel
+
+    cassette.write(
+        {
+            "kind": "schema",
+            "server": server,
+            "tools": [
+                {
+                    "name": t.name,
+                    "description": t.description,
+                    "parameters": t.args_schema.model_json_schema(),
+                }
+                for t in tools
+            ],
+        }
+    )
+    wrapped = []
+    for inner in tools:
+
+        class RecordedTool(BaseTool):
+            name: str = inner.name
+            description: str = inner.description
+            args_schema: Type[BaseModel] = inner.args_schema
+
+            def _run(self, _inner=inner, **kwargs):
+                start = time.perf_counter()
+                result = _inner.run(**kwargs)
+                cassette.write(
+                    {
+                        "kind": "tool",
+                        "group": f"{server}::{_inner.name}",
+                        "key": request_key(server, _inner.name, kwargs),
+                        "seconds": round(time.perf_counter() - start, 4),
+                        "result": result,
+                    }
+                )
+                return result
+
+        wrapped.append(RecordedTool())
+    return wrapped
+
+
+def _replayed_tools(server: str) -> list:
+    from crewai.tools import BaseTool
+    from mcpadapt.utils.modeling import create_model_from_json_schema
+    from pydantic import BaseModel
+
+    tools = []
+    for schema in cassette.schemas(server):
+
+        class ReplayedTool(BaseTool):
+            name: str = schema["name"]
+            description: str = schema["description"]
+            args_schema: Type[BaseModel] = create_model_from_json_schema(schema["parameters"])
+
+            def _run(self, **kwargs):
+                entry = cassette.take(
+                    "tool", request_key(server, self.name, kwargs), f"{server}::{self.name}"
+                )
+                time.sleep(cassette.delay(entry))
+                return entry["result"]
+
+        tools.append(ReplayedTool())
+    return tools
+
+
+class _Adapter:
+    """Same surface as MCPServerAdapter (.tools, .stop(), context manager)."""
+
+    def __init__(self, params, **kwargs):
+        self.server = server_label(params)
+        self._live = None
+        if cassette.mode == "replay":
+            self.tools = _replayed_tools(self.server)
+            return
+        from crewai_tools import MCPServerAdapter
+
+        self._live = MCPServerAdapter(params, **kwargs)
+        self.tools = self._live.tools
+        if cassette.mode == "record":
+            self.tools = _record_tools(self.server, self.tools)
+
+    def stop(self):
+        if self._live is not None:
+            self._live.stop()
+
+    def __enter__(self):
+        return self.tools
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def adapter(params, **kwargs):
+    """MCPServerAdapter(params), recorded to or replayed from the cassette when one is set."""
+    if cassette.mode == "off":
+        from crewai_tools import MCPServerAdapter
+
+        return MCPServerAdapter(params, **kwargs)
+    return _Adapter(params, **kwargs)
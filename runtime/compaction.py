@@ -0,0 +1,327 @@
+"""
+Compaction of upstream tool results before they enter the agent's context.
+
+GitHub listings, Supabase execute_sql, Airbnb searches or read_csv_file can
+return far more text than the next LLM turn needs. Compactor.wrap() puts a
+compaction step between the MCPServerAdapter tools and the agent: results over
+`max_tokens` are reduced per tool by one of
+
+    truncate   keep the first max_chars characters (at most max_tokens worth)
+    rows       keep max_rows rows (first and last) of the largest list of
+               records, only `columns` if given and strings cut to
+               max_value_chars, plus the number of records in the result
+    summarize  row count and per-column statistics with a few sample rows
+    auto       rows for JSON with a list of records, otherwise truncate
+    none       pass the result through
+
+The full result is kept in memory for `ttl_seconds` under a reference that the
+agent can page through with the fetch_full_result tool (and MCP clients with
+the tool_result tool). Defaults and per-tool settings come from the
+[compaction] section of servers.toml.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Type
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import load_config  # noqa: E402
+
+DEFAULTS = {
+    "strategy": "auto",
+    "max_tokens": 2000,
+    "max_chars": 6000,
+    "max_rows": 20,
+    "max_value_chars": 300,
+    "columns": None,
+    "ttl_seconds": 3600,
+}
+
+# Full results kept per process (oldest dropped first)
+MAX_RESULTS = int(os.getenv("MCP_COMPACTION_MAX_RESULTS", "200"))
+
+# Keys under which tools commonly nest their records
+_RECORD_KEYS = ("rows", "data", "items", "results", "searchResults", "records")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return len(text) // 4
+
+
+def _parse_json(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # Results wrapped in prose or tags: try the outermost JSON array/object
+    for open_char, close_char in (("[", "]"), ("{", "}")):
+        start, end = text.find(open_char), text.rfind(close_char)
+        if 0 <= start < end:
+            try:
+                return json.loads(text[start : end + 1])
+            except ValueError:
+                continue
+    return None
+
+
+def _find_records(data):
+    """(path, records) of the largest list of dicts at the top or one level down."""
+    if isinstance(data, list) and data and all(isinstance(r, dict) for r in data):
+        return (), data
+    best = None
+    if isinstance(data, dict):
+        keys = sorted(data, key=lambda k: k not in _RECORD_KEYS)
+        for key in keys:
+            value = data[key]
+            if isinstance(value, list) and value and all(isinstance(r, dict) for r in value):
+                if best is None or len(value) > len(best[1]):
+                    best = ((key,), value)
+    return best or (None, None)
+
+
+def _project(records: list, columns) -> list:
+    if not columns:
+        return records
+    return [{c: r.get(c) for c in columns if c in r} for r in records]
+
+
+def _shorten(value, max_chars: int):
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "..."
+    if isinstance(value, (dict, list)):
+        text = json.dumps(value, default=str)
+        return value if len(text) <= max_chars else text[:max_chars] + "..."
+    return value
+
+
+def _sample(records: list, max_rows: int) -> list:
+    if len(records) <= max_rows:
+        return records
+    head = max_rows - max_rows // 4
+    return records[:head] + records[len(records) - (max_rows - head) :]
+
+
+def _column_stats(records: list) -> dict:
+    stats = {}
+    columns = []
+    for r in records:
+        columns.extend(c for c in r if c not in columns)
+    for c in columns:
+        values = [r.get(c) for r in records if r.get(c) is not None]
+        column = {"non_null": len(values)}
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if numbers and len(numbers) == len(values):
+            column.update(min=min(numbers), max=max(numbers), mean=round(sum(numbers) / len(numbers), 4))
+        else:
+            counts = {}
+            for v in values:
+                key = _shorten(v if isinstance(v, (str, int, float, bool)) else json.dumps(v, default=str), 80)
+                counts[key] = counts.get(key, 0) + 1
+            column["distinct"] = len(counts)
+            column["top"] = sorted(counts.items(), key=lambda kv: -kv[1])[:5]
+        stats[c] = column
+    return stats
+
+
+class ResultStore:
+    """Full tool results by reference, for ttl_seconds and at most max_results."""
+
+    def __init__(self, max_results: int = MAX_RESULTS):
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, tool: str, text: str, ttl_seconds: float) -> str:
+        ref = "res-" + hashlib.sha256(f"{tool}\0{text}".encode()).hexdigest()[:16]
+        with self._lock:
+            self._results[ref] = {"tool": tool, "text": text, "expires": time.time() + ttl_seconds}
+            self._results.move_to_end(ref)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return ref
+
+    def get(self, ref: str, offset: int = 0, limit: int = 4000) -> dict:
+        with self._lock:
+            entry = self._results.get(ref)
+            if entry is None or entry["expires"] < time.time():
+                self._results.pop(ref, None)
+                raise ValueError(f"Unknown or expired result reference '{ref}'.")
+        text = entry["text"]
+        chunk = text[offset : offset + limit]
+        next_offset = offset + len(chunk)
+        return {
+            "ref": ref,
+            "tool": entry["tool"],
+            "total_chars": len(text),
+            "offset": offset,
+            "text": chunk,
+            "next_offset": next_offset if next_offset < len(text) else None,
+        }
+
+
+class Compactor:
+    def __init__(self, config: dict = None, store: ResultStore = None):
+        if config is None:
+            config = load_config().get("compaction", {})
+        self.defaults = {**DEFAULTS, **{k: v for k, v in config.items() if k != "tools"}}
+        self.tools = config.get("tools", {})
+        self.store = store or ResultStore()
+        self.totals = {"calls": 0, "compacted": 0, "tokens_in": 0, "tokens_out": 0}
+        self._lock = threading.Lock()
+
+    def policy(self, tool: str) -> dict:
+        return {**self.defaults, **self.tools.get(tool, {})}
+
+    def _truncate(self, text: str, policy: dict) -> str:
+        limit = min(policy["max_chars"], policy["max_tokens"] * 4)
+        return text[:limit] + f"\n... [{len(text) - limit} more characters]"
+
+    def _rows(self, data, policy: dict):
+        path, records = _find_records(data)
+        if records is None:
+            return None
+        rows = _sample(_project(records, policy["columns"]), policy["max_rows"])
+        rows = [{c: _shorten(v, policy["max_value_chars"]) for c, v in r.items()} for r in rows]
+        compacted = {}
+        if path and isinstance(data, dict):
+            # Keep the small fields next to the records (counts, urls, cursors) as they are:
+            # e.g. an ETL page's total_rows counts the whole table, not this page
+            for key, value in data.items():
+                if key != path[0] and not isinstance(value, (list, dict)):
+                    compacted[key] = value
+        compacted[path[0] if path else "rows"] = rows
+        fields = {
+            "records_in_result": len(records),
+            "rows_shown": len(rows),
+            "columns": list(rows[0]) if rows else [],
+        }
+        if len(records) > len(rows):
+            fields["note"] = "First and last rows shown; fetch the full result for the rest."
+        for key, value in fields.items():
+            compacted.setdefault(key, value)
+        return compacted
+
+    def _summarize(self, data, text: str, policy: dict):
+        path, records = _find_records(data)
+        if records is None:
+            lines = text.splitlines()
+            return {
+                "characters": len(text),
+                "lines": len(lines),
+                "head": "\n".join(lines[:10])[: policy["max_chars"]],
+            }
+        records = _project(records, policy["columns"])
+        return {
+            "records_in_result": len(records),
+            "columns": _column_stats(records),
+            "sample_rows": records[:3],
+        }
+
+    def compact(self, tool: str, output) -> str:
+        """Returns the result as the agent should see it, compacted if over max_tokens."""
+        text = output if isinstance(output, str) else json.dumps(output, default=str)
+        policy = self.policy(tool)
+        tokens_in = estimate_tokens(text)
+        strategy = policy["strategy"]
+        if strategy == "none" or tokens_in <= policy["max_tokens"]:
+            self._count(tokens_in, tokens_in, False)
+            return text
+
+        data = _parse_json(text) if strategy in ("auto", "rows", "summarize") else None
+        compacted = None
+        if strategy == "summarize":
+            compacted = self._summarize(data, text, policy)
+        elif strategy in ("auto", "rows") and data is not None:
+            compacted = self._rows(data, policy)
+        if compacted is None:
+            compacted = {"text": self._truncate(text, policy)}
+
+        ref = self.store.put(tool, text, policy["ttl_seconds"])
+        compacted["full_result_ref"] = ref
+        compacted["full_result_tokens"] = tokens_in
+        result = json.dumps(compacted, default=str)
+        tokens_out = estimate_tokens(result)
+        if tokens_out >= tokens_in:
+            self._count(tokens_in, tokens_in, False)
+            return text
+        self._count(tokens_in, tokens_out, True)
+        print(
+            f"Compacted {tool} result: {tokens_in} -> {tokens_out} tokens"
+            f" ({strategy}, full result {ref})",
+            flush=True,
+        )
+        return result
+
+    def _count(self, tokens_in: int, tokens_out: int, compacted: bool):
+        with self._lock:
+            self.totals["calls"] += 1
+            self.totals["compacted"] += compacted
+            self.totals["tokens_in"] += tokens_in
+            self.totals["tokens_out"] += tokens_out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.totals, "tokens_saved": self.totals["tokens_in"] - self.totals["tokens_out"]}
+
+    def wrap(self, tools) -> list:
+        """CrewAI tools whose results go through compact(), plus fetch_full_result."""
+        from crewai.tools import BaseTool
+        from pydantic import BaseModel, Field
+
+        compactor = self
+        wrapped = []
+        for inner in tools:
+
+            class CompactedTool(BaseTool):
+                name: str = inner.name
+                description: str = inner.description
+                args_schema: Type[BaseModel] = inner.args_schema
+
+                def _run(self, _inner=inner, **kwargs):
+                    return compactor.compact(_inner.name, _inner.run(**kwargs))
+
+            wrapped.append(CompactedTool())
+
+        class FetchArgs(BaseModel):
+            ref: str = Field(..., description="full_result_ref from a compacted tool result")
+            offset: int = Field(0, description="Character offset to start from")
+            limit: int = Field(4000, description="Maximum characters to return")
+
+        class FetchFullResult(BaseTool):
+            name: str = "fetch_full_result"
+            description: str = (
+                "Returns part of a tool result that was shortened (it has a full_result_ref)."
+                " Page through it with offset/limit; next_offset is null at the end."
+            )
+            args_schema: Type[BaseModel] = FetchArgs
+
+            def _run(self, ref: str, offset: int = 0, limit: int = 4000):
+                return json.dumps(compactor.store.get(ref, offset, limit))
+
+        wrapped.append(FetchFullResult())
+        return wrapped
+
+
+def register_result_tools(mcp, compactor: Compactor):
+    """Adds tool_result (page through a full upstream result) and compaction_stats to mcp."""
+
+    @mcp.tool()
+    def tool_result(ref: str, offset: int = 0, limit: int = 4000) -> dict:
+        """Returns part of a full upstream tool result kept under full_result_ref."""
+        return compactor.store.get(ref, offset, limit)
+
+    @mcp.tool()
+    def compaction_stats() -> dict:
+        """Tool results seen, compacted, and tokens before/after compaction in this server."""
+        return compactor.stats()
+
+
+# Shared by the servers of a process; full results live in its memory
+compactor = Compactor()
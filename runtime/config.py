@@ -0,0 +1,43 @@
+import os
+import tomllib
+from functools import lru_cache
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Ports and process groups of the MCP servers (see servers.toml)
+CONFIG_PATH = Path(os.getenv("MCP_SERVERS_CONFIG", str(ROOT / "servers.toml")))
+
+
+@lru_cache(maxsize=1)
+def load_config() -> dict:
+    with open(CONFIG_PATH, "rb") as f:
+        config = tomllib.load(f)
+    config.setdefault("host", "127.0.0.1")
+    config.setdefault("servers", {})
+    return config
+
+
+def server_config(name: str) -> dict:
+    servers = load_config()["servers"]
+    if name not in servers:
+        raise KeyError(f"Server '{name}' is not configured in {CONFIG_PATH}.")
+    return servers[name]
+
+
+def server_port(name: str) -> int:
+    return int(server_config(name)["port"])
+
+
+def server_host() -> str:
+    return load_config()["host"]
+
+
+def server_url(name: str) -> str:
+    """SSE URL of a configured server, e.g. http://127.0.0.1:8000/sse."""
+    return f"http://{server_host()}:{server_port(name)}/sse"
+
+
+def registry_url():
+    """Base URL of the service registry (runtime/registry.py), or None when not used."""
+    return os.getenv("MCP_REGISTRY_URL") or load_config().get("registry", {}).get("url")
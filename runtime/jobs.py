@@ -0,0 +1,268 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastmcp import Context, FastMCP
+
+# Crews run at most this many at a time per server; further jobs wait as "queued"
+JOB_WORKERS = int(os.getenv("MCP_JOB_WORKERS", "4"))
+
+# Finished jobs (and their results) are kept this long, and at most this many
+JOB_RETENTION_SECONDS = int(os.getenv("MCP_JOB_RETENTION_SECONDS", "3600"))
+JOB_MAX_FINISHED = int(os.getenv("MCP_JOB_MAX_FINISHED", "200"))
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+# Set by runtime/workers.py; prefixing job ids with it lets the front process
+# route job_status/wait_job/job_result sessions (?job=<job_id>) to the right worker
+WORKER_ID = os.getenv("MCP_WORKER_ID")
+
+# Set while a job runs so code inside the crew can report progress
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+def report_progress(message: str, step: int = None, total: int = None):
+    """
+    Records a progress event on the job running in the current context.
+    Safe to call from crew callbacks in worker threads; a no-op outside a job.
+    """
+    job = _current_job.get()
+    if job is None:
+        return
+    with job["lock"]:
+        job["steps"] = step if step is not None else job["steps"] + 1
+        if total is not None:
+            job["total"] = total
+        job["events"].append({"time": time.time(), "message": message})
+        job["updated"] = time.time()
+
+
+class JobManager:
+    """
+    Background jobs for long-running agent tools.
+
+    submit() returns a job id immediately and runs the crew on a bounded worker
+    pool, so the MCP request finishes at once and a browser reload does not lose
+    the work. Clients poll job_status/wait_job, then fetch job_result. Finished
+    jobs are kept for retention_seconds (at most max_finished of them).
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        retention_seconds: int = JOB_RETENTION_SECONDS,
+        max_finished: int = JOB_MAX_FINISHED,
+    ):
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self._jobs: dict = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._slots = None
+
+    def _prune(self):
+        now = time.time()
+        finished = sorted(
+            (j for j in self._jobs.values() if j["state"] in FINISHED_STATES),
+            key=lambda j: j["finished"],
+        )
+        for i, job in enumerate(finished):
+            expired = now - job["finished"] > self.retention_seconds
+            if expired or len(finished) - i > self.max_finished:
+                self._jobs.pop(job["id"], None)
+
+    def _get(self, job_id: str) -> dict:
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown or expired job_id '{job_id}'.")
+        return job
+
+    async def submit(self, kind: str, fn, *args, **kwargs) -> dict:
+        """Queues fn(*args, **kwargs) (sync or async) and returns the job's status."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        self._prune()
+        job_id = uuid.uuid4().hex
+        if WORKER_ID is not None:
+            job_id = f"w{WORKER_ID}-{job_id}"
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "state": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "updated": time.time(),
+            "steps": 0,
+            "total": None,
+            "events": [],
+            "error": None,
+            "result": None,
+            "delivered": False,
+            "lock": threading.Lock(),
+        }
+        self._jobs[job_id] = job
+        job["task"] = asyncio.create_task(self._run(job, fn, args, kwargs))
+        return self.status(job_id)
+
+    async def _run(self, job: dict, fn, args, kwargs):
+        try:
+            async with self._slots:
+                job["state"] = "running"
+                job["started"] = job["updated"] = time.time()
+                _current_job.set(job)
+                if inspect.iscoroutinefunction(fn):
+                    result = await fn(*args, **kwargs)
+                else:
+                    # Sync crews (crew.kickoff) run on the pool's threads
+                    call = functools.partial(fn, *args, **kwargs)
+                    ctx = contextvars.copy_context()
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self._executor, ctx.run, call
+                    )
+            job["result"] = result
+            job["state"] = "succeeded"
+        except asyncio.CancelledError:
+            job["state"] = "cancelled"
+        except Exception as e:
+            job["error"] = f"{type(e).__name__}: {e}"
+            job["state"] = "failed"
+        finally:
+            job["finished"] = job["updated"] = time.time()
+
+    def active(self) -> int:
+        """Number of queued and running jobs."""
+        return sum(j["state"] not in FINISHED_STATES for j in self._jobs.values())
+
+    def pending(self) -> int:
+        """Jobs a client still needs: unfinished, or finished with the result not fetched."""
+        self._prune()
+        return sum(not j["delivered"] for j in self._jobs.values())
+
+    def status(self, job_id: str, since_event: int = 0) -> dict:
+        job = self._get(job_id)
+        with job["lock"]:
+            events = job["events"][since_event:]
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "state": job["state"],
+            "created": job["created"],
+            "started": job["started"],
+            "finished": job["finished"],
+            "steps": job["steps"],
+            "total": job["total"],
+            "message": job["events"][-1]["message"] if job["events"] else None,
+            "events": events,
+            "next_event": since_event + len(events),
+            "error": job["error"],
+        }
+
+    async def wait(
+        self, job_id: str, timeout: float = 30, since_event: int = 0, on_update=None
+    ) -> dict:
+        """Long-polls until the job finishes, reports new progress, or timeout passes."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        job = self._get(job_id)
+        seen = job["updated"]
+        while job["state"] not in FINISHED_STATES and time.monotonic() < deadline:
+            await asyncio.sleep(0.5)
+            if job["updated"] != seen:
+                seen = job["updated"]
+                if on_update is not None:
+                    await on_update(self.status(job_id, since_event))
+        return self.status(job_id, since_event)
+
+    def result(self, job_id: str):
+        job = self._get(job_id)
+        if job["state"] in FINISHED_STATES:
+            job["delivered"] = True
+        if job["state"] == "succeeded":
+            return job["result"]
+        if job["state"] == "failed":
+            raise ValueError(f"Job {job_id} failed: {job['error']}")
+        raise ValueError(f"Job {job_id} is {job['state']}; no result available.")
+
+    def cancel(self, job_id: str) -> dict:
+        """
+        Cancels a queued or running job. A sync crew already running on a worker
+        thread cannot be interrupted; it finishes in the background and its result
+        is discarded.
+        """
+        job = self._get(job_id)
+        if job["state"] not in FINISHED_STATES:
+            job["task"].cancel()
+            job["state"] = "cancelled"
+            job["finished"] = job["updated"] = time.time()
+        job["delivered"] = True
+        return self.status(job_id)
+
+    def list(self) -> list:
+        self._prune()
+        return [
+            {"job_id": j["id"], "kind": j["kind"], "state": j["state"], "created": j["created"]}
+            for j in self._jobs.values()
+        ]
+
+
+def register_job_tools(mcp: FastMCP, jobs: JobManager):
+    """Adds the job_status, wait_job, job_result, cancel_job and list_jobs tools."""
+
+    @mcp.tool()
+    def job_status(job_id: str, since_event: int = 0) -> dict:
+        """
+        Returns the state (queued, running, succeeded, failed, cancelled) and progress of a job.
+        Args:
+            job_id (str): Id returned by a submit_* tool.
+            since_event (int): Only return progress events from this index on
+                (pass the previous "next_event").
+        """
+        return jobs.status(job_id, since_event)
+
+    @mcp.tool()
+    async def wait_job(
+        job_id: str, timeout: float = 30, since_event: int = 0, ctx: Context = None
+    ) -> dict:
+        """
+        Waits up to `timeout` seconds for a job to finish, streaming progress
+        notifications meanwhile, and returns its status.
+        """
+
+        async def notify(status):
+            if ctx is not None:
+                await ctx.report_progress(status["steps"], status["total"])
+                if status["message"]:
+                    await ctx.info(status["message"])
+
+        return await jobs.wait(job_id, timeout, since_event, notify)
+
+    @mcp.tool()
+    def job_result(job_id: str):
+        """Returns the result of a succeeded job (errors if it is not finished)."""
+        return jobs.result(job_id)
+
+    @mcp.tool()
+    def cancel_job(job_id: str) -> dict:
+        """Cancels a queued or running job."""
+        return jobs.cancel(job_id)
+
+    @mcp.tool()
+    def list_jobs() -> list:
+        """Lists the jobs known to this server."""
+        return jobs.list()
+
+    if WORKER_ID is not None:
+        from starlette.responses import JSONResponse
+
+        # Polled by runtime/workers.py: a draining worker is only stopped once
+        # no client still needs one of its jobs
+        @mcp.custom_route("/worker/jobs", methods=["GET"])
+        async def worker_jobs(request):
+            return JSONResponse({"active_jobs": jobs.active(), "pending_jobs": jobs.pending()})
@@ -0,0 +1,284 @@
+"""
+Starts the MCP agent servers listed in servers.toml.
+
+    python runtime/launcher.py                     # every server, grouped as configured
+    python runtime/launcher.py --only supabase brave
+    python runtime/launcher.py --separate          # one process per server
+    python runtime/launcher.py --warm-upstreams    # start the npx/uvx tool servers up front
+    python runtime/launcher.py --compare-memory    # RSS of --separate vs. grouped, then exit
+    python runtime/launcher.py --profile-imports   # import time per server, then exit
+
+Servers that share a `group` are imported into one Python process, so crewai,
+langchain, pandas and any module-level clients are loaded once for all of them;
+each server is still served on its own configured port, so client URLs do not
+change. The upstream MCP tool servers (npx/uvx subprocesses, runtime/upstreams.py)
+are kept warm per process and shared by every server of the group that uses the
+same command, e.g. one Supabase upstream for supabase and multi_analyst.
+Crashed processes are restarted.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from runtime import upstreams  # noqa: E402
+from runtime.config import load_config, server_config  # noqa: E402
+from runtime.lazy import parse_importtime  # noqa: E402
+from runtime.registry import advertise  # noqa: E402
+
+# Seconds to wait for every process to listen on its ports (crewai imports are slow)
+READY_TIMEOUT = float(os.getenv("MCP_LAUNCH_TIMEOUT", "300"))
+
+
+def _load_server(name: str):
+    """Imports a server script by path and returns its FastMCP instance."""
+    script = ROOT / server_config(name)["script"]
+    sys.path.insert(0, str(script.parent))
+    spec = importlib.util.spec_from_file_location(f"mcp_server_{name}", script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.mcp
+
+
+async def _serve(names: list, warm: bool = False):
+    host = load_config()["host"]
+    servers = [(_load_server(name), server_config(name)["port"]) for name in names]
+    for label, s in upstreams.stats().items():
+        print(f"Upstream shared by {s['servers']} server(s): {label}", flush=True)
+    if warm:
+        # Before listening, so a ready process has its upstreams running
+        await asyncio.to_thread(upstreams.warm)
+    # Servers that do not register themselves (the ETL server) are registered here
+    for name, (mcp, _) in zip(names, servers):
+        advertise(mcp, name)
+    await asyncio.gather(*(mcp.run_sse_async(host=host, port=port) for mcp, port in servers))
+
+
+def _import_only(name: str):
+    """Imports one server and lists its tools, as a client's first request would."""
+    start = time.perf_counter()
+    mcp = _load_server(name)
+    tools = mcp._tool_manager.list_tools()
+    print(f"{len(tools)} tools listed {time.perf_counter() - start:.2f}s after start", flush=True)
+
+
+def profile_imports(names: list, top: int = 10):
+    """Runs each server's import under `python -X importtime` and prints the slowest imports."""
+    for name in names:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", __file__, "--import-only", name],
+            capture_output=True,
+            text=True,
+        )
+        rows = parse_importtime(proc.stderr)
+        total = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+        print(f"\n{name}: {proc.stdout.strip() or 'import failed'}")
+        print(f"  imports: {total / 1e6:.2f}s")
+        slowest = sorted((r for r in rows if r[3] == 0), key=lambda r: -r[2])[:top]
+        for module, _, cumulative, _ in slowest:
+            print(f"  {cumulative / 1e6:8.3f}s  {module}")
+        if proc.returncode:
+            print("  " + proc.stderr.strip().splitlines()[-1])
+
+
+def plan(names: list, separate: bool = False) -> list:
+    """Splits the servers into processes: one per group, one per ungrouped server."""
+    processes = {}
+    for name in names:
+        group = None if separate else server_config(name).get("group")
+        processes.setdefault(group or f"server:{name}", []).append(name)
+    return list(processes.values())
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid: int) -> list:
+    """All descendant pids (MCP tool subprocesses such as npx/uvx servers)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            parents.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+class ServerProcess:
+    def __init__(self, names: list, warm: bool = False):
+        self.names = names
+        self.warm = warm
+        self.proc = None
+
+    def start(self):
+        warm = ["--warm-upstreams"] if self.warm else []
+        self.proc = subprocess.Popen([sys.executable, __file__, *warm, "--serve", *self.names])
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def ready(self) -> bool:
+        host = load_config()["host"]
+        for name in self.names:
+            try:
+                with socket.create_connection((host, server_config(name)["port"]), timeout=0.2):
+                    pass
+            except OSError:
+                return False
+        return True
+
+    def stop(self):
+        if self.alive():
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    def memory_kb(self) -> tuple:
+        """(RSS of the server process, RSS of its child processes) in KiB, number of children."""
+        if not self.alive():
+            return 0, 0, 0
+        children = _children(self.proc.pid)
+        return _rss_kb(self.proc.pid), sum(_rss_kb(c) for c in children), len(children)
+
+
+def start_all(processes: list):
+    for p in processes:
+        p.start()
+    deadline = time.monotonic() + READY_TIMEOUT
+    while not all(p.ready() for p in processes):
+        dead = [p for p in processes if not p.alive()]
+        if dead:
+            raise RuntimeError(f"Server process exited during startup: {dead[0].names}")
+        if time.monotonic() > deadline:
+            raise RuntimeError("Servers did not start listening in time.")
+        time.sleep(0.5)
+
+
+def memory_report(processes: list, title: str) -> int:
+    print(f"\n{title}")
+    total = 0
+    for p in processes:
+        own, children, count = p.memory_kb()
+        total += own + children
+        print(
+            f"  pid {p.proc.pid:<7} {own / 1024:8.1f} MiB"
+            f" (+{children / 1024:.1f} MiB in {count} upstream subprocesses)  {', '.join(p.names)}"
+        )
+    print(f"  total {total / 1024:.1f} MiB in {len(processes)} process(es)", flush=True)
+    return total
+
+
+def compare_memory(names: list):
+    """RSS of both layouts with every upstream warm, so the shared upstreams are counted."""
+    results = {}
+    for label, separate in (("one process per server", True), ("grouped", False)):
+        processes = [ServerProcess(group, warm=True) for group in plan(names, separate)]
+        try:
+            start_all(processes)
+            results[label] = memory_report(processes, f"Memory, {label}:")
+        finally:
+            for p in processes:
+                p.stop()
+    before, after = results["one process per server"], results["grouped"]
+    if before:
+        print(f"\nGrouped layout uses {after / before:.0%} of the per-server memory.")
+
+
+def supervise(processes: list):
+    try:
+        while True:
+            time.sleep(2)
+            for p in processes:
+                if not p.alive():
+                    print(f"{', '.join(p.names)} exited ({p.proc.returncode}), restarting", flush=True)
+                    time.sleep(3)
+                    p.start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in processes:
+            p.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", help="Start only these servers")
+    parser.add_argument(
+        "--separate", action="store_true", help="One process per server (no groups)"
+    )
+    parser.add_argument(
+        "--warm-upstreams",
+        action="store_true",
+        help="Start every server's upstream MCP tool servers before listening",
+    )
+    parser.add_argument(
+        "--compare-memory",
+        action="store_true",
+        help="Start the servers separately, then grouped, report RSS and exit",
+    )
+    parser.add_argument(
+        "--profile-imports",
+        action="store_true",
+        help="Report each server's import time and slowest imports, then exit",
+    )
+    parser.add_argument("--serve", nargs="+", help=argparse.SUPPRESS)
+    parser.add_argument("--import-only", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(_serve(args.serve, args.warm_upstreams))
+        return
+    if args.import_only:
+        _import_only(args.import_only)
+        return
+
+    names = args.only or list(load_config()["servers"])
+    if args.profile_imports:
+        profile_imports(names)
+        return
+    if args.compare_memory:
+        compare_memory(names)
+        return
+
+    processes = [ServerProcess(group, args.warm_upstreams) for group in plan(names, args.separate)]
+    try:
+        start_all(processes)
+    except BaseException:
+        for p in processes:
+            p.stop()
+        raise
+    for p in processes:
+        ports = ", ".join(f"{n}:{server_config(n)['port']}" for n in p.names)
+        print(f"pid {p.proc.pid}: {ports}", flush=True)
+    memory_report(processes, "Memory:")
+    supervise(processes)
+
+
+if __name__ == "__main__":
+    main()
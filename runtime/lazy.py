@@ -0,0 +1,50 @@
+import importlib
+import os
+import threading
+import time
+
+# Heavy agent dependencies. Servers import them inside their tools, so the server
+# starts (and answers list_tools) without loading them.
+AGENT_MODULES = ("crewai", "crewai_tools", "langchain_openai")
+
+# MCP_PRELOAD=1 imports them in the background once the server is up, so the
+# first question does not pay for the imports either
+PRELOAD = os.getenv("MCP_PRELOAD", "0") == "1"
+PRELOAD_DELAY = float(os.getenv("MCP_PRELOAD_DELAY", "1.0"))
+
+
+def preload_in_background(modules=AGENT_MODULES, delay: float = PRELOAD_DELAY):
+    """Imports modules on a daemon thread after `delay` seconds (only with MCP_PRELOAD=1)."""
+    if not PRELOAD:
+        return None
+
+    def run():
+        time.sleep(delay)
+        start = time.perf_counter()
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"Preloading {name} failed: {e}", flush=True)
+        print(f"Preloaded {', '.join(modules)} in {time.perf_counter() - start:.1f}s", flush=True)
+
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parses `python -X importtime` output.
+    Returns:
+        list: (module, self_us, cumulative_us, depth) per import, in import order.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        # One leading space, then two more per nesting level
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
@@ -0,0 +1,346 @@
+"""
+Service registry for the MCP agent servers.
+
+    python runtime/registry.py --port 8100
+    MCP_REGISTRY_URL=http://127.0.0.1:8100 python runtime/launcher.py
+
+Servers started with MCP_REGISTRY_URL set (or a [registry] url in servers.toml)
+register on startup with their URL, tool names and capacity, then send a
+heartbeat with their in-flight tool calls and health every few seconds.
+Instances that stop sending heartbeats are dropped. Apps ask the registry for
+the healthy instances of a server and call the least-loaded one, so replicas
+of an analyst (e.g. on several hosts or ports) share the traffic; without a
+registry they fall back to the URLs in servers.toml.
+
+Under runtime/workers.py the worker processes do not register themselves: each
+reports its load at GET /worker/load, and the front process registers the pool
+once, under the public URL, with the combined load.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from runtime.config import load_config, registry_url, server_config, server_url  # noqa: E402
+
+# Seconds between heartbeats; instances silent for INSTANCE_TTL are dropped
+HEARTBEAT_SECONDS = float(os.getenv("MCP_HEARTBEAT_SECONDS", "5"))
+INSTANCE_TTL = float(os.getenv("MCP_INSTANCE_TTL", "15"))
+
+# Concurrent tool calls a server instance is meant to take
+DEFAULT_CAPACITY = int(os.getenv("MCP_CAPACITY", "4"))
+
+# Apps give up on the registry after this long and use servers.toml instead
+LOOKUP_TIMEOUT = float(os.getenv("MCP_REGISTRY_TIMEOUT", "2"))
+
+# Set by runtime/workers.py in its worker processes
+WORKER_ID = os.getenv("MCP_WORKER_ID")
+
+_advertised = {}
+
+
+class Registry:
+    def __init__(self, ttl: float = INSTANCE_TTL):
+        self.ttl = ttl
+        self._instances: dict = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        now = time.time()
+        for instance_id, instance in list(self._instances.items()):
+            if now - instance["last_seen"] > self.ttl:
+                del self._instances[instance_id]
+
+    def register(self, info: dict) -> dict:
+        instance_id = info.get("id") or uuid.uuid4().hex
+        instance = {
+            "id": instance_id,
+            "name": info["name"],
+            "title": info.get("title"),
+            "url": info["url"],
+            "tools": list(info.get("tools", [])),
+            "capacity": int(info.get("capacity", DEFAULT_CAPACITY)),
+            "load": int(info.get("load", 0)),
+            "healthy": bool(info.get("healthy", True)),
+            "registered": time.time(),
+            "last_seen": time.time(),
+        }
+        with self._lock:
+            self._instances[instance_id] = instance
+        return instance
+
+    def heartbeat(self, instance_id: str, load: int, healthy: bool, capacity: int = None) -> bool:
+        """Updates an instance; False if it is unknown (expired), so it should register again."""
+        with self._lock:
+            self._prune()
+            instance = self._instances.get(instance_id)
+            if instance is None:
+                return False
+            instance.update(load=int(load), healthy=bool(healthy), last_seen=time.time())
+            if capacity is not None:
+                instance["capacity"] = int(capacity)
+            return True
+
+    def remove(self, instance_id: str) -> bool:
+        with self._lock:
+            return self._instances.pop(instance_id, None) is not None
+
+    def instances(self, name: str = None, tool: str = None, healthy_only: bool = True) -> list:
+        """Matching instances, least loaded (relative to capacity) first."""
+        with self._lock:
+            self._prune()
+            found = [
+                dict(i)
+                for i in self._instances.values()
+                if (name is None or i["name"] == name)
+                and (tool is None or tool in i["tools"])
+                and (i["healthy"] or not healthy_only)
+            ]
+        return sorted(found, key=_load_key)
+
+
+def _load_key(instance: dict):
+    return (instance["load"] / max(instance["capacity"], 1), instance["load"])
+
+
+def create_app(registry: Registry):
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def register(request):
+        info = await request.json()
+        if not info.get("name") or not info.get("url"):
+            return JSONResponse({"error": "'name' and 'url' are required."}, status_code=400)
+        return JSONResponse(registry.register(info))
+
+    async def heartbeat(request):
+        body = await request.json()
+        known = registry.heartbeat(
+            request.path_params["instance_id"],
+            body.get("load", 0),
+            body.get("healthy", True),
+            body.get("capacity"),
+        )
+        if not known:
+            return JSONResponse({"error": "Unknown instance, register again."}, status_code=404)
+        return JSONResponse({"ok": True})
+
+    async def remove(request):
+        registry.remove(request.path_params["instance_id"])
+        return JSONResponse({"ok": True})
+
+    async def instances(request):
+        query = request.query_params
+        return JSONResponse(
+            registry.instances(
+                name=query.get("name"),
+                tool=query.get("tool"),
+                healthy_only=query.get("all") != "1",
+            )
+        )
+
+    return Starlette(
+        routes=[
+            Route("/register", register, methods=["POST"]),
+            Route("/heartbeat/{instance_id}", heartbeat, methods=["POST"]),
+            Route("/instances/{instance_id}", remove, methods=["DELETE"]),
+            Route("/instances", instances),
+        ]
+    )
+
+
+def _track_load(mcp) -> dict:
+    """Counts the tool calls in flight on mcp (wraps its tool manager's call_tool)."""
+    state = {"in_flight": 0}
+    call_tool = mcp._tool_manager.call_tool
+
+    async def counted_call_tool(*args, **kwargs):
+        state["in_flight"] += 1
+        try:
+            return await call_tool(*args, **kwargs)
+        finally:
+            state["in_flight"] -= 1
+
+    mcp._tool_manager.call_tool = counted_call_tool
+    return state
+
+
+def _listening(url: str) -> bool:
+    parsed = urlparse(url)
+    try:
+        with socket.create_connection((parsed.hostname, parsed.port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def advertise(mcp, name: str, jobs=None, capacity: int = DEFAULT_CAPACITY):
+    """
+    Registers server `name` with the registry once it is listening and keeps
+    sending heartbeats on a daemon thread. Load is the number of tool calls in
+    flight plus queued/running background jobs. A no-op without a registry URL
+    or when the server was already advertised in this process. In a worker of
+    runtime/workers.py it only serves GET /worker/load for the front process.
+    """
+    base = registry_url()
+    if not base or name in _advertised:
+        return None
+
+    load = _track_load(mcp)
+
+    def current_load() -> int:
+        return load["in_flight"] + (jobs.active() if jobs is not None else 0)
+
+    def tools() -> list:
+        return [t.name for t in mcp._tool_manager.list_tools()]
+
+    if WORKER_ID is not None:
+        from starlette.responses import JSONResponse
+
+        @mcp.custom_route("/worker/load", methods=["GET"])
+        async def worker_load(request):
+            return JSONResponse(
+                {"name": name, "tools": tools(), "capacity": capacity, "load": current_load()}
+            )
+
+        _advertised[name] = None
+        return None
+
+    url = os.getenv("MCP_ADVERTISE_URL") or server_url(name)
+    thread = heartbeat(
+        name,
+        url,
+        lambda: {
+            "tools": tools(),
+            "capacity": capacity,
+            "load": current_load(),
+            "healthy": _listening(url),
+        },
+    )
+    _advertised[name] = thread
+    return thread
+
+
+def heartbeat(name: str, url: str, state) -> threading.Thread:
+    """
+    Registers an instance of server `name` at url and keeps it alive on a daemon
+    thread. state() returns its current {"tools", "capacity", "load", "healthy"};
+    an unhealthy instance is not registered until it becomes healthy.
+    """
+    import httpx
+
+    base = registry_url().rstrip("/")
+
+    def run():
+        instance_id = None
+        with httpx.Client(timeout=LOOKUP_TIMEOUT) as client:
+            while True:
+                current = state()
+                try:
+                    if instance_id is not None:
+                        response = client.post(
+                            f"{base}/heartbeat/{instance_id}",
+                            json={
+                                "load": current["load"],
+                                "healthy": current["healthy"],
+                                "capacity": current["capacity"],
+                            },
+                        )
+                        if response.status_code == 404:
+                            instance_id = None
+                    if instance_id is None and current["healthy"]:
+                        response = client.post(
+                            f"{base}/register",
+                            json={
+                                "name": name,
+                                "title": server_config(name).get("title"),
+                                "url": url,
+                                "tools": current["tools"],
+                                "capacity": current["capacity"],
+                                "load": current["load"],
+                            },
+                        )
+                        response.raise_for_status()
+                        instance_id = response.json()["id"]
+                except httpx.HTTPError:
+                    # Registry down or restarting: keep serving, retry on the next beat
+                    instance_id = None
+                time.sleep(HEARTBEAT_SECONDS)
+
+    thread = threading.Thread(target=run, name=f"registry-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def discover(name: str = None, tool: str = None) -> list:
+    """Healthy registered instances, least loaded first; [] if there is no registry."""
+    base = registry_url()
+    if not base:
+        return []
+    import httpx
+
+    params = {k: v for k, v in (("name", name), ("tool", tool)) if v}
+    try:
+        response = httpx.get(
+            f"{base.rstrip('/')}/instances", params=params, timeout=LOOKUP_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError):
+        return []
+
+
+def route(name: str) -> str:
+    """SSE URL of the least-loaded healthy instance of a server, else its servers.toml URL."""
+    instances = discover(name=name)
+    if not instances:
+        return server_url(name)
+    # Instances under capacity first; when all are busy, the least loaded one
+    available = [i for i in instances if i["load"] < i["capacity"]]
+    return (available or instances)[0]["url"]
+
+
+def agents(titled_only: bool = True) -> list:
+    """
+    (name, title, tool) of the servers apps can offer: those registered with the
+    registry plus those configured in servers.toml.
+    """
+    servers = load_config()["servers"]
+    found = {name: (server.get("title"), [server["tool"]]) for name, server in servers.items()}
+    # Servers known only to the registry (e.g. replicas on other hosts) come last
+    for instance in discover():
+        if instance["name"] not in servers:
+            found.setdefault(instance["name"], (instance.get("title"), instance["tools"]))
+    result = []
+    for name, (title, tools) in found.items():
+        tool = servers.get(name, {}).get("tool")
+        if tool not in tools:
+            tool = tools[0] if tools else None
+        if tool and (title or not titled_only):
+            result.append((name, title or name, tool))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service registry for MCP servers")
+    parser.add_argument("--host", default=load_config()["host"])
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    print(f"Registry on http://{args.host}:{args.port}", flush=True)
+    uvicorn.run(create_app(Registry()), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
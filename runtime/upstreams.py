@@ -0,0 +1,148 @@
+"""
+Warm upstream MCP servers (the npx/uvx tool subprocesses) shared within a process.
+
+Servers declare their upstreams at import with upstream(params) and get the
+CrewAI tools per request with .tools(). The first request starts the upstream
+and later ones reuse it, from any server in the process that uses the same
+command line: with runtime/launcher.py's groups, supabase_analyst and
+multi_analyst share one `npx @supabase/mcp-server-supabase` child, yfinance and
+multi_analyst one `uvx yfmcp`. As with the ETL agent's EtlToolServer, an MCP ping
+before each reuse restarts an upstream that stopped answering.
+
+Upstreams that keep per-session state a concurrent request must not see (the
+Selenium browser) are still started per request with cassette.adapter().
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+import time
+
+from runtime import cassette
+
+# Seconds a warm upstream gets to answer the liveness ping before it is restarted
+PING_SECONDS = float(os.getenv("MCP_UPSTREAM_PING_SECONDS", "5"))
+
+
+class Upstream:
+    """One upstream MCP server, started on first use and kept for the process."""
+
+    def __init__(self, params):
+        self.params = params
+        self.label = cassette.server_label(params)
+        self.startup_seconds = None
+        self.restarts = 0
+        self.uses = 0
+        # Servers in this process that declared this upstream
+        self.servers = 0
+        self._adapter = None
+        self._tools = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        start = time.perf_counter()
+        self._adapter = cassette.adapter(self.params)
+        self._tools = list(self._adapter.tools)
+        self.startup_seconds = time.perf_counter() - start
+        print(f"Upstream ready in {self.startup_seconds:.2f}s: {self.label}", flush=True)
+
+    def _healthy(self) -> bool:
+        """MCP ping on the adapter's sessions; True when there is none (cassette replay)."""
+        # cassette's recording adapter wraps the MCPServerAdapter, which wraps mcpadapt's
+        live = getattr(self._adapter, "_live", self._adapter)
+        inner = getattr(live, "_adapter", None)
+        sessions, loop = getattr(inner, "sessions", None), getattr(inner, "loop", None)
+        if not sessions or loop is None:
+            return True
+        try:
+            for session in sessions:
+                asyncio.run_coroutine_threadsafe(session.send_ping(), loop).result(PING_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    def _ensure_locked(self):
+        if self._tools is not None and not self._healthy():
+            print(f"Upstream is not responding, restarting it: {self.label}", flush=True)
+            self._stop_locked()
+            self.restarts += 1
+        if self._tools is None:
+            self._start()
+
+    def start(self):
+        """Starts the upstream now (a no-op when it is running and answers)."""
+        with self._lock:
+            self._ensure_locked()
+
+    def tools(self) -> list:
+        """The warm upstream's CrewAI tools, (re)starting it when needed."""
+        with self._lock:
+            self._ensure_locked()
+            self.uses += 1
+            return list(self._tools)
+
+    def running(self) -> bool:
+        return self._tools is not None
+
+    def _stop_locked(self):
+        if self._adapter is not None:
+            try:
+                self._adapter.stop()
+            except Exception:
+                pass
+        self._adapter = None
+        self._tools = None
+
+    def stop(self):
+        with self._lock:
+            self._stop_locked()
+
+
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+def upstream(params) -> Upstream:
+    """The process's Upstream for params' command line (the first params given win)."""
+    label = cassette.server_label(params)
+    with _pool_lock:
+        if label not in _pool:
+            _pool[label] = Upstream(params)
+        _pool[label].servers += 1
+        return _pool[label]
+
+
+def warm():
+    """Starts every declared upstream now instead of on its first request."""
+    with _pool_lock:
+        pending = list(_pool.values())
+    for u in pending:
+        try:
+            u.start()
+        except Exception as e:
+            print(f"Upstream failed to start: {u.label}: {e}", flush=True)
+
+
+def stats() -> dict:
+    with _pool_lock:
+        return {
+            label: {
+                "running": u.running(),
+                "servers": u.servers,
+                "uses": u.uses,
+                "restarts": u.restarts,
+                "startup_seconds": u.startup_seconds,
+            }
+            for label, u in _pool.items()
+        }
+
+
+def stop_all():
+    with _pool_lock:
+        pending = list(_pool.values())
+    for u in pending:
+        u.stop()
+
+
+atexit.register(stop_all)
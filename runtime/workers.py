@@ -0,0 +1,398 @@
+"""
+Runs N worker processes of a FastMCP SSE server behind one port.
+
+    python runtime/workers.py travel_mcp_agent/mcp_server.py --port 8011 --workers 4
+
+Each worker imports the server module and serves its `mcp` on a private port.
+The front process proxies /sse streams and /messages/ posts, keeping every SSE
+session on the worker that opened it. Workers that crash are restarted, and
+with --max-sessions a worker is recycled after serving that many sessions: a
+replacement starts at once and takes all new sessions (which wait for it to
+listen), and the old worker is stopped once its sessions have closed and the
+results of its background jobs have been fetched. With a service registry
+configured, the front process registers the pool once with the combined load
+of its workers (see runtime/registry.py).
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+# The endpoint event of an SSE session: "data: /messages/?session_id=<hex>"
+_SESSION_RE = re.compile(rb"session_id=([0-9a-fA-F]+)")
+
+# Job ids created by a worker start with "w<worker id>-" (see runtime/jobs.py)
+_JOB_WORKER_RE = re.compile(r"^w(\d+)-")
+
+# How long a new session waits for a worker to listen (e.g. a replacement starting)
+WORKER_WAIT_SECONDS = float(os.getenv("MCP_WORKER_WAIT_SECONDS", "60"))
+
+# Headers that must not be copied between the client and worker connections
+_HOP_HEADERS = {"host", "content-length", "connection", "transfer-encoding", "keep-alive"}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _registry():
+    """runtime.registry, also when this file runs as a script."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from runtime import registry
+
+    return registry
+
+
+def _run_worker(script: str, port: int):
+    """Worker process entry point: import the server module and serve its mcp."""
+    script = str(Path(script).resolve())
+    sys.path.insert(0, os.path.dirname(script))
+    spec = importlib.util.spec_from_file_location("mcp_worker_app", script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.mcp.run(transport="sse", host="127.0.0.1", port=port)
+
+
+class Worker:
+    def __init__(self, index: int, script: str):
+        self.index = index
+        self.script = script
+        self.port = None
+        self.proc = None
+        self.active = 0
+        self.served = 0
+        self.draining = False
+        self.ready = False
+        self.generation = 0
+        self.pending_jobs = 0
+        self.load = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.port = _free_port()
+        self.generation += 1
+        self.active = self.served = 0
+        self.draining = self.ready = False
+        self.proc = subprocess.Popen(
+            [sys.executable, __file__, "--worker", self.script, "--port", str(self.port)],
+            env={**os.environ, "MCP_WORKER_ID": str(self.index)},
+        )
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def stop(self, timeout: float = 10):
+        if self.alive():
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    def check_ready(self) -> bool:
+        if not self.ready and self.alive():
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    self.ready = True
+            except OSError:
+                pass
+        return self.ready
+
+
+class WorkerPool:
+    """Supervises the workers and maps SSE session ids to the worker serving them."""
+
+    def __init__(self, script: str, workers: int, max_sessions: int = 0):
+        self.script = script
+        self.workers = [Worker(i, script) for i in range(workers)]
+        self.max_sessions = max_sessions
+        self.sessions: dict = {}
+        self._rr = itertools.count()
+        # Replacements get new ids, so job ids of a draining worker stay routable
+        self._ids = itertools.count(workers)
+        # Name, tools and per-worker capacity the workers advertise, once known
+        self.advertised = None
+        self.use_registry = bool(_registry().registry_url())
+
+    def start(self):
+        for w in self.workers:
+            w.start()
+
+    def stop(self):
+        for w in self.workers:
+            w.stop()
+
+    async def wait_ready(self, timeout: float = 120):
+        deadline = time.monotonic() + timeout
+        while not all(w.check_ready() for w in self.workers):
+            if time.monotonic() > deadline:
+                raise RuntimeError("Workers did not start listening in time.")
+            await asyncio.sleep(0.2)
+
+    def pick(self, query) -> Worker:
+        """Chooses the worker for a new SSE session."""
+        wanted = query.get("worker")
+        match = _JOB_WORKER_RE.match(query.get("job", ""))
+        if match:
+            wanted = match.group(1)
+        if wanted is not None:
+            for w in self.workers:
+                if str(w.index) == wanted and w.ready:
+                    return w
+        # Draining workers take no new sessions; their replacement is starting
+        candidates = [w for w in self.workers if w.ready and not w.draining]
+        if not candidates:
+            raise RuntimeError("No worker is ready.")
+        # Fewest open sessions first, round-robin between equals
+        offset = next(self._rr)
+        return min(
+            candidates,
+            key=lambda w: (w.active, (w.index - offset) % len(self.workers)),
+        )
+
+    async def wait_pick(self, query) -> Worker:
+        """pick(), waiting up to WORKER_WAIT_SECONDS for a worker to become ready."""
+        deadline = time.monotonic() + WORKER_WAIT_SECONDS
+        while True:
+            try:
+                return self.pick(query)
+            except RuntimeError:
+                if time.monotonic() > deadline:
+                    raise
+            await asyncio.sleep(0.2)
+            for w in self.workers:
+                w.check_ready()
+
+    def open_session(self, worker: Worker, session_id: str):
+        self.sessions[session_id] = worker
+        worker.served += 1
+        if self.max_sessions and worker.served >= self.max_sessions and not worker.draining:
+            worker.draining = True
+            replacement = Worker(next(self._ids), self.script)
+            replacement.start()
+            self.workers.append(replacement)
+
+    async def fetch_pending_jobs(self, worker: Worker) -> int:
+        """Jobs on the worker that clients still need (see JobManager.pending)."""
+        import httpx
+
+        try:
+            async with httpx.AsyncClient(timeout=2) as client:
+                response = await client.get(worker.url + "/worker/jobs")
+        except httpx.HTTPError:
+            # Not answering: nothing more can be fetched from it anyway
+            return 0
+        # Servers without background jobs have no such route
+        worker.pending_jobs = response.json()["pending_jobs"] if response.status_code == 200 else 0
+        return worker.pending_jobs
+
+    def close_session(self, worker: Worker, generation: int, session_id: str = None):
+        if session_id is not None and self.sessions.get(session_id) is worker:
+            del self.sessions[session_id]
+        # Streams of a process that was already replaced do not count any more
+        if worker.generation == generation:
+            worker.active -= 1
+
+    async def fetch_load(self, worker: Worker):
+        """Load the worker reports for the registry; registers the pool on the first report."""
+        import httpx
+
+        try:
+            async with httpx.AsyncClient(timeout=2) as client:
+                response = await client.get(worker.url + "/worker/load")
+        except httpx.HTTPError:
+            return
+        # Servers that do not advertise themselves have no such route
+        if response.status_code != 200:
+            return
+        info = response.json()
+        worker.load = info["load"]
+        if self.advertised is None:
+            self.advertised = info
+            registry = _registry()
+            url = os.getenv("MCP_ADVERTISE_URL") or registry.server_url(info["name"])
+            registry.heartbeat(info["name"], url, self.registry_state)
+
+    def registry_state(self) -> dict:
+        """The pool as one registry instance (called from the heartbeat thread)."""
+        workers = list(self.workers)
+        serving = [w for w in workers if w.ready and not w.draining]
+        return {
+            "tools": self.advertised["tools"],
+            "capacity": self.advertised["capacity"] * max(1, len(serving)),
+            "load": sum(w.load for w in workers if w.alive()),
+            "healthy": bool(serving),
+        }
+
+    def _forget(self, worker: Worker):
+        self.sessions = {s: x for s, x in self.sessions.items() if x is not worker}
+
+    async def supervise(self):
+        while True:
+            await asyncio.sleep(1)
+            for w in list(self.workers):
+                if w.draining:
+                    if w.alive() and (w.active > 0 or await self.fetch_pending_jobs(w)):
+                        if self.use_registry:
+                            await self.fetch_load(w)
+                        continue
+                    print(f"Recycling worker {w.index} after {w.served} sessions", flush=True)
+                    w.stop()
+                    self._forget(w)
+                    self.workers.remove(w)
+                elif w.proc is not None and not w.alive():
+                    print(f"Worker {w.index} exited ({w.proc.returncode}), restarting", flush=True)
+                    self._forget(w)
+                    w.start()
+                elif w.check_ready() and self.use_registry:
+                    await self.fetch_load(w)
+
+
+def create_app(pool: WorkerPool):
+    import httpx
+    from starlette.applications import Starlette
+    from starlette.responses import (
+        JSONResponse,
+        PlainTextResponse,
+        Response,
+        StreamingResponse,
+    )
+    from starlette.routing import Route
+
+    client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10))
+
+    def forward_headers(request):
+        return {k: v for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS}
+
+    async def sse(request):
+        try:
+            worker = await pool.wait_pick(request.query_params)
+        except RuntimeError as e:
+            return PlainTextResponse(str(e), status_code=503)
+        upstream = await client.send(
+            client.build_request("GET", worker.url + "/sse", headers=forward_headers(request)),
+            stream=True,
+        )
+        worker.active += 1
+        generation = worker.generation
+
+        async def stream():
+            session_id, head = None, b""
+            try:
+                async for chunk in upstream.aiter_raw():
+                    if session_id is None:
+                        head += chunk
+                        match = _SESSION_RE.search(head)
+                        if match:
+                            session_id = match.group(1).decode()
+                            pool.open_session(worker, session_id)
+                    yield chunk
+            finally:
+                await upstream.aclose()
+                pool.close_session(worker, generation, session_id)
+
+        headers = {
+            k: v for k, v in upstream.headers.items() if k.lower() not in _HOP_HEADERS
+        }
+        return StreamingResponse(stream(), status_code=upstream.status_code, headers=headers)
+
+    async def messages(request):
+        worker = pool.sessions.get(request.query_params.get("session_id", ""))
+        if worker is None:
+            return PlainTextResponse("Could not find session", status_code=404)
+        upstream = await client.post(
+            worker.url + "/messages/",
+            params=request.query_params,
+            content=await request.body(),
+            headers=forward_headers(request),
+        )
+        headers = {
+            k: v for k, v in upstream.headers.items() if k.lower() not in _HOP_HEADERS
+        }
+        return Response(upstream.content, status_code=upstream.status_code, headers=headers)
+
+    async def workers_status(request):
+        return JSONResponse(
+            [
+                {
+                    "worker": w.index,
+                    "pid": w.proc.pid if w.proc else None,
+                    "ready": w.ready,
+                    "draining": w.draining,
+                    "active_sessions": w.active,
+                    "served_sessions": w.served,
+                    "pending_jobs": w.pending_jobs,
+                    "load": w.load,
+                }
+                for w in pool.workers
+            ]
+        )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        pool.start()
+        await pool.wait_ready()
+        supervisor = asyncio.create_task(pool.supervise())
+        try:
+            yield
+        finally:
+            supervisor.cancel()
+            await client.aclose()
+            pool.stop()
+
+    return Starlette(
+        routes=[
+            Route("/sse", sse),
+            Route("/messages/", messages, methods=["POST"]),
+            Route("/workers", workers_status),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("script", help="Server module exposing a FastMCP `mcp` object")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("MCP_WORKERS", str(os.cpu_count() or 1))),
+        help="Worker processes (default: MCP_WORKERS or the number of CPU cores)",
+    )
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        default=int(os.getenv("MCP_WORKER_MAX_SESSIONS", "0")),
+        help="Recycle a worker after this many sessions (0 = never)",
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _run_worker(args.script, args.port)
+        return
+
+    import uvicorn
+
+    pool = WorkerPool(args.script, max(1, args.workers), args.max_sessions)
+    uvicorn.run(create_app(pool), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
+import asyncio
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from langchain_openai import ChatOpenAI
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.lazy import preload_in_background
+from runtime import upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 # Load env vars
 load_dotenv()
@@ -12,65 +21,74 @@ load_dotenv()
 # Instantiate MCP server
 mcp = FastMCP("brave-web-agent-server")
 
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
 
-@mcp.tool(name="brave_web_search")
-async def brave_web_search_tool(question: str) -> str:
-    """Search the web and scrape relevant content using Brave Search MCP and a CrewAI-powered agent."""
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "brave")
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
 
-    # MCP adapter is already configured for brave search (do not change)
-    serverparams = StdioServerParameters(
+# Started on the first question and kept warm (see runtime/upstreams.py)
+brave_upstream = upstreams.upstream(
+    StdioServerParameters(
         command="npx",
         args=["-y", "@modelcontextprotocol/server-brave-search"],
         env={"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY"), **os.environ},
     )
+)
+
+
+@mcp.tool(name="brave_web_search")
+async def brave_web_search_tool(question: str, llm: str = None) -> str:
+    """Search the web and scrape relevant content using Brave Search MCP and a CrewAI-powered agent."""
+    from crewai import Agent, Task, Crew, Process
+
+    tools = stable_tools(compactor.wrap(await asyncio.to_thread(brave_upstream.tools)))
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+
+    # Define Brave Web Search Agent
+    brave_search_agent = Agent(
+        role="Web Intelligence Analyst",
+        goal=(
+            "Expertly perform real-time web searches and scrape relevant, trustworthy information "
+            "from online sources using Brave Search and MCP tools. Synthesize results into useful, actionable responses."
+        ),
+        backstory=(
+            "A highly capable agent skilled in navigating and extracting knowledge from live webpages. "
+            "Specializes in identifying authoritative sources, summarizing content accurately, and retrieving useful data "
+            "from news sites, blogs, developer forums, and technical documentation via Brave Search."
+        ),
+        tools=tools,
+        verbose=True,
+        llm=route.llm,
+        allow_delegation=False,
+    )
+
+    # Define the search task
+    brave_search_task = Task(
+        description=f"Conduct a precise and reliable web search to answer this query: {question}",
+        expected_output=(
+            "A high-quality summary, list of insights, or direct answers from credible web sources. "
+            "The result should show critical thinking in parsing web data and deliver practical, clear, and accurate information."
+        ),
+        tools=tools,
+        agent=brave_search_agent,
+    )
+
+    crew = Crew(
+        agents=[brave_search_agent],
+        tasks=[brave_search_task],
+        process=Process.sequential,
+        verbose=True,
+    )
 
-    try:
-        mcp_server_adapter = MCPServerAdapter(serverparams)
-        tools = mcp_server_adapter.tools
-        llm = ChatOpenAI(model="gpt-4.1-mini")
-
-        # Define Brave Web Search Agent
-        brave_search_agent = Agent(
-            role="Web Intelligence Analyst",
-            goal=(
-                "Expertly perform real-time web searches and scrape relevant, trustworthy information "
-                "from online sources using Brave Search and MCP tools. Synthesize results into useful, actionable responses."
-            ),
-            backstory=(
-                "A highly capable agent skilled in navigating and extracting knowledge from live webpages. "
-                "Specializes in identifying authoritative sources, summarizing content accurately, and retrieving useful data "
-                "from news sites, blogs, developer forums, and technical documentation via Brave Search."
-            ),
-            tools=tools,
-            verbose=True,
-            llm=llm,
-            allow_delegation=False,
-        )
-
-        # Define the search task
-        brave_search_task = Task(
-            description=f"Conduct a precise and reliable web search to answer this query: {question}",
-            expected_output=(
-                "A high-quality summary, list of insights, or direct answers from credible web sources. "
-                "The result should show critical thinking in parsing web data and deliver practical, clear, and accurate information."
-            ),
-            tools=tools,
-            agent=brave_search_agent,
-        )
-
-        crew = Crew(
-            agents=[brave_search_agent],
-            tasks=[brave_search_task],
-            process=Process.sequential,
-            verbose=True,
-        )
-
-        result = await crew.kickoff_async()
-        return result
-
-    finally:
-        mcp_server_adapter.stop()
+    result = await route.kickoff_async(crew)
+    return result
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8003)
+    mcp.run(transport="sse", host=server_host(), port=server_port("brave"))
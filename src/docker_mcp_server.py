@@ -1,10 +1,19 @@
+import asyncio
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
 import os
-from llm.llms import gpt_4_1_mini
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.lazy import preload_in_background
+from runtime import upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 # Load environment variables from .env (if you have any)
 load_dotenv()
@@ -12,74 +21,81 @@ load_dotenv()
 # Instantiate a FastMCP server named "docker-agent-server"
 mcp = FastMCP("docker-agent-server")
 
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
 
-@mcp.tool(name="docker_mcp_tool")
-async def docker_mcp_tool(question: str) -> str:
-    """
-    Proxy a user question into your Docker-based MCP server via CrewAI.
-    """
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "docker")
 
-    # We're going to run the MCP server inside Docker (via UVX)
-    serverparams = StdioServerParameters(
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
+
+# Started on the first question and kept warm (see runtime/upstreams.py)
+docker_upstream = upstreams.upstream(
+    StdioServerParameters(
         command="uvx",
         args=[
             "mcp-server-docker",
         ],
         env={**os.environ},
     )
+)
+
+
+@mcp.tool(name="docker_mcp_tool")
+async def docker_mcp_tool(question: str, llm: str = None) -> str:
+    """
+    Proxy a user question into your Docker-based MCP server via CrewAI.
+    """
+    from crewai import Agent, Task, Crew, Process
+
+    tools = stable_tools(compactor.wrap(await asyncio.to_thread(docker_upstream.tools)))
+
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+
+    # Define a CrewAI agent that uses the Docker MCP tools
+    docker_analyst = Agent(
+        role="Docker MCP Intelligence Analyst",
+        goal=(
+            "Use the Docker-hosted MCP server to run tools and return structured "
+            "answers for arbitrary user questions."
+        ),
+        backstory=(
+            "You are an AI analyst interfacing with a Docker-deployed MCP server. "
+            "When given a natural-language question, you should select and invoke "
+            "the appropriate MCP tool, then summarize the output."
+        ),
+        tools=tools,
+        verbose=True,
+        llm=route.llm,
+        allow_delegation=False,
+    )
+
+    # Wrap the user question into a single Task
+    docker_task = Task(
+        description=f"Answer this question using Docker MCP tools: {question}",
+        expected_output=(
+            "A concise, evidence-based answer, potentially including JSON or tabular data "
+            "as returned by the MCP server tools."
+        ),
+        tools=tools,
+        agent=docker_analyst,
+    )
+
+    # Run it all
+    crew = Crew(
+        agents=[docker_analyst],
+        tasks=[docker_task],
+        process=Process.sequential,
+        verbose=True,
+    )
 
-    try:
-        # Spin up the MCP adapter over stdio
-        mcp_server_adapter = MCPServerAdapter(serverparams)
-        tools = mcp_server_adapter.tools
-
-        # Choose your LLM for CrewAI
-        llm = gpt_4_1_mini()
-
-        # Define a CrewAI agent that uses the Docker MCP tools
-        docker_analyst = Agent(
-            role="Docker MCP Intelligence Analyst",
-            goal=(
-                "Use the Docker-hosted MCP server to run tools and return structured "
-                "answers for arbitrary user questions."
-            ),
-            backstory=(
-                "You are an AI analyst interfacing with a Docker-deployed MCP server. "
-                "When given a natural-language question, you should select and invoke "
-                "the appropriate MCP tool, then summarize the output."
-            ),
-            tools=tools,
-            verbose=True,
-            llm=llm,
-            allow_delegation=False,
-        )
-
-        # Wrap the user question into a single Task
-        docker_task = Task(
-            description=f"Answer this question using Docker MCP tools: {question}",
-            expected_output=(
-                "A concise, evidence-based answer, potentially including JSON or tabular data "
-                "as returned by the MCP server tools."
-            ),
-            tools=tools,
-            agent=docker_analyst,
-        )
-
-        # Run it all
-        crew = Crew(
-            agents=[docker_analyst],
-            tasks=[docker_task],
-            process=Process.sequential,
-            verbose=True,
-        )
-
-        result = await crew.kickoff_async()
-        return result
-
-    finally:
-        mcp_server_adapter.stop()
+    result = await route.kickoff_async(crew)
+    return result
 
 
 if __name__ == "__main__":
-    # Expose via SSE on localhost:8000
-    mcp.run(transport="sse", host="127.0.0.1", port=8002)
+    # Expose via SSE, on the port from servers.toml at the repository root
+    mcp.run(transport="sse", host=server_host(), port=server_port("docker"))
@@ -1,10 +1,19 @@
+import asyncio
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
 import os
-from llm.llms import deepseek_r1_8b_ollama
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.lazy import preload_in_background
+from runtime import upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 # Load env vars
 load_dotenv()
@@ -12,12 +21,19 @@ load_dotenv()
 # Instantiate MCP server
 mcp = FastMCP("github-agent-server")
 
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
 
-@mcp.tool(name="github_analyst")
-async def github_analyst_tool(question: str) -> str:
-    """Analyze github repositories data using CrewAI-powered agent."""
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "github")
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
 
-    serverparams = StdioServerParameters(
+# Started on the first question and kept warm (see runtime/upstreams.py)
+github_upstream = upstreams.upstream(
+    StdioServerParameters(
         command="npx",
         args=["-y", "@modelcontextprotocol/server-github"],
         env={
@@ -25,57 +41,59 @@ async def github_analyst_tool(question: str) -> str:
             **os.environ,
         },
     )
+)
+
+
+@mcp.tool(name="github_analyst")
+async def github_analyst_tool(question: str, llm: str = None) -> str:
+    """Analyze github repositories data using CrewAI-powered agent."""
+    from crewai import Agent, Task, Crew, Process
+
+    tools = stable_tools(compactor.wrap(await asyncio.to_thread(github_upstream.tools)))
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+
+    # Define CrewAI agent
+    github_analyst = Agent(
+        role="GitHub Intelligence Analyst",
+        goal=(
+            "Analyze GitHub repositories and provide intelligent insights on repository activity, contribution trends, issue tracking, "
+            "and project health based on user questions."
+        ),
+        backstory=(
+            "A technical AI analyst trained to deeply understand GitHub repository data — including commits, issues, PRs, contributors, code structure, "
+            "and community health. Skilled in turning natural language questions into structured queries that retrieve and explain GitHub insights. "
+            "Helps engineering teams, PMs, and CTOs understand the state and evolution of their codebases. Capable of summarizing repo metrics, "
+            "detecting activity patterns, and providing evidence-backed interpretations from GitHub data sources."
+        ),
+        tools=tools,
+        verbose=True,
+        llm=route.llm,
+        allow_delegation=False,
+    )
+
+    # Define task
+    github_task = Task(
+        description=f"Understand and answer the following GitHub-related question: {question}",
+        expected_output=(
+            "A clear, insightful answer to the user's question, supported by GitHub data. The response may include metrics, summaries of repo activity, "
+            "lists of top contributors or open issues, and explanations of trends, depending on the nature of the query. "
+            "If applicable, include repository names, relevant counts, and timeframes."
+        ),
+        tools=tools,
+        agent=github_analyst,
+    )
+
+    crew = Crew(
+        agents=[github_analyst],
+        tasks=[github_task],
+        process=Process.sequential,
+        verbose=True,
+    )
 
-    try:
-        mcp_server_adapter = MCPServerAdapter(serverparams)
-        tools = mcp_server_adapter.tools
-        llm = deepseek_r1_8b_ollama()
-        # llm = ChatOpenAI(model="gpt-4.1-mini")
-
-        # Define CrewAI agent
-        github_analyst = Agent(
-            role="GitHub Intelligence Analyst",
-            goal=(
-                "Analyze GitHub repositories and provide intelligent insights on repository activity, contribution trends, issue tracking, "
-                "and project health based on user questions."
-            ),
-            backstory=(
-                "A technical AI analyst trained to deeply understand GitHub repository data — including commits, issues, PRs, contributors, code structure, "
-                "and community health. Skilled in turning natural language questions into structured queries that retrieve and explain GitHub insights. "
-                "Helps engineering teams, PMs, and CTOs understand the state and evolution of their codebases. Capable of summarizing repo metrics, "
-                "detecting activity patterns, and providing evidence-backed interpretations from GitHub data sources."
-            ),
-            tools=tools,
-            verbose=True,
-            llm=llm,
-            allow_delegation=False,
-        )
-
-        # Define task
-        github_task = Task(
-            description=f"Understand and answer the following GitHub-related question: {question}",
-            expected_output=(
-                "A clear, insightful answer to the user's question, supported by GitHub data. The response may include metrics, summaries of repo activity, "
-                "lists of top contributors or open issues, and explanations of trends, depending on the nature of the query. "
-                "If applicable, include repository names, relevant counts, and timeframes."
-            ),
-            tools=tools,
-            agent=github_analyst,
-        )
-
-        crew = Crew(
-            agents=[github_analyst],
-            tasks=[github_task],
-            process=Process.sequential,
-            verbose=True,
-        )
-
-        result = await crew.kickoff_async()
-        return result
-
-    finally:
-        mcp_server_adapter.stop()
+    result = await route.kickoff_async(crew)
+    return result
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8001)
+    mcp.run(transport="sse", host=server_host(), port=server_port("github"))
@@ -1,9 +1,17 @@
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from langchain_openai import ChatOpenAI
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.lazy import preload_in_background
+from runtime import cassette
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 # Load environment variables
 load_dotenv()
@@ -11,19 +19,33 @@ load_dotenv()
 # Instantiate the MCP server
 mcp = FastMCP("selenium-agent-server")
 
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
+
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "selenium")
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
+
 
 @mcp.tool(name="selenium_scraper_tool")
-async def selenium_scraper_tool(question: str) -> str:
+async def selenium_scraper_tool(question: str, llm: str = None) -> str:
     """Use Selenium MCP to scrape structured data from websites based on navigation instructions."""
+    from crewai import Agent, Task, Crew, Process
 
+    # One upstream per request, not a warm shared one (runtime/upstreams.py): it
+    # drives a single browser session that concurrent questions would share
     serverparams = StdioServerParameters(
         command="npx", args=["-y", "@angiejones/mcp-selenium"]
     )
 
     try:
-        mcp_server_adapter = MCPServerAdapter(serverparams)
-        tools = mcp_server_adapter.tools
-        llm = ChatOpenAI(model="gpt-4.1-mini")
+        mcp_server_adapter = cassette.adapter(serverparams)
+        tools = stable_tools(compactor.wrap(mcp_server_adapter.tools))
+        # Model picked per question (see llm/router.py); `llm` is the user's choice
+        route = router.route(question, llm)
 
         # Agent focused on browser automation and scraping
         selenium_scraper_agent = Agent(
@@ -38,7 +60,7 @@ async def selenium_scraper_tool(question: str) -> str:
             ),
             tools=tools,
             verbose=True,
-            llm=llm,
+            llm=route.llm,
             allow_delegation=False,
         )
 
@@ -63,7 +85,7 @@ async def selenium_scraper_tool(question: str) -> str:
             verbose=True,
         )
 
-        result = await crew.kickoff_async()
+        result = await route.kickoff_async(crew)
         return result
 
     finally:
@@ -72,4 +94,4 @@ async def selenium_scraper_tool(question: str) -> str:
 
 # Run the MCP server
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8003)
+    mcp.run(transport="sse", host=server_host(), port=server_port("selenium"))
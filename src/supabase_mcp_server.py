@@ -1,10 +1,19 @@
+import asyncio
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from langchain_openai import ChatOpenAI
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import MCPServerAdapter
 import os
 from mcp import StdioServerParameters
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.lazy import preload_in_background
+from runtime import upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 # Load env vars
 load_dotenv()
@@ -12,58 +21,68 @@ load_dotenv()
 # Instantiate MCP server
 mcp = FastMCP("supabase-agent-server")
 
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
 
-@mcp.tool(name="supabase_analyst")
-async def supabase_analyst_tool(question: str) -> str:
-    """Analyze supabase tables and answer questions about out data using CrewAI-powered agent."""
-    # Set up MCPServerAdapter to talk to the Supabase stock tools server
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "supabase")
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
 
-    serverparams = StdioServerParameters(
+# Started on the first question and kept warm; shared with multi_analyst when the
+# launcher runs both in one process (see runtime/upstreams.py)
+supabase_upstream = upstreams.upstream(
+    StdioServerParameters(
         command="npx",
         args=["-y", "@supabase/mcp-server-supabase@latest"],
         env={"SUPABASE_ACCESS_TOKEN": os.getenv("SUPABASE_ACCESS_TOKEN"), **os.environ},
     )
+)
+
+
+@mcp.tool(name="supabase_analyst")
+async def supabase_analyst_tool(question: str, llm: str = None) -> str:
+    """Analyze supabase tables and answer questions about out data using CrewAI-powered agent."""
+    from crewai import Agent, Task, Crew, Process
+
+    tools = stable_tools(compactor.wrap(await asyncio.to_thread(supabase_upstream.tools)))
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+
+    # Define CrewAI agent
+    analyst = Agent(
+        role="Data Analyst",
+        goal="Interpret and execute data-related instructions using SQL",
+        backstory=(
+            "An expert in data analysis and SQL who can understand business needs and convert "
+            "them into SQL queries to interact with the database."
+        ),
+        tools=tools,
+        verbose=True,
+        llm=route.llm,
+        allow_delegation=False,
+    )
+
+    # Define task
+    task = Task(
+        description=f"Execute the following data request: {question}",
+        expected_output="SQL query result or confirmation of action taken",
+        tools=tools,
+        agent=analyst,
+    )
+
+    crew = Crew(
+        agents=[analyst],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=True,
+    )
 
-    try:
-        mcp_server_adapter = MCPServerAdapter(serverparams)
-        tools = mcp_server_adapter.tools
-        llm = ChatOpenAI(model="gpt-4.1-mini")
-
-        # Define CrewAI agent
-        analyst = Agent(
-            role="Data Analyst",
-            goal="Interpret and execute data-related instructions using SQL",
-            backstory=(
-                "An expert in data analysis and SQL who can understand business needs and convert "
-                "them into SQL queries to interact with the database."
-            ),
-            tools=tools,
-            verbose=True,
-            llm=llm,
-            allow_delegation=False,
-        )
-
-        # Define task
-        task = Task(
-            description=f"Execute the following data request: {question}",
-            expected_output="SQL query result or confirmation of action taken",
-            tools=tools,
-            agent=analyst,
-        )
-
-        crew = Crew(
-            agents=[analyst],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True,
-        )
-
-        result = await crew.kickoff_async()
-        return result
-
-    finally:
-        mcp_server_adapter.stop()
+    result = await route.kickoff_async(crew)
+    return result
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8000)
+    mcp.run(transport="sse", host=server_host(), port=server_port("supabase"))
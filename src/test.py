@@ -1,53 +1,76 @@
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from fastmcp import FastMCP
-from crewai import Agent, Task, Crew
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.lazy import preload_in_background
+from runtime import upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 # Load env vars
 load_dotenv()
 
 mcp = FastMCP("AirbnbSearchServer")
 
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
 
-@mcp.tool(name="search_airbnb")
-def search_airbnb(question: str) -> str:
-    """Search for Airbnb listings in a city with a max price per night."""
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "airbnb")
 
-    llm = ChatOpenAI(model="gpt-4.1-mini")
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
 
-    server_params = StdioServerParameters(
+# Started on the first search and kept warm (see runtime/upstreams.py)
+airbnb_upstream = upstreams.upstream(
+    StdioServerParameters(
         command="npx",
         args=["-y", "@openbnb/mcp-server-airbnb", "--ignore-robots-txt"],
     )
+)
+
+
+@mcp.tool(name="search_airbnb")
+def search_airbnb(question: str, llm: str = None) -> str:
+    """Search for Airbnb listings in a city with a max price per night."""
+    from crewai import Agent, Task, Crew
+
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+
+    tools = airbnb_upstream.tools()
+    agent = Agent(
+        role="Especialista em Busca do Airbnb",
+        goal="Buscar e analisar informações de acomodações no Airbnb",
+        backstory="Especialista em encontrar as melhores acomodações",
+        tools=stable_tools(compactor.wrap(tools)),
+        llm=route.llm,
+        verbose=True,
+    )
+
+    task = Task(
+        description=f"Buscar informações de acomodações no Airbnb de acordo com {question}",
+        expected_output="Lista de acomodações disponíveis com detalhes",
+        agent=agent,
+    )
+
+    crew = Crew(
+        agents=[agent],
+        tasks=[task],
+        verbose=True,
+        llm=route.llm,
+    )
 
-    with MCPServerAdapter(server_params) as tools:
-        agent = Agent(
-            role="Especialista em Busca do Airbnb",
-            goal="Buscar e analisar informações de acomodações no Airbnb",
-            backstory="Especialista em encontrar as melhores acomodações",
-            tools=tools,
-            llm=llm,
-            verbose=True,
-        )
-
-        task = Task(
-            description=f"Buscar informações de acomodações no Airbnb de acordo com {question}",
-            expected_output="Lista de acomodações disponíveis com detalhes",
-            agent=agent,
-        )
-
-        crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            verbose=True,
-            llm=llm,
-        )
-
-        result = crew.kickoff()
-        return result
+    result = route.kickoff(crew)
+    return result
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8005)
+    mcp.run(transport="sse", host=server_host(), port=server_port("airbnb"))
@@ -1,9 +1,18 @@
+import asyncio
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from langchain_openai import ChatOpenAI
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.lazy import preload_in_background
+from runtime import upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm.prompts import stable_tools
+from llm.router import router
 
 # Load env vars
 load_dotenv()
@@ -11,65 +20,74 @@ load_dotenv()
 # Instantiate MCP server
 mcp = FastMCP("yfinance-agent-server")
 
+# crewai/langchain are imported by the tool on first use (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background()
 
-@mcp.tool(name="yfinance_analyst")
-async def yfinance_analyst_tool(question: str) -> str:
-    """Analyze yfinance library and answer questions about out data using CrewAI-powered agent."""
-    # Set up MCPServerAdapter to talk to the Supabase stock tools server
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "yfinance")
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
 
-    serverparams = StdioServerParameters(
+# Started on the first question and kept warm; shared with multi_analyst when the
+# launcher runs both in one process (see runtime/upstreams.py)
+yfinance_upstream = upstreams.upstream(
+    StdioServerParameters(
         command="uvx",
         args=["yfmcp@latest"],
     )
+)
+
+
+@mcp.tool(name="yfinance_analyst")
+async def yfinance_analyst_tool(question: str, llm: str = None) -> str:
+    """Analyze yfinance library and answer questions about out data using CrewAI-powered agent."""
+    from crewai import Agent, Task, Crew, Process
+
+    tools = stable_tools(compactor.wrap(await asyncio.to_thread(yfinance_upstream.tools)))
+    # Model picked per question (see llm/router.py); `llm` is the user's choice
+    route = router.route(question, llm)
+
+    # Define CrewAI agent
+    finance_analyst = Agent(
+        role="Senior Finance Analyst",
+        goal=(
+            "Analyze, interpret, and respond to any financial data request using expert-level knowledge "
+            "of corporate finance, accounting, market data, and SQL. Provide clear insights and accurate data analysis."
+        ),
+        backstory=(
+            "A highly experienced financial analyst with a strong background in corporate finance, market research, and data analytics. "
+            "Trained to understand complex financial statements, investment metrics, and economic indicators, and to convert user requests "
+            "into precise SQL queries or structured financial insights. Has deep knowledge of stock markets, financial KPIs, company performance, "
+            "and can advise users on revenue, profit trends, valuation ratios, and much more. Adept at interpreting business objectives and "
+            "retrieving or transforming the right data from financial databases."
+        ),
+        tools=tools,
+        verbose=False,
+        llm=route.llm,
+        allow_delegation=False,
+    )
+
+    # Define task
+    finance_task = Task(
+        description=f"Answer this financial data request accurately: {question}",
+        expected_output="A concise, accurate SQL query result or an explanation of the financial insight retrieved.",
+        tools=tools,
+        agent=finance_analyst,
+    )
+
+    crew = Crew(
+        agents=[finance_analyst],
+        tasks=[finance_task],
+        process=Process.sequential,
+        verbose=False,
+    )
 
-    try:
-        mcp_server_adapter = MCPServerAdapter(serverparams)
-        tools = mcp_server_adapter.tools
-        # llm = ChatOpenAI(model="gpt-4.1-mini")
-        llm = LLM(model="claude-sonnet-4-20250514")
-
-        # Define CrewAI agent
-        finance_analyst = Agent(
-            role="Senior Finance Analyst",
-            goal=(
-                "Analyze, interpret, and respond to any financial data request using expert-level knowledge "
-                "of corporate finance, accounting, market data, and SQL. Provide clear insights and accurate data analysis."
-            ),
-            backstory=(
-                "A highly experienced financial analyst with a strong background in corporate finance, market research, and data analytics. "
-                "Trained to understand complex financial statements, investment metrics, and economic indicators, and to convert user requests "
-                "into precise SQL queries or structured financial insights. Has deep knowledge of stock markets, financial KPIs, company performance, "
-                "and can advise users on revenue, profit trends, valuation ratios, and much more. Adept at interpreting business objectives and "
-                "retrieving or transforming the right data from financial databases."
-            ),
-            tools=tools,
-            verbose=False,
-            llm=llm,
-            allow_delegation=False,
-        )
-
-        # Define task
-        finance_task = Task(
-            description=f"Answer this financial data request accurately: {question}",
-            expected_output="A concise, accurate SQL query result or an explanation of the financial insight retrieved.",
-            tools=tools,
-            agent=finance_analyst,
-        )
-
-        crew = Crew(
-            agents=[finance_analyst],
-            tasks=[finance_task],
-            process=Process.sequential,
-            verbose=False,
-        )
-
-        result = await crew.kickoff_async()
-        return result
-
-    finally:
-        mcp_server_adapter.stop()
+    result = await route.kickoff_async(crew)
+    return result
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8000)
+    mcp.run(transport="sse", host=server_host(), port=server_port("yfinance"))
     # mcp.run()
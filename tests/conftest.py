@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The ETL modules import each other as siblings (the server is started as a script)
+sys.path.insert(0, str(ROOT / "my_mcp"))
+sys.path.insert(0, str(ROOT))
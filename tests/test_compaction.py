@@ -0,0 +1,34 @@
+import json
+
+from runtime.compaction import Compactor, ResultStore
+
+CONFIG = {"strategy": "auto", "max_tokens": 200, "max_rows": 5}
+
+
+def test_rows_keep_the_source_fields():
+    page = {
+        "dataset_id": "abc",
+        "total_rows": 1_000_000,
+        "next_cursor": "c1",
+        "columns": ["id", "name"],
+        "data": [{"id": i, "name": f"customer {i}"} for i in range(50)],
+    }
+    compacted = json.loads(Compactor(CONFIG, ResultStore()).compact("read_csv_file", page))
+    assert compacted["total_rows"] == 1_000_000
+    assert compacted["next_cursor"] == "c1"
+    assert compacted["records_in_result"] == 50
+    assert len(compacted["data"]) == compacted["rows_shown"] == 5
+    assert compacted["full_result_ref"].startswith("res-")
+
+
+def test_source_fields_win_over_compaction_fields():
+    result = {"rows_shown": "all", "items": [{"n": "x" * 50} for _ in range(40)]}
+    compacted = json.loads(Compactor(CONFIG, ResultStore()).compact("search", result))
+    assert compacted["rows_shown"] == "all"
+    assert compacted["records_in_result"] == 40
+
+
+def test_profile_dataset_is_not_compacted():
+    profile = {"rows": 10, "columns": {f"c{i}": {"null_rate": 0.0, "top": "x" * 40} for i in range(50)}}
+    compactor = Compactor({**CONFIG, "tools": {"profile_dataset": {"strategy": "none"}}}, ResultStore())
+    assert json.loads(compactor.compact("profile_dataset", profile)) == profile
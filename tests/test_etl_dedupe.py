@@ -0,0 +1,72 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import etl_profile
+from etl_dedupe import dedupe, dedupe_file
+
+
+def _dedupe(chunks, **options):
+    out = []
+    report = dedupe(lambda: iter(chunks), out.append, **options)
+    return pd.concat([part for part in out if len(part)], ignore_index=True), report
+
+
+@pytest.mark.parametrize("partitions", [1, 8])
+def test_duplicates_across_chunks_of_different_dtypes(partitions):
+    chunks = [
+        pd.DataFrame({"k": [1.0, np.nan, 2.0]}),
+        pd.DataFrame({"k": [1, 2, 3]}),
+        pd.DataFrame({"k": ["3", " 1 "]}, dtype=object),
+    ]
+    out, report = _dedupe(chunks, subset_cols=["k"], partitions=partitions)
+    # 1, 2 and 3 are kept once each, in the chunk they first appear in
+    assert [None if pd.isna(k) else float(k) for k in out["k"]] == [1.0, None, 2.0, 3.0]
+    assert report["duplicates_removed"] == 4
+    assert report["duplicate_keys"] == 3
+
+
+def test_keep_last_across_chunks_of_different_dtypes():
+    chunks = [pd.DataFrame({"k": [1.0, 2.0], "v": ["a", "b"]}), pd.DataFrame({"k": [1], "v": ["c"]})]
+    out, _ = _dedupe(chunks, subset_cols=["k"], keep="last", partitions=4)
+    assert out["v"].tolist() == ["b", "c"]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Read files two rows at a time, so one file gives several chunks
+    monkeypatch.setattr(
+        etl_profile, "iter_file_chunks", functools.partial(etl_profile.iter_file_chunks, chunk_rows=2)
+    )
+
+
+def test_parquet_int_column_with_nulls_in_one_chunk(tmp_path, small_chunks):
+    path = tmp_path / "in.parquet"
+    table = pa.table(
+        {
+            "id": pa.array([1, None, 2, 3, 3, 4], type=pa.int64()),
+            "name": ["a", "b", "c", "d", "d", "e"],
+        }
+    )
+    pq.write_table(table, path)
+    output = tmp_path / "out.parquet"
+    report = dedupe_file(str(path), str(output))
+    assert report["rows_out"] == 5
+    result = pq.read_table(output)
+    assert result.schema.field("id").type == pa.int64()
+    assert result.column("id").to_pylist() == [1, None, 2, 3, 4]
+
+
+def test_parquet_keep_last_empties_first_chunk(tmp_path, small_chunks):
+    path = tmp_path / "in.parquet"
+    pq.write_table(pa.table({"k": [1, 2, 1, 2, 3], "name": ["a", "b", "c", "d", "e"]}), path)
+    output = tmp_path / "out.parquet"
+    report = dedupe_file(str(path), str(output), subset_cols=["k"], keep="last")
+    assert report["rows_out"] == 3
+    result = pq.read_table(output)
+    assert result.schema.field("name").type == pa.string()
+    assert result.column("name").to_pylist() == ["c", "d", "e"]
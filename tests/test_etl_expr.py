@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from etl_expr import evaluate_columns
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "ordered": ["2024-01-05", "2024-02-01"],
+            "shipped": ["2024-01-01", "2024-01-01"],
+            "city": ["Lisbon", "Porto"],
+            "qty": [1, 2],
+            "price": [1.5, 2.5],
+        }
+    )
+
+
+def _eval(df, expr):
+    return evaluate_columns(df, {"out": expr})["out"].tolist()
+
+
+def test_date_diff_with_unit(df):
+    assert _eval(df, "date_diff(ordered, shipped, 'days')") == [4.0, 31.0]
+    assert _eval(df, "date_diff(ordered, '2024-01-01', 'hours')") == [96.0, 744.0]
+
+
+def test_literal_arguments(df):
+    assert _eval(df, "concat(city, '-', qty)") == ["Lisbon-1", "Porto-2"]
+    assert _eval(df, "concat('id-', qty)") == ["id-1", "id-2"]
+    assert _eval(df, "if_else(qty > 1, 'big', 'small')") == ["small", "big"]
+    assert _eval(df, "if_else(qty > 1, price, 0)") == [0.0, 2.5]
+
+
+def test_numbers_multiply(df):
+    assert _eval(df, "qty * price") == [1.5, 5.0]
+
+
+@pytest.mark.parametrize("expr", ["city * 100000000", "3 * city", "city * qty"])
+def test_strings_do_not_multiply(df, expr):
+    with pytest.raises(ValueError, match="concat"):
+        _eval(df, expr)
+
+
+@pytest.mark.parametrize(
+    "expr, name", [("lower(qty)", "lower"), ("round(price, qty)", "round"), ("'a' - qty", "Sub")]
+)
+def test_misuse_is_a_value_error(df, expr, name):
+    with pytest.raises(ValueError, match=name):
+        _eval(df, expr)
@@ -0,0 +1,63 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+import etl_join
+import etl_mcp_server
+from etl_store import DatasetStore
+
+MODES = ("memory", "streamed", "partitioned")
+
+
+def _join(tmp_path, mode, left_path, right_path, **kwargs):
+    """Runs join_datasets in the given mode, from empty caches."""
+    sizes = [left_path.stat().st_size, right_path.stat().st_size]
+    limits = {"memory": max(sizes), "streamed": min(sizes), "partitioned": min(sizes) - 1}
+    etl_join.JOIN_MEMORY_BYTES = limits[mode]
+    etl_join.JOIN_PARTITION_BYTES = max(1, min(sizes) // 4)
+    etl_mcp_server.store = DatasetStore()
+    etl_mcp_server.join_indexes.clear()
+    etl_mcp_server.DATA_DIR = str(tmp_path / mode)
+    result = asyncio.run(
+        etl_mcp_server.join_datasets_tool(
+            left_path=str(left_path), right_path=str(right_path), limit=0, **kwargs
+        )
+    )
+    assert result["join"]["mode"] == mode
+    return sorted(tuple(row.values()) for row in result["data"])
+
+
+@pytest.fixture(autouse=True)
+def restore_limits():
+    saved = (etl_join.JOIN_MEMORY_BYTES, etl_join.JOIN_PARTITION_BYTES, etl_mcp_server.DATA_DIR)
+    yield
+    etl_join.JOIN_MEMORY_BYTES, etl_join.JOIN_PARTITION_BYTES, etl_mcp_server.DATA_DIR = saved
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_text_keys_are_not_parsed_as_numbers(tmp_path, mode):
+    left = tmp_path / "orders.csv"
+    right = tmp_path / "catalog.csv"
+    pd.DataFrame({"sku": ["007", "1e3", "A-1", " 42 "], "qty": [1, 2, 3, 4]}).to_csv(
+        left, index=False
+    )
+    pd.DataFrame(
+        {"sku": ["7", "1000", "A-1", "42", "007"], "product": ["seven", "k", "a", "x", "bond"]}
+    ).to_csv(right, index=False)
+    rows = _join(tmp_path, mode, left, right, on=["sku"], how="inner")
+    # "007" only matches "007", "1e3" matches nothing; text keys are compared stripped
+    assert rows == [(" 42 ", 4, "x"), ("007", 1, "bond"), ("A-1", 3, "a")]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_numeric_keys_match_across_dtypes(tmp_path, mode):
+    left = tmp_path / "left.csv"
+    right = tmp_path / "right.parquet"
+    pd.DataFrame({"id": [1, 2, 3, 4], "name": ["a", "b", "c", "d"]}).to_csv(left, index=False)
+    pd.DataFrame({"id": [3.0, 4.0, None, 9.0], "score": [0.5, 0.25, 0.0, 1.0]}).to_parquet(
+        right, index=False
+    )
+    rows = _join(tmp_path, mode, left, right, on=["id"], how="left")
+    assert [r[:2] for r in rows] == [(1, "a"), (2, "b"), (3, "c"), (4, "d")]
+    assert [r[2] for r in rows[2:]] == [0.5, 0.25]
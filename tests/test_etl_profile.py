@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from etl_profile import iter_frame_chunks, profile_chunks
+
+
+def _keys(df, chunk_rows=100_000):
+    return profile_chunks(iter_frame_chunks(df, chunk_rows))["candidate_keys"]
+
+
+def test_small_column_with_duplicates_is_not_a_key():
+    values = list(range(98)) + [0, 1]
+    assert _keys(pd.DataFrame({"id": values})) == []
+
+
+def test_duplicates_spread_over_chunks_are_not_a_key():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([np.arange(9_800), rng.choice(9_800, 200, replace=False)])
+    df = pd.DataFrame({"id": rng.permutation(values)})
+    assert _keys(df, chunk_rows=1_000) == []
+
+
+def test_unique_columns_are_keys():
+    df = pd.DataFrame({"id": np.arange(10_000), "code": [f"C{i:05d}" for i in range(10_000)]})
+    result = profile_chunks(iter_frame_chunks(df, 1_000))
+    assert result["candidate_keys"] == ["id", "code"]
+    assert result["columns"]["id"]["distinct_exact"]
+    assert result["columns"]["id"]["distinct_estimate"] == 10_000
+
+
+def test_large_unique_column_uses_the_sketch():
+    df = pd.DataFrame({"id": np.arange(200_000)})
+    result = profile_chunks(iter_frame_chunks(df, 50_000))
+    assert not result["columns"]["id"]["distinct_exact"]
+    assert result["candidate_keys"] == ["id"]
+
+
+def test_columns_with_nulls_are_not_keys():
+    assert _keys(pd.DataFrame({"id": [1.0, 2.0, None]})) == []
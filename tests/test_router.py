@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from llm import llms, metrics
+from llm.router import Router
+
+
+class RateLimitError(Exception):
+    __module__ = "litellm.exceptions"
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(
+        llms,
+        "MODELS",
+        {
+            "a": lambda: SimpleNamespace(model="openai/model-a"),
+            "b": lambda: SimpleNamespace(model="openai/model-b"),
+        },
+    )
+    router = Router(fast=["a", "b"], large=[], local=[])
+    yield router
+    metrics.listeners.remove(router._on_completion)
+
+
+def crew(steps_before_error: int, error: Exception = None):
+    """A crew stand-in that finishes agent steps, then fails with error on its first run."""
+    crew = SimpleNamespace(step_callback=None, agents=[SimpleNamespace(llm=None, step_callback=None)])
+    crew.runs = []
+
+    def kickoff():
+        crew.runs.append(crew.agents[0].llm.model)
+        for _ in range(steps_before_error):
+            crew.step_callback("step")
+        if error and len(crew.runs) == 1:
+            raise error
+        return "done"
+
+    crew.kickoff = kickoff
+    return crew
+
+
+def test_latency_comes_from_completions_not_the_crew(router):
+    router.route("how many rows?").kickoff(crew(3))
+    # litellm reports the model without its provider prefix
+    metrics._notify("model-a", 2.0, True)
+    metrics._notify("model-a", 1.0, False)
+    metrics._notify("model-unknown", 1.0, True)
+    assert router.stats()["b"]["calls"] == 0
+    assert router.stats()["a"] == {
+        "calls": 2,
+        "error_rate": 0.5,
+        "median_latency": 2.0,
+        "cooling_down": False,
+    }
+
+
+def test_fails_over_before_any_step(router):
+    c = crew(0, RateLimitError("429"))
+    assert router.route("how many rows?").kickoff(c) == "done"
+    assert c.runs == ["openai/model-a", "openai/model-b"]
+
+
+def test_no_failover_once_a_step_ran(router):
+    c = crew(1, RateLimitError("429"))
+    with pytest.raises(RateLimitError):
+        router.route("how many rows?").kickoff(c)
+    assert c.runs == ["openai/model-a"]
+
+
+def test_transport_errors_are_not_provider_errors(router):
+    c = crew(0, ConnectionError("tool server went away"))
+    with pytest.raises(ConnectionError):
+        router.route("how many rows?").kickoff(c)
+    assert c.runs == ["openai/model-a"]
+
+
+def test_crew_step_callback_still_runs(router):
+    c = crew(2)
+    seen = []
+    c.step_callback = seen.append
+    router.route("how many rows?").kickoff(c)
+    assert seen == ["step", "step"]
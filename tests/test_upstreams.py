@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from runtime import cassette, upstreams
+
+
+class Session:
+    def __init__(self):
+        self.alive = True
+
+    async def send_ping(self):
+        if not self.alive:
+            raise ConnectionError("upstream exited")
+
+
+class Adapter:
+    """MCPServerAdapter stand-in: .tools, .stop() and mcpadapt's sessions and loop."""
+
+    started = []
+
+    def __init__(self, params, loop):
+        self.params = params
+        self.session = Session()
+        self._adapter = SimpleNamespace(sessions=[self.session], loop=loop)
+        self.tools = [SimpleNamespace(name=f"tool-{len(self.started)}")]
+        self.stopped = False
+        Adapter.started.append(self)
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def adapters(monkeypatch):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    Adapter.started = []
+    monkeypatch.setattr(cassette, "adapter", lambda params: Adapter(params, loop))
+    monkeypatch.setattr(upstreams, "_pool", {})
+    yield Adapter.started
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def params(*args):
+    return SimpleNamespace(command="npx", args=list(args), env=None)
+
+
+def test_servers_with_the_same_command_share_one_upstream(adapters):
+    supabase = upstreams.upstream(params("-y", "@supabase/mcp-server-supabase@latest"))
+    multi = upstreams.upstream(params("-y", "@supabase/mcp-server-supabase@latest"))
+    github = upstreams.upstream(params("-y", "@modelcontextprotocol/server-github"))
+    assert supabase is multi and supabase is not github
+    assert not adapters
+
+    supabase.tools()
+    multi.tools()
+    assert len(adapters) == 1
+    stats = upstreams.stats()["npx -y @supabase/mcp-server-supabase@latest"]
+    assert stats["servers"] == 2 and stats["uses"] == 2 and stats["running"]
+
+
+def test_upstream_that_stopped_answering_is_restarted(adapters):
+    upstream = upstreams.upstream(params("-y", "@upstash/context7-mcp@latest"))
+    first = upstream.tools()
+    adapters[0].session.alive = False
+    second = upstream.tools()
+    assert len(adapters) == 2 and adapters[0].stopped
+    assert first[0].name != second[0].name
+    assert upstream.restarts == 1
+
+
+def test_warm_starts_every_declared_upstream(adapters):
+    upstreams.upstream(params("-y", "@upstash/context7-mcp@latest"))
+    upstreams.upstream(params("-y", "@modelcontextprotocol/server-brave-search"))
+    upstreams.warm()
+    assert len(adapters) == 2
+    assert all(s["running"] and s["uses"] == 0 for s in upstreams.stats().values())
@@ -4,6 +4,13 @@ import asyncio
 import json
 from datetime import date
 import re
+import sys
+import uuid
+from pathlib import Path
+
+# Server URLs come from servers.toml at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_url  # noqa: E402
 
 st.set_page_config(page_title="AI Travel Planner", page_icon="🌍", layout="centered")
 
@@ -17,32 +24,104 @@ Plan your trip with AI-powered agents that find:
 Just tell us when and where you're going!
 """)
 
-# Input Form
-with st.form("travel_form"):
-    departure = st.text_input("Departure City", placeholder="e.g. Lisbon")
-    destination = st.text_input("Destination City", placeholder="e.g. Berlin")
-    start_date = st.date_input("Start Date", min_value=date.today())
-    end_date = st.date_input("End Date", min_value=start_date)
-    num_travelers = st.number_input("Number of Travelers", min_value=1, step=1, value=1)
-    attractions = st.multiselect(
-        "What are you interested in?",
-        ["cultural", "local food", "parks", "pubs"],
-        default=["cultural"],
-    )
-    accommodation_type = st.selectbox(
-        "Accommodation Type", options=["hotel", "apartment", "hostel"]
-    )
-    submitted = st.form_submit_button("Plan My Trip")
-
-
-# Helper to call MCP server
-async def call_planner(payload):
-    client = Client("http://localhost:8003/sse")
+# Input Form (plain widgets rather than st.form, so the searches the trip already
+# determines can be prefetched while the rest is being filled in)
+departure = st.text_input("Departure City", placeholder="e.g. Lisbon")
+destination = st.text_input("Destination City", placeholder="e.g. Berlin")
+start_date = st.date_input("Start Date", min_value=date.today())
+end_date = st.date_input("End Date", min_value=start_date)
+num_travelers = st.number_input("Number of Travelers", min_value=1, step=1, value=1)
+attractions = st.multiselect(
+    "What are you interested in?",
+    ["cultural", "local food", "parks", "pubs"],
+    default=["cultural"],
+)
+accommodation_type = st.selectbox(
+    "Accommodation Type", options=["hotel", "apartment", "hostel"]
+)
+submitted = st.button("Plan My Trip")
+
+
+# Helpers to run the planner as a background job on the MCP server
+SERVER_URL = server_url("travel_planner")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+
+def job_client(job_id):
+    # ?job= lets a multi-worker server route the session to the worker running the job
+    return Client(f"{SERVER_URL}?job={job_id}")
+
+
+async def submit_planner(payload):
+    client = Client(SERVER_URL)
+    async with client:
+        result = await client.call_tool("submit_travel_planner", {"input_data": payload})
+        return json.loads(result[0].text)["job_id"]
+
+
+async def get_job_status(job_id):
+    client = job_client(job_id)
+    async with client:
+        result = await client.call_tool("job_status", {"job_id": job_id})
+        return json.loads(result[0].text)
+
+
+async def cancel_planner(job_id):
+    client = job_client(job_id)
+    async with client:
+        await client.call_tool("cancel_job", {"job_id": job_id})
+
+
+async def wait_for_planner(job_id, status_box):
+    client = job_client(job_id)
     async with client:
-        result = await client.call_tool("travel_planner", {"input_data": payload})
+        while True:
+            result = await client.call_tool("wait_job", {"job_id": job_id, "timeout": 20})
+            status = json.loads(result[0].text)
+            status_box.info(
+                f"🧠 Agents are planning your trip... "
+                f"({status['steps']} of {status['total'] or 3} agents done)"
+            )
+            if status["state"] in FINISHED_STATES:
+                break
+        if status["state"] != "succeeded":
+            raise RuntimeError(status["error"] or f"Planning was {status['state']}.")
+        result = await client.call_tool("job_result", {"job_id": job_id})
         return result[0].text if result and hasattr(result[0], "text") else str(result)
 
 
+async def prefetch(trip):
+    client = Client(SERVER_URL)
+    async with client:
+        result = await client.call_tool("prefetch_travel", trip)
+        return json.loads(result[0].text)
+
+
+# Speculative prefetch: once destination and dates are set, warm the stays and
+# attractions searches on the server; a changed input cancels the outdated ones
+if "client_id" not in st.session_state:
+    st.session_state["client_id"] = uuid.uuid4().hex
+if destination and not st.query_params.get("job"):
+    trip = {
+        "client_id": st.session_state["client_id"],
+        "destination": destination.strip(),
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "num_travelers": int(num_travelers),
+        "attractions": sorted(attractions),
+    }
+    trip_key = json.dumps(trip, sort_keys=True)
+    if st.session_state.get("prefetch_key") != trip_key:
+        st.session_state["prefetch_key"] = trip_key
+        try:
+            report = asyncio.run(prefetch(trip))
+            if report.get("started") or report.get("cached"):
+                st.caption("🔎 Searching stays and attractions in the background...")
+        except Exception:
+            # Prefetching is only a head start; the planner searches anyway
+            pass
+
+
 # Parser for Airbnb output
 def parse_airbnb_markdown(raw_block: str):
     parsed = {}
@@ -69,64 +148,80 @@ if submitted:
             "accommodation_type": accommodation_type,
         }
 
-        st.info("🧠 Agents are planning your trip...")
+        try:
+            # The job id lives in the URL, so reloading the tab resumes the same job
+            st.query_params["job"] = asyncio.run(submit_planner(payload))
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+
+job_id = st.query_params.get("job")
+if job_id:
+    status_box = st.info("🧠 Agents are planning your trip...")
+    try:
+        if asyncio.run(get_job_status(job_id))["state"] not in FINISHED_STATES:
+            if st.button("Cancel planning"):
+                asyncio.run(cancel_planner(job_id))
+                del st.query_params["job"]
+                st.rerun()
+    except Exception:
+        pass
+
+    try:
+        output = asyncio.run(wait_for_planner(job_id, status_box))
 
         try:
-            output = asyncio.run(call_planner(payload))
-
-            try:
-                data = json.loads(output)
-                st.subheader("🧳 Trip Plan Breakdown")
-
-                if "tasks_output" in data:
-                    for task in data["tasks_output"]:
-                        agent = task.get("agent", "Agent")
-                        st.markdown(f"### 🤖 {agent}")
-
-                        if "Flight" in agent:
-                            st.markdown("#### ✈️ Flight Options")
-                            st.markdown(task["raw"])
-
-                        elif "Airbnb" in agent:
-                            st.markdown("#### 🏠 Recommended Accommodations")
-                            listings = task["raw"].split("\n\n")
-                            for i, block in enumerate(listings):
-                                if block.strip():
-                                    item = parse_airbnb_markdown(block)
-                                    cols = st.columns([3, 1])
-                                    with cols[0]:
-                                        st.markdown(
-                                            f"**{item.get('listing_name', f'Accommodation {i + 1}')}**"
+            data = json.loads(output)
+            st.subheader("🧳 Trip Plan Breakdown")
+
+            if "tasks_output" in data:
+                for task in data["tasks_output"]:
+                    agent = task.get("agent", "Agent")
+                    st.markdown(f"### 🤖 {agent}")
+
+                    if "Flight" in agent:
+                        st.markdown("#### ✈️ Flight Options")
+                        st.markdown(task["raw"])
+
+                    elif "Airbnb" in agent:
+                        st.markdown("#### 🏠 Recommended Accommodations")
+                        listings = task["raw"].split("\n\n")
+                        for i, block in enumerate(listings):
+                            if block.strip():
+                                item = parse_airbnb_markdown(block)
+                                cols = st.columns([3, 1])
+                                with cols[0]:
+                                    st.markdown(
+                                        f"**{item.get('listing_name', f'Accommodation {i + 1}')}**"
+                                    )
+                                    st.markdown(
+                                        f"💵 **{item.get('total_price', 'N/A')}** ({item.get('price_per_night', 'N/A')})"
+                                    )
+                                    st.markdown(f"⭐ {item.get('rating', 'N/A')}")
+                                    if "key_features" in item:
+                                        st.markdown(f"🔑 {item['key_features']}")
+                                with cols[1]:
+                                    if "direct_booking_link" in item:
+                                        st.link_button(
+                                            "🔗 Book Now",
+                                            item["direct_booking_link"],
                                         )
-                                        st.markdown(
-                                            f"💵 **{item.get('total_price', 'N/A')}** ({item.get('price_per_night', 'N/A')})"
-                                        )
-                                        st.markdown(f"⭐ {item.get('rating', 'N/A')}")
-                                        if "key_features" in item:
-                                            st.markdown(f"🔑 {item['key_features']}")
-                                    with cols[1]:
-                                        if "direct_booking_link" in item:
-                                            st.link_button(
-                                                "🔗 Book Now",
-                                                item["direct_booking_link"],
-                                            )
-
-                        elif "Experience" in agent or "Brave Search" in agent:
-                            st.markdown("#### 📍 Top Local Experiences")
-                            for entry in task["raw"].split("\n\n"):
-                                if entry.strip():
-                                    st.markdown(f"- {entry}")
-
-                        else:
-                            st.code(task["raw"])
-
-                elif "raw" in data:
-                    st.markdown("### 📄 Raw Output")
-                    st.write(data["raw"])
-
-            except Exception:
-                st.error("⚠️ Failed to parse the agent output.")
-                st.text(output)
 
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
+                    elif "Experience" in agent or "Brave Search" in agent:
+                        st.markdown("#### 📍 Top Local Experiences")
+                        for entry in task["raw"].split("\n\n"):
+                            if entry.strip():
+                                st.markdown(f"- {entry}")
+
+                    else:
+                        st.code(task["raw"])
+
+            elif "raw" in data:
+                st.markdown("### 📄 Raw Output")
+                st.write(data["raw"])
+
+        except Exception:
+            st.error("⚠️ Failed to parse the agent output.")
+            st.text(output)
+
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
@@ -1,41 +1,103 @@
 # mcp_server.py
 
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
 import os
+import sys
+import threading
+from pathlib import Path
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from langchain_openai import ChatOpenAI
 from schemas import TravelInput
-import agentops
+from prefetch import Prefetcher
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from runtime.config import server_host, server_port
+from runtime.jobs import JobManager, register_job_tools, report_progress
+from runtime.lazy import AGENT_MODULES, preload_in_background
+from runtime import cassette, upstreams
+from runtime.compaction import compactor, register_result_tools
+from runtime.registry import advertise
+from llm import metrics
+from llm.prompts import stable_tools, task_prompt
 
 load_dotenv()
 
 mcp = FastMCP("agent-server")
+jobs = JobManager()
+register_job_tools(mcp, jobs)
 
 AGENTOPS_API_KEY = os.getenv("AGENTOPS_API_KEY")
-agentops.init(AGENTOPS_API_KEY, default_tags=["travel_planner"])
+_agentops_started = False
+_agentops_lock = threading.Lock()
 
+# crewai/langchain/agentops are imported on the first plan (MCP_PRELOAD=1 loads
+# them in the background once the server is up)
+preload_in_background((*AGENT_MODULES, "agentops"))
 
-@mcp.tool(name="travel_planner")
-def run_travel_planner(input_data: TravelInput):
-    flights_params = StdioServerParameters(
-        command="npx",
-        args=["-y", "serper-search-scrape-mcp-server"],
-        env={"SERPER_API_KEY": os.getenv("SERPER_API_KEY"), **os.environ},
-    )
-    airbnb_params = StdioServerParameters(
+# Registers with the service registry when MCP_REGISTRY_URL is set
+advertise(mcp, "travel_planner", jobs=jobs)
+
+# Large upstream results reach the agent compacted; full results stay here (tool_result)
+register_result_tools(mcp, compactor)
+
+
+def airbnb_server():
+    return StdioServerParameters(
         command="npx",
         args=["-y", "@openbnb/mcp-server-airbnb", "--ignore-robots-txt"],
         env=os.environ,
     )
-    bravesearch_params = StdioServerParameters(
+
+
+def bravesearch_server():
+    return StdioServerParameters(
         command="npx",
         args=["-y", "@modelcontextprotocol/server-brave-search"],
         env={"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY"), **os.environ},
     )
 
+
+# Airbnb and Brave searches started from the app's hints while the form is filled in
+prefetcher = Prefetcher({"airbnb": airbnb_server, "brave": bravesearch_server})
+
+# Started on the first plan and kept warm for the next ones (see runtime/upstreams.py)
+flights_upstream = upstreams.upstream(
+    StdioServerParameters(
+        command="npx",
+        args=["-y", "serper-search-scrape-mcp-server"],
+        env={"SERPER_API_KEY": os.getenv("SERPER_API_KEY"), **os.environ},
+    )
+)
+airbnb_upstream = upstreams.upstream(airbnb_server())
+bravesearch_upstream = upstreams.upstream(bravesearch_server())
+
+
+def _start_agentops():
+    global _agentops_started
+    with _agentops_lock:
+        if not _agentops_started:
+            import agentops
+
+            agentops.init(AGENTOPS_API_KEY, default_tags=["travel_planner"])
+            _agentops_started = True
+
+
+def _prefetched(prefetched: dict, name: str, tool: str):
+    if name not in prefetched:
+        return None
+    return compactor.compact(tool, prefetched[name])
+
+
+@mcp.tool(name="travel_planner")
+def run_travel_planner(input_data: TravelInput):
+    from crewai import Agent, Task, Crew, Process, LLM
+    from langchain_openai import ChatOpenAI
+
+    _start_agentops()
+    metrics.install()
+    cassette.install()
+    prefetched = prefetcher.results(input_data.model_dump(mode="json"))
+
     bravesearch_llm = ChatOpenAI(model="gpt-4o", temperature=0.5)
     flights_llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2)
     airbnb_llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3)
@@ -44,102 +106,158 @@ def run_travel_planner(input_data: TravelInput):
         base_url="http://localhost:11434",
         temperature=0.1,
     )
-    with (
-        MCPServerAdapter(flights_params) as flights_tools,
-        MCPServerAdapter(airbnb_params) as airbnb_tools,
-        MCPServerAdapter(bravesearch_params) as bravesearch_tools,
-    ):
-        flights_agent = Agent(
-            role="Flight Specialist Agent",
-            goal="Provide the most relevant and affordable flight options based on user travel preferences.",
-            backstory="An AI expert in global flight searches with access to major airlines and travel aggregators. "
-            "Trained to optimize for best departure timing, price, and overall travel experience.",
-            tools=flights_tools,
-            llm=flights_llm,
-            verbose=True,
-        )
-
-        airbnb_agent = Agent(
-            role="Accommodation Finder Agent",
-            goal="Identify the most suitable and top-rated accommodations that match user expectations and budget.",
-            backstory="An AI agent with advanced knowledge of short-term rentals. Skilled at finding apartments, hotels, "
-            "and boutique stays that align with user preferences like location, amenities, and ratings.",
-            tools=airbnb_tools,
-            llm=airbnb_llm,
-            verbose=True,
-        )
-
-        bravesearch_agent = Agent(
-            role="Local Experience Curator Agent",
-            goal="Discover the most popular and enjoyable attractions, restaurants, and local events that align with user interests.",
-            backstory="An AI guide deeply familiar with global destinations, local happenings, and top-rated venues. Skilled at curating experiences based on personal preferences such as food, culture, parks, and nightlife. Always focused on what’s happening during the user's visit.",
-            tools=bravesearch_tools,
-            llm=bravesearch_llm,
-            verbose=True,
-        )
-
-        flights_task = Task(
-            description=(
-                f"Search for top-rated and cost-effective flights departing from {input_data.departure} to "
-                f"{input_data.destination} on {input_data.start_date}. Filter results for {input_data.num_travelers} "
-                f"passenger(s), and present options from trustworthy sources."
-            ),
-            expected_output=(
-                "A concise list (max 5) of available flights with:\n"
-                "- Airline name\n"
-                "- Departure time and total duration\n"
-                "- Price per traveler (approximate)\n"
-                "- Booking link"
-            ),
-            agent=flights_agent,
-        )
-
-        airbnb_task = Task(
-            description=(
-                f"Search for available {input_data.accommodation_type} accommodations in {input_data.destination} from "
-                f"{input_data.start_date} to {input_data.end_date} for {input_data.num_travelers} traveler(s). Prioritize "
-                f"listings with high ratings, guest satisfaction, and fitting to general travel budgets."
-            ),
-            expected_output=(
-                "A list of up to 5 recommended accommodations with:\n"
-                "- Listing name\n"
-                "- Total price and price per night\n"
-                "- Rating (and number of reviews)\n"
-                "- Key features (e.g., host type, free cancellation)\n"
-                "- Direct booking link"
-            ),
-            agent=airbnb_agent,
-        )
-
-        bravesearch_task = Task(
-            description=(
-                f"Search for attractions, events, and local highlights in {input_data.destination} "
-                f"from {input_data.start_date} to {input_data.end_date} that align with the user's interests: "
-                f"{', '.join(input_data.attractions)}. Include must-visit places, famous restaurants, parks, nightlife, or "
-                f"festivals occurring during the travel dates."
-            ),
-            expected_output=(
-                "A curated list of up to 5 recommendations including:\n"
-                "- Name of the place or event\n"
-                "- What it is and why it’s recommended\n"
-                "- Address or neighborhood\n"
-                "- Opening dates/times if applicable\n"
-                "- Website or source link for more details"
-            ),
-            agent=bravesearch_agent,
-        )
-
-        crew = Crew(
-            agents=[flights_agent, airbnb_agent, bravesearch_agent],
-            tasks=[flights_task, airbnb_task, bravesearch_task],
-            process=Process.sequential,
-            verbose=True,
-            llm=backup_llm,
-            max_iterations=3,
-        )
-
-        return crew.kickoff()
+    flights_tools = flights_upstream.tools()
+    airbnb_tools = airbnb_upstream.tools()
+    bravesearch_tools = bravesearch_upstream.tools()
+
+    flights_agent = Agent(
+        role="Flight Specialist Agent",
+        goal="Provide the most relevant and affordable flight options based on user travel preferences.",
+        backstory="An AI expert in global flight searches with access to major airlines and travel aggregators. "
+        "Trained to optimize for best departure timing, price, and overall travel experience.",
+        tools=stable_tools(compactor.wrap(flights_tools)),
+        llm=flights_llm,
+        verbose=True,
+    )
+
+    airbnb_agent = Agent(
+        role="Accommodation Finder Agent",
+        goal="Identify the most suitable and top-rated accommodations that match user expectations and budget.",
+        backstory="An AI agent with advanced knowledge of short-term rentals. Skilled at finding apartments, hotels, "
+        "and boutique stays that align with user preferences like location, amenities, and ratings.",
+        tools=stable_tools(compactor.wrap(airbnb_tools)),
+        llm=airbnb_llm,
+        verbose=True,
+    )
+
+    bravesearch_agent = Agent(
+        role="Local Experience Curator Agent",
+        goal="Discover the most popular and enjoyable attractions, restaurants, and local events that align with user interests.",
+        backstory="An AI guide deeply familiar with global destinations, local happenings, and top-rated venues. Skilled at curating experiences based on personal preferences such as food, culture, parks, and nightlife. Always focused on what’s happening during the user's visit.",
+        tools=stable_tools(compactor.wrap(bravesearch_tools)),
+        llm=bravesearch_llm,
+        verbose=True,
+    )
+
+    # Task descriptions start with their fixed instructions and end with the trip
+    # details, so the prompt prefix is the same for every plan (prompt caching)
+    flights_task = Task(
+        description=task_prompt(
+            "Search for top-rated and cost-effective flights for the trip below. Filter results for the given "
+            "number of passengers, and present options from trustworthy sources.",
+            departure=input_data.departure,
+            destination=input_data.destination,
+            date=input_data.start_date,
+            passengers=input_data.num_travelers,
+        ),
+        expected_output=(
+            "A concise list (max 5) of available flights with:\n"
+            "- Airline name\n"
+            "- Departure time and total duration\n"
+            "- Price per traveler (approximate)\n"
+            "- Booking link"
+        ),
+        agent=flights_agent,
+    )
+
+    airbnb_task = Task(
+        description=task_prompt(
+            "Search for available accommodations of the given type for the stay below. Prioritize "
+            "listings with high ratings, guest satisfaction, and fitting to general travel budgets. If "
+            "prefetched search results are given below, start from them and only search again when they "
+            "are not enough.",
+            accommodation_type=input_data.accommodation_type,
+            destination=input_data.destination,
+            check_in=input_data.start_date,
+            check_out=input_data.end_date,
+            travelers=input_data.num_travelers,
+            prefetched_results=_prefetched(prefetched, "airbnb", "airbnb_search"),
+        ),
+        expected_output=(
+            "A list of up to 5 recommended accommodations with:\n"
+            "- Listing name\n"
+            "- Total price and price per night\n"
+            "- Rating (and number of reviews)\n"
+            "- Key features (e.g., host type, free cancellation)\n"
+            "- Direct booking link"
+        ),
+        agent=airbnb_agent,
+    )
+
+    bravesearch_task = Task(
+        description=task_prompt(
+            "Search for attractions, events, and local highlights at the destination below during the "
+            "travel dates that align with the user's interests. Include must-visit places, famous "
+            "restaurants, parks, nightlife, or festivals occurring during the travel dates. If prefetched "
+            "search results are given below, start from them and only search again when they are not enough.",
+            destination=input_data.destination,
+            start_date=input_data.start_date,
+            end_date=input_data.end_date,
+            interests=", ".join(input_data.attractions),
+            prefetched_results=_prefetched(prefetched, "brave", "brave_web_search"),
+        ),
+        expected_output=(
+            "A curated list of up to 5 recommendations including:\n"
+            "- Name of the place or event\n"
+            "- What it is and why it’s recommended\n"
+            "- Address or neighborhood\n"
+            "- Opening dates/times if applicable\n"
+            "- Website or source link for more details"
+        ),
+        agent=bravesearch_agent,
+    )
+
+    crew = Crew(
+        agents=[flights_agent, airbnb_agent, bravesearch_agent],
+        tasks=[flights_task, airbnb_task, bravesearch_task],
+        process=Process.sequential,
+        verbose=True,
+        llm=backup_llm,
+        max_iterations=3,
+        task_callback=lambda output: report_progress(
+            f"{output.agent} finished", total=3
+        ),
+    )
+
+    return crew.kickoff()
+
+
+@mcp.tool()
+async def prefetch_travel(
+    client_id: str,
+    destination: str = "",
+    start_date: str = "",
+    end_date: str = "",
+    num_travelers: int = 1,
+    attractions: list[str] = None,
+) -> dict:
+    """
+    Speculative hint from a client still filling in a trip: starts the Airbnb and
+    attractions searches it determines and cancels the client's outdated ones.
+    """
+    if cassette.cassette.mode == "replay":
+        return {"disabled": "cassette replay"}
+    trip = {
+        "destination": destination,
+        "start_date": start_date,
+        "end_date": end_date,
+        "num_travelers": num_travelers,
+        "attractions": attractions or [],
+    }
+    return await prefetcher.hint(client_id, trip)
+
+
+@mcp.tool()
+def prefetch_status() -> dict:
+    """Prefetch lookups started, cancelled, failed, used and over budget, and cache entries."""
+    return prefetcher.status()
+
+
+@mcp.tool(name="submit_travel_planner")
+async def submit_travel_planner(input_data: TravelInput) -> dict:
+    """Starts travel_planner as a background job and returns its job_id at once."""
+    return await jobs.submit("travel_planner", run_travel_planner, input_data)
 
 
 if __name__ == "__main__":
-    mcp.run(transport="sse", host="127.0.0.1", port=8003)
+    mcp.run(transport="sse", host=server_host(), port=server_port("travel_planner"))
@@ -0,0 +1,193 @@
+"""
+Speculative prefetch of the travel planner's upstream searches.
+
+Once the destination and dates are known, the Airbnb search and the Brave
+search for attractions are already determined, so the app sends them as a hint
+while the user is still filling in the form. Each lookup runs in the background
+(after a short debounce, at most PREFETCH_MAX_CONCURRENT at a time) and its
+result is kept for PREFETCH_TTL_SECONDS. A new hint from the same client cancels
+that client's lookups the new input no longer needs, and each client may start
+at most PREFETCH_BUDGET lookups per hour. When the plan is submitted, the
+planner picks up the finished (or still running) lookups for its input.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "900"))
+PREFETCH_DEBOUNCE_SECONDS = float(os.getenv("PREFETCH_DEBOUNCE_SECONDS", "1.5"))
+PREFETCH_TIMEOUT_SECONDS = float(os.getenv("PREFETCH_TIMEOUT_SECONDS", "90"))
+PREFETCH_MAX_CONCURRENT = int(os.getenv("PREFETCH_MAX_CONCURRENT", "2"))
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "10"))
+
+# How long a submitted plan waits for a lookup that is still running
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", "30"))
+
+
+def lookups(trip: dict) -> dict:
+    """Upstream searches determined by the trip so far: name -> (tool, arguments)."""
+    destination = (trip.get("destination") or "").strip()
+    start, end = trip.get("start_date"), trip.get("end_date")
+    if not destination or not start or not end:
+        return {}
+    found = {
+        "airbnb": (
+            "airbnb_search",
+            {
+                "location": destination,
+                "checkin": str(start),
+                "checkout": str(end),
+                "adults": int(trip.get("num_travelers") or 1),
+            },
+        )
+    }
+    attractions = sorted(trip.get("attractions") or [])
+    if attractions:
+        found["brave"] = (
+            "brave_web_search",
+            {
+                "query": f"{', '.join(attractions)} attractions, restaurants and events in "
+                f"{destination} from {start} to {end}",
+                "count": 10,
+            },
+        )
+    return found
+
+
+def _key(name: str, tool: str, arguments: dict) -> tuple:
+    return (name, tool, tuple(sorted((k, str(v).lower()) for k, v in arguments.items())))
+
+
+class Prefetcher:
+    def __init__(self, upstreams: dict):
+        """upstreams: lookup name -> function returning its StdioServerParameters."""
+        self.upstreams = upstreams
+        self._entries = {}
+        self._clients = {}
+        self._slots = None
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "cancelled": 0, "failed": 0, "used": 0, "over_budget": 0}
+
+    def _prune(self):
+        now = time.time()
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["expires"] < now:
+                    del self._entries[key]
+
+    async def hint(self, client_id: str, trip: dict) -> dict:
+        """Starts the lookups for trip that are not cached yet; cancels the client's stale ones."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(PREFETCH_MAX_CONCURRENT)
+        self._prune()
+        wanted = {_key(name, *lookup): (name, *lookup) for name, lookup in lookups(trip).items()}
+        client = self._clients.setdefault(client_id, {"keys": set(), "spent": deque()})
+
+        for key in client["keys"] - wanted.keys():
+            entry = self._entries.get(key)
+            if entry and entry["state"] in ("pending", "running") and entry["clients"] == {client_id}:
+                entry["task"].cancel()
+                entry["state"] = "cancelled"
+                self.stats["cancelled"] += 1
+                with self._lock:
+                    self._entries.pop(key, None)
+            elif entry:
+                entry["clients"].discard(client_id)
+        client["keys"] = set(wanted)
+
+        while client["spent"] and time.time() - client["spent"][0] > 3600:
+            client["spent"].popleft()
+        report = {"started": [], "cached": [], "over_budget": []}
+        for key, (name, tool, arguments) in wanted.items():
+            entry = self._entries.get(key)
+            if entry and entry["state"] in ("pending", "running", "done"):
+                entry["clients"].add(client_id)
+                report["cached"].append(name)
+                continue
+            if len(client["spent"]) >= PREFETCH_BUDGET:
+                self.stats["over_budget"] += 1
+                report["over_budget"].append(name)
+                continue
+            client["spent"].append(time.time())
+            entry = {
+                "state": "pending",
+                "result": None,
+                "error": None,
+                "clients": {client_id},
+                "done": threading.Event(),
+                "expires": time.time() + PREFETCH_TTL_SECONDS,
+            }
+            with self._lock:
+                self._entries[key] = entry
+            entry["task"] = asyncio.create_task(self._run(key, entry, name, tool, arguments))
+            self.stats["started"] += 1
+            report["started"].append(name)
+        return report
+
+    async def _run(self, key, entry, name, tool, arguments):
+        try:
+            # A newer hint within the debounce cancels this one before any upstream work
+            await asyncio.sleep(PREFETCH_DEBOUNCE_SECONDS)
+            async with self._slots:
+                entry["state"] = "running"
+                entry["result"] = await asyncio.wait_for(
+                    self._call(name, tool, arguments), PREFETCH_TIMEOUT_SECONDS
+                )
+            entry["state"] = "done"
+            entry["expires"] = time.time() + PREFETCH_TTL_SECONDS
+        except asyncio.CancelledError:
+            entry["state"] = "cancelled"
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        except Exception as e:
+            entry["state"] = "failed"
+            entry["error"] = f"{type(e).__name__}: {e}"
+            self.stats["failed"] += 1
+        finally:
+            entry["done"].set()
+
+    async def _call(self, name: str, tool: str, arguments: dict) -> str:
+        from fastmcp import Client
+        from fastmcp.client.transports import StdioTransport
+
+        params = self.upstreams[name]()
+        env = {k: v for k, v in (params.env or {}).items() if v is not None}
+        async with Client(StdioTransport(params.command, list(params.args), env=env)) as client:
+            result = await client.call_tool(tool, arguments)
+        return "\n".join(part.text for part in result if hasattr(part, "text"))
+
+    def results(self, trip: dict, wait: float = PREFETCH_WAIT_SECONDS) -> dict:
+        """
+        Prefetched results for a submitted trip: lookup name -> text. Waits up to
+        `wait` seconds for lookups still running when called from a worker thread.
+        """
+        self._prune()
+        try:
+            asyncio.get_running_loop()
+            # On the event loop thread itself the lookups cannot progress while we wait
+            wait = 0.0
+        except RuntimeError:
+            pass
+        found = {}
+        deadline = time.monotonic() + wait
+        for name, lookup in lookups(trip).items():
+            entry = self._entries.get(_key(name, *lookup))
+            if entry is None:
+                continue
+            entry["done"].wait(max(0.0, deadline - time.monotonic()))
+            if entry["state"] == "done":
+                found[name] = entry["result"]
+                self.stats["used"] += 1
+        return found
+
+    def status(self) -> dict:
+        self._prune()
+        states = {}
+        for entry in list(self._entries.values()):
+            states[entry["state"]] = states.get(entry["state"], 0) + 1
+        return {**self.stats, "entries": states}